@@ -51,6 +51,17 @@ def square_track(width: int, height: int, margin: int = 40, track_width: int = 1
 
     return walls
 
+
+def square_centerline(width: int, height: int, margin: int = 40, track_width: int = 100) -> List[Vec2]:
+    """Corners of the middle of square_track's lane, clockwise on screen (the checkpoint order)."""
+    inset = margin + track_width / 2
+    return [
+        (inset, inset),
+        (width - inset, inset),
+        (width - inset, height - inset),
+        (inset, height - inset),
+    ]
+
 # ------------------------------------------------------------
 # Generic helpers
 # ------------------------------------------------------------
@@ -3,7 +3,7 @@ Car class with physics, collision detection, and state management.
 """
 import math
 from typing import List, Tuple
-import pygame
+import numpy as np
 
 Vec2 = Tuple[float, float]
 Segment = Tuple[Vec2, Vec2]
@@ -53,8 +53,9 @@ class Car:
         self.pos[0] = max(min_x, min(max_x, self.pos[0]))
         self.pos[1] = max(min_y, min(max_y, self.pos[1]))
     
-    def get_hitbox(self) -> pygame.Rect:
+    def get_hitbox(self) -> "pygame.Rect":
         """Get the rectangular hitbox for collision detection."""
+        import pygame
         return pygame.Rect(
             int(self.pos[0] - self.width/2), 
             int(self.pos[1] - self.height/2), 
@@ -64,11 +65,109 @@ class Car:
     
     def check_collision(self, walls: List[Segment]) -> bool:
         """Check if the car's hitbox collides with any wall."""
-        car_rect = self.get_hitbox()
+        # Same box as get_hitbox(), tested without pygame so headless envs never import it
+        left = int(self.pos[0] - self.width/2)
+        top = int(self.pos[1] - self.height/2)
         
         # Check each wall segment for collision with the car rectangle
         for (a, b) in walls:
-            # Check if line segment intersects with rectangle
-            if car_rect.clipline(a, b):
+            if _clips(a, b, left, top, self.width, self.height):
                 return True
         return False
+
+
+# ------------------------------------------------------------
+# Batched versions, for planners that simulate many cars at once
+# ------------------------------------------------------------
+
+def update_many(car: Car, pos: np.ndarray, velocity: np.ndarray, heading: np.ndarray,
+                steer, throttle, brake, dt: float):
+    """
+    Car.update for N cars with `car`'s constants, in place: pos and velocity are
+    (N, 2) float arrays, heading (N,); steer, throttle and brake broadcast to (N,).
+    """
+    heading += np.asarray(steer) * dt * 2.0
+    fx, fy = np.cos(heading), np.sin(heading)
+    v_long = fx * velocity[:, 0] + fy * velocity[:, 1]
+
+    a = car.acceleration * np.asarray(throttle) - car.brake * np.asarray(brake) * np.copysign(1.0, v_long)
+    v_long = (v_long + a * dt) * max(0.0, 1.0 - car.friction * dt)
+    np.clip(v_long, -0.25 * car.max_speed, car.max_speed, out=v_long)
+
+    velocity[:, 0] = fx * v_long
+    velocity[:, 1] = fy * v_long
+    pos += velocity * dt
+
+
+def _outcode(x: int, y: int, left: int, top: int, right: int, bottom: int) -> int:
+    """Cohen-Sutherland region bits: 1 above, 2 below, 4 left of, 8 right of the box."""
+    return (y < top) | (y > bottom) << 1 | (x < left) << 2 | (x > right) << 3
+
+
+def _div(a: int, b: int) -> int:
+    """C integer division (truncates toward zero)."""
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _clips(a: Vec2, b: Vec2, left: int, top: int, width: int, height: int) -> bool:
+    """
+    bool(pygame.Rect(left, top, width, height).clipline(a, b)) without pygame: the same
+    integer Cohen-Sutherland clipping SDL does, so corner grazes round the same way.
+    """
+    if width <= 0 or height <= 0:
+        return False
+    x1, y1, x2, y2 = int(a[0]), int(a[1]), int(b[0]), int(b[1])
+    right, bottom = left + width - 1, top + height - 1
+    if x1 == x2 or y1 == y2:
+        # Axis-aligned: clipping only has to find the overlap
+        return (min(x1, x2) <= right and max(x1, x2) >= left
+                and min(y1, y2) <= bottom and max(y1, y2) >= top)
+    code1 = _outcode(x1, y1, left, top, right, bottom)
+    code2 = _outcode(x2, y2, left, top, right, bottom)
+    while code1 or code2:
+        if code1 & code2:
+            return False
+        # Move the outside end onto the box edge it is beyond (top, bottom, left, right)
+        code = code1 or code2
+        if code & 3:
+            y = top if code & 1 else bottom
+            x = x1 + _div((x2 - x1) * (y - y1), y2 - y1)
+        else:
+            x = left if code & 4 else right
+            y = y1 + _div((y2 - y1) * (x - x1), x2 - x1)
+        if code1:
+            x1, y1 = x, y
+            code1 = _outcode(x1, y1, left, top, right, bottom)
+        else:
+            x2, y2 = x, y
+            code2 = _outcode(x2, y2, left, top, right, bottom)
+    return True
+
+
+def hits_walls(pos: np.ndarray, walls: np.ndarray, width: int = 40, height: int = 24) -> np.ndarray:
+    """
+    Car.check_collision for N cars at `pos` (N, 2) against walls packed by
+    sensors.walls_to_array: whether any wall crosses each car's hitbox. Like
+    Rect.clipline, the box covers whole pixels [left, left + width - 1] and wall
+    ends are truncated to ints. Returns (N,) bool.
+    """
+    ends = np.trunc(np.concatenate([walls[:, :2], walls[:, :2] + walls[:, 2:]], axis=1))
+    ax, ay = ends[:, 0], ends[:, 1]
+    sx, sy = ends[:, 2] - ax, ends[:, 3] - ay                        # (W,)
+    left = np.trunc(pos[:, 0:1] - width / 2)                         # (N, 1)
+    top = np.trunc(pos[:, 1:2] - height / 2)
+
+    # Liang-Barsky: the part of each wall inside the box is u in [lo, hi]
+    lo = np.zeros((len(pos), len(walls)))
+    hi = np.ones((len(pos), len(walls)))
+    inside = np.ones((len(pos), len(walls)), dtype=bool)
+    for p, q in ((-sx, ax - left), (sx, left + width - 1 - ax),
+                 (-sy, ay - top), (sy, top + height - 1 - ay)):
+        p = np.broadcast_to(p, q.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u = q / p
+        inside &= (p != 0) | (q >= 0)
+        lo = np.where(p < 0, np.maximum(lo, u), lo)
+        hi = np.where(p > 0, np.minimum(hi, u), hi)
+    return (inside & (lo <= hi)).any(axis=1)
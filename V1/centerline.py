@@ -0,0 +1,127 @@
+"""
+Track centerline: a closed polyline parameterized by arc length.
+
+Progress along the track is measured by projecting the car onto the centerline
+instead of by the distance to the next checkpoint, so it stays meaningful on
+corners and on tracks made of many short segments.
+"""
+import bisect
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+Vec2 = Tuple[float, float]
+
+
+class Centerline:
+    """
+    Closed polyline through `points` (the last point connects back to the first).
+
+    `s[i]` is the arc length at points[i] and `length` the length of the loop.
+    A uniform grid over the track lists, for every cell, the only segments that can
+    be nearest to a point inside it, so project() looks at a handful of segments
+    however long the track is. Points outside the grid fall back to all segments.
+    """
+
+    def __init__(self, points: Sequence[Vec2], cell: float = 50.0, pad: float = 100.0):
+        pts = np.asarray(points, dtype=np.float64)
+        if len(pts) < 2:
+            raise ValueError("a centerline needs at least 2 points")
+        self.points = pts
+        self.a = pts
+        self.d = np.roll(pts, -1, axis=0) - pts
+        self.seg_len = np.hypot(self.d[:, 0], self.d[:, 1])
+        if not (self.seg_len > 0).all():
+            raise ValueError("centerline has repeated consecutive points")
+        self.s = np.concatenate([[0.0], np.cumsum(self.seg_len)])
+        self.length = float(self.s[-1])
+        self._s = self.s.tolist()
+
+        # Per-segment constants as Python floats: project() runs every env step
+        self._segs = [
+            (float(ax), float(ay), float(dx), float(dy), float(dx * dx + dy * dy), float(s0))
+            for (ax, ay), (dx, dy), s0 in zip(self.a, self.d, self.s[:-1])
+        ]
+        self._build_grid(cell, pad)
+
+    # -----------------------------------
+    # Spatial index
+    # -----------------------------------
+
+    def _build_grid(self, cell, pad):
+        lo = self.points.min(axis=0) - pad
+        hi = self.points.max(axis=0) + pad
+        self.cell = float(cell)
+        self.origin = (float(lo[0]), float(lo[1]))
+        self.nx, self.ny = (int(v) for v in np.ceil((hi - lo) / cell))
+
+        # Cell centers, (C, 2)
+        gx, gy = np.meshgrid(np.arange(self.nx), np.arange(self.ny), indexing="ij")
+        centers = np.stack([gx.ravel(), gy.ravel()], axis=1) * cell + lo + cell / 2
+        dist = self._distances(centers)  # (C, S)
+
+        # Any point of a cell is within half a diagonal h of its center, so its
+        # nearest segment is within nearest(center) + h of it; a segment farther
+        # than nearest(center) + 2h from the center can never win anywhere in the cell
+        h = cell * math.sqrt(0.5)
+        keep = dist <= dist.min(axis=1, keepdims=True) + 2 * h + 1e-9
+        self._cells = [np.flatnonzero(row).tolist() for row in keep]
+
+    def _distances(self, p):
+        """(P, S) distance from every point to every segment."""
+        rel = p[:, None, :] - self.a[None]
+        t = np.clip((rel * self.d).sum(-1) / self.seg_len ** 2, 0.0, 1.0)
+        off = rel - t[..., None] * self.d
+        return np.hypot(off[..., 0], off[..., 1])
+
+    def _candidates(self, x, y):
+        i = int((x - self.origin[0]) // self.cell)
+        j = int((y - self.origin[1]) // self.cell)
+        if 0 <= i < self.nx and 0 <= j < self.ny:
+            return self._cells[i * self.ny + j]
+        return range(len(self._segs))
+
+    # -----------------------------------
+    # Queries
+    # -----------------------------------
+
+    def project(self, pos: Vec2) -> Tuple[float, float]:
+        """(arc length, distance) of the closest centerline point to `pos`."""
+        x, y = float(pos[0]), float(pos[1])
+        best_d2, best_s = math.inf, 0.0
+        for k in self._candidates(x, y):
+            ax, ay, dx, dy, l2, s0 = self._segs[k]
+            rx, ry = x - ax, y - ay
+            t = min(max((rx * dx + ry * dy) / l2, 0.0), 1.0)
+            ox, oy = rx - t * dx, ry - t * dy
+            d2 = ox * ox + oy * oy
+            if d2 < best_d2:
+                best_d2, best_s = d2, s0 + t * math.sqrt(l2)
+        return best_s % self.length, math.sqrt(best_d2)
+
+    def project_many(self, pos) -> Tuple[np.ndarray, np.ndarray]:
+        """project() for (N, 2) points at once: arc lengths and distances, each (N,)."""
+        p = np.asarray(pos, dtype=np.float64).reshape(-1, 2)
+        # Every segment is checked; vectorized that beats the grid for tracks of a few segments
+        rel = p[:, None, :] - self.a[None]
+        t = np.clip((rel * self.d).sum(-1) / self.seg_len ** 2, 0.0, 1.0)
+        off = rel - t[..., None] * self.d
+        d2 = off[..., 0] ** 2 + off[..., 1] ** 2
+        k = d2.argmin(axis=1)
+        rows = np.arange(len(p))
+        return (self.s[k] + t[rows, k] * self.seg_len[k]) % self.length, np.sqrt(d2[rows, k])
+
+    def point_at(self, s: float) -> Vec2:
+        """Centerline point at arc length `s` (wrapped around the loop)."""
+        s %= self.length
+        k = min(bisect.bisect_right(self._s, s) - 1, len(self._segs) - 1)
+        ax, ay, dx, dy, l2, s0 = self._segs[k]
+        t = (s - s0) / math.sqrt(l2)
+        return ax + t * dx, ay + t * dy
+
+    def delta(self, s0: float, s1: float) -> float:
+        """Signed arc length from s0 to s1 the short way round (+ = driving direction)."""
+        half = self.length / 2
+        return (s1 - s0 + half) % self.length - half
+
@@ -0,0 +1,47 @@
+"""
+The last few observations as one flat array, without copying them every step.
+
+    history = History(4, (5,))
+    history.reset()             # new episode: the next push fills the whole window
+    obs = history.push(frame)   # (20,) view, oldest frame first
+
+Frames go into a ring whose first length - 1 slots are mirrored past its end, so
+the newest `length` frames are always contiguous and push() returns a slice of the
+ring: one frame is written per step (two for the mirrored slots) instead of the
+`length` frames a copying stack writes.
+
+The ring holds 2 * length slots, so a returned stack is left untouched for the
+next `length` pushes: across the next step (for (obs, next_obs) pairs) and across
+a reset (for wrappers that keep the final observation of an episode). Copy a
+stack to keep it longer. (gymnasium's env checker flags the shared memory; the
+default history of 1 returns fresh arrays as before.)
+
+Keep in sync with V3/history.py (identical apart from this note): each version folder
+runs on its own and never imports from another.
+"""
+import numpy as np
+
+
+class History:
+    def __init__(self, length, frame_shape, dtype=np.float32):
+        self.length = int(length)
+        self.slots = 2 * self.length
+        self.ring = np.zeros((self.slots + self.length - 1,) + tuple(frame_shape), dtype=dtype)
+        self.pos = -1  # slot of the newest frame
+        self.fill = True
+
+    def reset(self):
+        self.fill = True
+
+    def push(self, frame):
+        """Add the newest frame and return the stack ending with it (a view into the ring)."""
+        for _ in range(self.length if self.fill else 1):
+            self.pos = (self.pos + 1) % self.slots
+            self.ring[self.pos] = frame
+            if self.pos < self.length - 1:
+                self.ring[self.pos + self.slots] = frame
+        self.fill = False
+        start = self.pos - self.length + 1
+        if start < 0:
+            start += self.slots
+        return self.ring[start:start + self.length].reshape(-1)
@@ -1,13 +1,14 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-import pygame
 import math
 
-from build_track import square_track
+from build_track import square_centerline, square_track
 from car import Car
-from sensors import lidar8
-from rendering import BG_COLOR, draw_walls, draw_car, draw_rays, draw_hud
+from centerline import Centerline
+from history import History
+from sensors import LidarSensor, walls_to_array
+from snapshot import as_record, load_extras, save_extras, state_dtype
 
 # --------------------------------------------------------------
 # Constants
@@ -52,10 +53,16 @@ def generate_checkpoints(margin=60, width=WIDTH, height=HEIGHT, num_per_side=3):
 class LidarLapEnv(gym.Env):
     metadata = {"render_modes": ["human"], "render_fps": 30}
 
-    def __init__(self, render_mode=None):
+    def __init__(self, render_mode=None, sensor=None, history=1):
         super().__init__()
         self.render_mode = render_mode
 
+        # Default sensor = the original 8 world-aligned compass rays
+        self.sensor = sensor if sensor is not None else LidarSensor(
+            num_rays=8, fov_deg=360.0, relative=False, max_range=R_MAX
+        )
+        self.num_rays = self.sensor.num_rays
+
         # ---------------- RL API ----------------
         # [steering, throttle]
         self.action_space = spaces.Box(
@@ -64,19 +71,35 @@ class LidarLapEnv(gym.Env):
             dtype=np.float32,
         )
 
-        # Observation = 8 LiDAR + speed + heading_sin + heading_cos + progress_dir(2) = 12 floats
+        # Observation = N LiDAR + speed + heading_sin + heading_cos + progress_dir(2) = N + 5 floats,
+        # for each of the last `history` steps (oldest first)
+        self.history = History(history, (self.num_rays + 5,)) if history > 1 else None
         self.observation_space = spaces.Box(
-            low=0.0, high=1.0, shape=(13,), dtype=np.float32
+            low=0.0, high=1.0, shape=((self.num_rays + 5) * history,), dtype=np.float32
         )
 
         # ---------------- Simulation ----------------
         self.walls = square_track(WIDTH, HEIGHT, MARGIN)
+        self.wall_array = walls_to_array(self.walls)
         self.car = Car(WIDTH * 0.25, HEIGHT * 0.35, CAR_WIDTH, CAR_HEIGHT)
-        self.checkpoints = generate_checkpoints(margin=MARGIN+30, num_per_side=3)
+        self.checkpoints = np.array(generate_checkpoints(margin=MARGIN+30, num_per_side=3))
         self.num_checkpoints = len(self.checkpoints)
 
+        # Progress is arc length along the lane's centerline; a checkpoint counts
+        # once the car's projection passes the checkpoint's own projection
+        self.centerline = Centerline(square_centerline(WIDTH, HEIGHT, MARGIN))
+        self.checkpoint_s = [self.centerline.project(cp)[0] for cp in self.checkpoints]
+
+        # Reused every step: the observation is assembled in place and the
+        # LiDAR scan is written straight into its first num_rays entries
+        self._obs = np.zeros(self.num_rays + 5, dtype=np.float32)
+        self._lidar = self._obs[:self.num_rays]
+
         self.current_cp = 0
         self.laps_completed = 0
+        self.track_s = 0.0    # car's arc length on the centerline
+        self.travel = 0.0     # signed arc length driven since reset
+        self.next_event = 0.0  # travel at which current_cp is reached
 
         self.font = None
         self.clock = None
@@ -86,25 +109,37 @@ class LidarLapEnv(gym.Env):
         self.steps = 0
         self.max_steps = 4000
 
+        # get_state() record: car, progress and episode counters (plus RNG and history)
+        self.state_dtype = state_dtype([
+            ("pos", "<f8", 2), ("velocity", "<f8", 2), ("heading", "<f8"),
+            ("current_cp", "<i4"), ("laps_completed", "<i4"), ("steps", "<i4"),
+            ("track_s", "<f8"), ("travel", "<f8"), ("next_event", "<f8"),
+        ], self.history)
+
+        # pygame is only needed to draw; headless envs never import it
         if render_mode == "human":
+            import pygame
             pygame.init()
             self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
             pygame.display.set_caption("LiDAR-Lap RL Environment")
-            self.font = pygame.font.SysFont("consolas", 14)
             self.clock = pygame.time.Clock()
 
     # ---------------------------------------------------------
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
-        start_cp = np.array(self.checkpoints[0])
-        next_cp = np.array(self.checkpoints[1])
+        (sx, sy), (nx, ny) = self.checkpoints[0].tolist(), self.checkpoints[1].tolist()
 
-        self.car = Car(start_cp[0], start_cp[1], CAR_WIDTH, CAR_HEIGHT)
-        self.car.heading_r = math.atan2(next_cp[1] - start_cp[1], next_cp[0] - start_cp[0])
+        self.car = Car(sx, sy, CAR_WIDTH, CAR_HEIGHT)
+        self.car.heading_r = math.atan2(ny - sy, nx - sx)
         self.current_cp = 1
         self.laps_completed = 0
         self.steps = 0
-        self.prev_dist = np.linalg.norm(next_cp - start_cp)
+        self.track_s = self.centerline.project((sx, sy))[0]
+        self.travel = 0.0
+        self.next_event = (self.checkpoint_s[self.current_cp] - self.track_s) % self.centerline.length
+        self.sensor.reset()
+        if self.history is not None:
+            self.history.reset()
         obs = self._get_obs()
         return obs, {}
 
@@ -117,11 +152,11 @@ class LidarLapEnv(gym.Env):
             MARGIN + 5, WIDTH - MARGIN - 5, MARGIN + 5, HEIGHT - MARGIN - 5
         )
 
-        lidar = lidar8((self.car.pos[0], self.car.pos[1]), self.walls, R_MAX)
-        lidar = np.clip(np.nan_to_num(lidar, nan=1.0, posinf=1.0, neginf=0.0), 0.0, 1.0)
+        lidar = self._scan()
 
-        reward, done = self._compute_reward(lidar)
+        reward, done, event = self._compute_reward(lidar)
         obs = self._get_obs(lidar)
+        info = {"crashed": done, "laps": self.laps_completed, "checkpoint": event}
 
         self.steps += 1
         if self.steps >= self.max_steps:
@@ -130,32 +165,68 @@ class LidarLapEnv(gym.Env):
         if self.render_mode == "human":
             self.render(lidar)
 
-        return obs, reward, done, False, {}
+        return obs, reward, done, False, info
+
+    # ---------------------------------------------------------
+    def get_state(self):
+        """The episode's dynamic state as one small record (see snapshot.py); bytes(state) serializes it."""
+        state = np.zeros(1, self.state_dtype)[0]
+        state["pos"], state["velocity"], state["heading"] = self.car.pos, self.car.velocity, self.car.heading_r
+        state["current_cp"], state["laps_completed"] = self.current_cp, self.laps_completed
+        state["steps"] = self.steps
+        state["track_s"], state["travel"], state["next_event"] = self.track_s, self.travel, self.next_event
+        save_extras(state, self.np_random, self.history)
+        return state
+
+    def set_state(self, state):
+        """Continue from a get_state() record (or its bytes)."""
+        state = as_record(state, self.state_dtype)
+        self.car.pos = state["pos"].tolist()
+        self.car.velocity = state["velocity"].tolist()
+        self.car.heading_r = float(state["heading"])
+        self.current_cp, self.laps_completed = int(state["current_cp"]), int(state["laps_completed"])
+        self.steps = int(state["steps"])
+        self.track_s, self.travel = float(state["track_s"]), float(state["travel"])
+        self.next_event = float(state["next_event"])
+        load_extras(state, self.np_random, self.history)
+        self.sensor.reset()  # the car may have jumped: incremental scans start over
+
+    # ---------------------------------------------------------
+    def _scan(self):
+        """Scan into the observation buffer and sanitize it in place."""
+        lidar = self._lidar
+        self.sensor.scan(
+            self.wall_array, self.car.pos, math.degrees(self.car.heading_r), rng=self.np_random, out=lidar[None]
+        )
+        np.nan_to_num(lidar, copy=False, nan=1.0, posinf=1.0, neginf=0.0)
+        return np.clip(lidar, 0.0, 1.0, out=lidar)
 
     # ---------------------------------------------------------
     def _compute_reward(self, lidar):
-        # Distance to next checkpoint
-        next_cp = np.array(self.checkpoints[self.current_cp])
-        dist_to_cp = np.linalg.norm(next_cp - self.car.pos)
-        progress = getattr(self, "prev_dist", dist_to_cp) - dist_to_cp
-        self.prev_dist = dist_to_cp
+        # Arc length driven along the centerline since the last step
+        s = self.centerline.project(self.car.pos)[0]
+        progress = self.centerline.delta(self.track_s, s)
+        self.track_s = s
+        self.travel += progress
 
         # --- Core reward ---
         reward = 0.2 * self.car.speed
-        reward += 0.1 * progress                     # reward getting closer to checkpoint
-        reward += 0.05 * np.mean(lidar)              # wall distance
+        reward += 0.1 * progress                     # reward moving along the track
+        reward += 0.05 * lidar.mean()                # wall distance
         reward -= 0.01                               # time penalty
 
-        # --- Checkpoint reached ---
-        if dist_to_cp < 30:
+        # --- Checkpoints passed (driving backwards never un-passes one) ---
+        event = None
+        while self.travel >= self.next_event:
             reward += 10
+            event = event or "checkpoint"
+            prev_s = self.checkpoint_s[self.current_cp]
             self.current_cp = (self.current_cp + 1) % self.num_checkpoints
-            self.prev_dist = np.linalg.norm(
-                np.array(self.checkpoints[self.current_cp]) - self.car.pos
-            )
+            self.next_event += (self.checkpoint_s[self.current_cp] - prev_s) % self.centerline.length
             if self.current_cp == 0:
                 self.laps_completed += 1
                 reward += 50  # bonus for completing lap
+                event = "lap"
 
         # --- Collision penalty ---
         if self.car.check_collision(self.walls):
@@ -164,30 +235,43 @@ class LidarLapEnv(gym.Env):
         else:
             done = False
 
-        return float(np.clip(reward, -25, 25)), done
+        return min(max(float(reward), -25.0), 25.0), done, event
 
     # ---------------------------------------------------------
     def _get_obs(self, lidar=None):
         if lidar is None:
-            lidar = lidar8((self.car.pos[0], self.car.pos[1]), self.walls, R_MAX)
-        lidar = np.clip(np.nan_to_num(lidar, nan=1.0, posinf=1.0, neginf=0.0), 0.0, 1.0)
+            lidar = self._scan()
+        obs = self._obs  # lidar already lives in obs[:num_rays], sanitized by _scan
+        r = self.num_rays
 
         v_norm = self.car.speed / (getattr(self.car, "max_speed", 5.0) + 1e-6)
-        heading_sin, heading_cos = np.sin(self.car.heading_r), np.cos(self.car.heading_r)
-
-        next_cp = np.array(self.checkpoints[self.current_cp])
-        vec_to_cp = next_cp - self.car.pos
-        dist_norm = np.clip(vec_to_cp / (R_MAX * 2), -1, 1)
-        dx, dy = (dist_norm[0] + 1)/2, (dist_norm[1] + 1)/2  # normalize to [0,1]
-
-        obs = np.array(list(lidar) + [v_norm, heading_sin, heading_cos, dx, dy], dtype=np.float32)
-        obs = np.nan_to_num(obs, nan=0.0, posinf=1.0, neginf=0.0)
-        return np.clip(obs, 0.0, 1.0)
+        obs[r] = v_norm
+        obs[r + 1] = math.sin(self.car.heading_r)
+        obs[r + 2] = math.cos(self.car.heading_r)
+
+        x, y = self.checkpoints[self.current_cp]
+        scale = R_MAX * 2
+        dx = min(max((x - self.car.pos[0]) / scale, -1.0), 1.0)
+        dy = min(max((y - self.car.pos[1]) / scale, -1.0), 1.0)
+        obs[r + 3] = (dx + 1) / 2  # normalize to [0,1]
+        obs[r + 4] = (dy + 1) / 2
+
+        np.nan_to_num(obs, copy=False, nan=0.0, posinf=1.0, neginf=0.0)
+        np.clip(obs, 0.0, 1.0, out=obs)
+        if self.history is not None:
+            return self.history.push(obs)  # copied into the ring; the stack is a view (see history.py)
+        # Callers keep observations across steps (replay buffers, rollouts), so hand out a copy
+        return obs.copy()
 
     # ---------------------------------------------------------
     def render(self, lidar=None):
         if self.screen is None:
             return
+        import pygame
+        from rendering import BG_COLOR, draw_walls, draw_car, draw_rays, draw_hud
+        if self.font is None:
+            # SysFont scans the system fonts, so only pay for it once something is drawn
+            self.font = pygame.font.SysFont("consolas", 14)
         self.screen.fill(BG_COLOR)
         draw_walls(self.screen, self.walls)
 
@@ -197,9 +281,10 @@ class LidarLapEnv(gym.Env):
             pygame.draw.circle(self.screen, color, (int(cp[0]), int(cp[1])), 6)
 
         if lidar is None:
-            lidar = lidar8((self.car.pos[0], self.car.pos[1]), self.walls, R_MAX)
+            lidar = self._scan()
 
-        draw_rays(self.screen, (self.car.pos[0], self.car.pos[1]), lidar, R_MAX)
+        draw_rays(self.screen, (self.car.pos[0], self.car.pos[1]), lidar, self.sensor.max_range,
+                  self.sensor.directions(math.degrees(self.car.heading_r))[0])
         draw_car(
             self.screen,
             (self.car.pos[0], self.car.pos[1]),
@@ -216,4 +301,5 @@ class LidarLapEnv(gym.Env):
     # ---------------------------------------------------------
     def close(self):
         if self.render_mode == "human":
+            import pygame
             pygame.quit()
@@ -0,0 +1,183 @@
+"""
+Sampling-based model-predictive controller for LidarLapEnv: a non-learned
+baseline, and an expert whose actions can be imitated.
+
+    planner = MPCPlanner(env, budget=0.01)
+    obs, _ = env.reset()
+    planner.reset()
+    obs, reward, done, _, info = env.step(planner.act(env))
+
+Every act() simulates `samples` candidate action sequences `horizon` steps ahead
+from the car's current state in one batched rollout (car.update_many for the
+physics, the LiDAR module's point-to-wall distances for clearance, car.hits_walls
+for the candidates near enough to a wall to touch it) and scores them by the arc
+length they drive along the centerline plus how far they keep from the walls; a
+crash ends a candidate's score with a penalty.
+The sampling distribution is refit to the best candidates (cross-entropy method)
+for as many rounds as fit in `budget` seconds (a round is only started if another
+one as long as the last still fits), and the best sequence's first action is
+returned. The rest of that sequence seeds the next call.
+
+    python planner.py --episodes 3 --budget 0.01
+    python planner.py --render
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+
+from car import hits_walls, update_many
+from lidar_env_laps import HEIGHT, MARGIN, R_MAX, WIDTH, LidarLapEnv
+from sensors import point_segment_distance
+
+ACTION_LOW = np.array([-1.0, 0.0])
+ACTION_HIGH = np.array([1.0, 1.0])
+
+
+class MPCPlanner:
+    """
+    Args:
+        env: LidarLapEnv to plan for (its track, car constants and step length)
+        samples: Candidate sequences per round
+        horizon: Steps simulated per candidate
+        hold: Candidates change action every `hold` steps (fewer knobs to search)
+        budget: Seconds act() may spend; at least one round always runs, so the
+            defaults keep a round (~5 ms) well inside the default 10 ms
+        max_rounds: Cap on rounds per act() regardless of the budget
+        elites: Best candidates the sampling distribution is refit to
+        clearance_weight: Score per step with the nearest wall at LiDAR range or farther
+        crash_penalty: Score lost by a candidate that crashes
+        seed: Seed for the candidate noise
+    """
+
+    def __init__(self, env, samples=128, horizon=24, hold=5, budget=0.01, max_rounds=8, elites=16,
+                 clearance_weight=2.0, crash_penalty=500.0, seed=None):
+        self.env = env
+        self.samples, self.horizon, self.hold = samples, horizon, hold
+        self.budget, self.max_rounds, self.elites = budget, max_rounds, elites
+        self.clearance_weight, self.crash_penalty = clearance_weight, crash_penalty
+        self.rng = np.random.default_rng(seed)
+        self.dt = 1 / 60  # LidarLapEnv.step
+        self.bounds = (MARGIN + 5, WIDTH - MARGIN - 5, MARGIN + 5, HEIGHT - MARGIN - 5)
+        self.init_std = np.array([0.6, 0.4])
+        self.reset()
+
+    def reset(self):
+        """Forget the previous plan (call after env.reset())."""
+        self.plan = np.tile([0.0, 0.5], (self.horizon, 1))
+        self.rounds = 0
+
+    # -----------------------------------
+    # Rollout
+    # -----------------------------------
+
+    def rollout(self, actions):
+        """
+        Simulate (N, horizon, 2) action sequences from the env's current state.
+        Returns each sequence's score (N,) and whether it crashed (N,).
+        """
+        env, car = self.env, self.env.car
+        n = len(actions)
+        pos = np.tile(np.asarray(car.pos, dtype=np.float64), (n, 1))
+        velocity = np.tile(np.asarray(car.velocity, dtype=np.float64), (n, 1))
+        heading = np.full(n, car.heading_r)
+        s = np.full(n, env.track_s)
+        alive = np.ones(n, dtype=bool)
+        score = np.zeros(n)
+        min_x, max_x, min_y, max_y = self.bounds
+        # A wall farther than the hitbox's farthest corner can't touch the car; the box is
+        # truncated to whole pixels, so a corner can sit up to a pixel farther out
+        reach = math.hypot(car.width / 2 + 1, car.height / 2 + 1) + 1e-6
+
+        for t in range(actions.shape[1]):
+            update_many(car, pos, velocity, heading, actions[:, t, 0], actions[:, t, 1], 0.0, self.dt)
+            np.clip(pos[:, 0], min_x, max_x, out=pos[:, 0])
+            np.clip(pos[:, 1], min_y, max_y, out=pos[:, 1])
+
+            s_next, _ = env.centerline.project_many(pos)
+            progress = env.centerline.delta(s, s_next)
+            s = s_next
+            wall = point_segment_distance(pos, env.wall_array).min(axis=1)
+            crashed = alive & (wall < reach)
+            crashed[crashed] = hits_walls(pos[crashed], env.wall_array, car.width, car.height)
+
+            clearance = np.minimum(wall / R_MAX, 1.0)
+            score += np.where(alive, progress + self.clearance_weight * clearance, 0.0)
+            score -= self.crash_penalty * crashed
+            alive &= ~crashed
+        return score, ~alive
+
+    def _sample(self, mean, std):
+        """`samples` sequences around `mean`, noise held for `hold` steps; the first is `mean`."""
+        knots = -(-self.horizon // self.hold)
+        noise = self.rng.normal(size=(self.samples, knots, 2)) * std
+        noise = np.repeat(noise, self.hold, axis=1)[:, :self.horizon]
+        noise[0] = 0.0
+        return np.clip(mean + noise, ACTION_LOW, ACTION_HIGH)
+
+    # -----------------------------------
+    # Control
+    # -----------------------------------
+
+    def act(self, env=None):
+        """Plan from the env's current state and return the action to take now."""
+        if env is not None:
+            self.env = env
+        start = time.perf_counter()
+        mean, std = self.plan, self.init_std
+        best, best_score = mean, -np.inf
+        self.rounds = 0
+        while True:
+            round_start = time.perf_counter()
+            candidates = self._sample(mean, std)
+            score, _ = self.rollout(candidates)
+            self.rounds += 1
+            i = int(score.argmax())
+            if score[i] > best_score:
+                best, best_score = candidates[i], score[i]
+            # Only start another round if one more (as long as this one) still fits the budget
+            now = time.perf_counter()
+            if self.rounds >= self.max_rounds or now - start + (now - round_start) > self.budget:
+                break
+            elite = candidates[np.argpartition(score, -self.elites)[-self.elites:]]
+            mean = elite.mean(axis=0)
+            std = np.maximum(elite.std(axis=(0, 1)), 0.05)
+
+        # Next call starts from the rest of this plan, holding its last action
+        self.plan = np.concatenate([best[1:], best[-1:]])
+        self.score = best_score
+        return best[0].astype(np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--max-steps", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=128)
+    parser.add_argument("--horizon", type=int, default=24)
+    parser.add_argument("--budget", type=float, default=0.01, help="planning seconds per step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--render", action="store_true")
+    args = parser.parse_args()
+
+    env = LidarLapEnv(render_mode="human" if args.render else None)
+    env.max_steps = args.max_steps
+    planner = MPCPlanner(env, samples=args.samples, horizon=args.horizon, budget=args.budget, seed=args.seed)
+
+    for ep in range(args.episodes):
+        env.reset(seed=ep)
+        planner.reset()
+        total, steps, rounds, plan_time, done, info = 0.0, 0, 0, 0.0, False, {}
+        while not done:
+            start = time.perf_counter()
+            action = planner.act(env)
+            plan_time += time.perf_counter() - start
+            rounds += planner.rounds
+            _, reward, done, _, info = env.step(action)
+            total += reward
+            steps += 1
+        print(f"Episode {ep} | Return: {total:.1f} | Laps: {info['laps']} | Steps: {steps} | "
+              f"Crashed: {info['crashed']} | {1000 * plan_time / steps:.1f} ms/step, "
+              f"{rounds / steps:.1f} rounds/step")
+    env.close()
@@ -68,13 +68,16 @@ def draw_car(screen: pygame.Surface, pos: Vec2, width: int, height: int,
         pygame.draw.rect(screen, color, rect, border_radius=4)
 
 
-def draw_rays(screen: pygame.Surface, p: Vec2, norm_dists: np.ndarray, r_max: float):
-    """Draw LiDAR rays from position p."""
+def draw_rays(screen: pygame.Surface, p: Vec2, norm_dists: np.ndarray, r_max: float,
+              dirs: Optional[np.ndarray] = None):
+    """Draw LiDAR rays from position p. dirs defaults to the 8 compass directions."""
+    if dirs is None:
+        dirs = DIRS_8
     px, py = int(p[0]), int(p[1])
     for i, nd in enumerate(norm_dists):
         if not np.isfinite(nd):
             continue
-        d = DIRS_8[i]
+        d = dirs[i]
         dist = float(nd) * r_max
         end_x = int(round(p[0] + d[0] * dist))
         end_y = int(round(p[1] + d[1] * dist))
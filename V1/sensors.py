@@ -2,7 +2,7 @@
 LiDAR sensor for distance measurement using ray casting.
 """
 import math
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Sequence, Union
 import numpy as np
 
 from geometry import ray_segment_hit, sub
@@ -23,6 +23,7 @@ DIRS_8 = np.array([
     (-1.0,  0.0),              # W
     (-1.0/ROOT2, -1.0/ROOT2),  # NW
 ], dtype=np.float32)
+_DIRS_8_TUPLES = [(float(d[0]), float(d[1])) for d in DIRS_8]
 
 
 def cast_ray(p: Vec2, dir_unit: Vec2, walls: List[Segment], r_max: float) -> float:
@@ -48,7 +49,8 @@ def cast_ray(p: Vec2, dir_unit: Vec2, walls: List[Segment], r_max: float) -> flo
     return min(dist, r_max)
 
 
-def lidar8(p: Vec2, walls: List[Segment], r_max: float = 100.0) -> np.ndarray:
+def lidar8(p: Vec2, walls: List[Segment], r_max: float = 100.0,
+           out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Perform 8-direction LiDAR scan from position p.
     
@@ -56,9 +58,253 @@ def lidar8(p: Vec2, walls: List[Segment], r_max: float = 100.0) -> np.ndarray:
         p: Position to scan from
         walls: List of wall segments
         r_max: Maximum sensing range
+        out: Optional float32 array of 8 to reuse instead of allocating a new one
     
     Returns:
         Numpy array of 8 normalized distances [0, 1]
     """
-    dists = [cast_ray(p, (float(d[0]), float(d[1])), walls, r_max) for d in DIRS_8]
-    return (np.array(dists, dtype=np.float32) / r_max).clip(0.0, 1.0)
+    if out is None:
+        out = np.empty(8, dtype=np.float32)
+    for i, d in enumerate(_DIRS_8_TUPLES):
+        out[i] = cast_ray(p, d, walls, r_max)
+    out /= r_max
+    return np.clip(out, 0.0, 1.0, out=out)
+
+
+
+def walls_to_array(walls: List[Segment]) -> np.ndarray:
+    """
+    Pack wall segments into a (W, 4) array of [ax, ay, sx, sy] rows,
+    where (sx, sy) = b - a. Build it once per track and pass it to LidarSensor.scan.
+    """
+    arr = np.asarray(walls, dtype=np.float64).reshape(-1, 2, 2)
+    return np.concatenate([arr[:, 0], arr[:, 1] - arr[:, 0]], axis=1)
+
+
+def _hit_distance(dx, dy, qpx, qpy, sx, sy) -> np.ndarray:
+    """Array form of ray_segment_hit; inf where the ray misses."""
+    rxs = dx * sy - dy * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (qpx * sy - qpy * sx) / rxs
+        u = (qpx * dy - qpy * dx) / rxs
+    hit = (np.abs(rxs) >= 1e-9) & (t >= 0.0) & (u >= 0.0) & (u <= 1.0)
+    return np.where(hit, t, np.inf)
+
+
+def point_segment_distance(pos: np.ndarray, walls: np.ndarray) -> np.ndarray:
+    """Distance from each point (N, 2) to each wall segment (W, 4) -> (N, W)."""
+    ax, ay, sx, sy = walls[:, 0], walls[:, 1], walls[:, 2], walls[:, 3]
+    px = pos[:, 0:1] - ax
+    py = pos[:, 1:2] - ay
+    ss = sx * sx + sy * sy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = np.where(ss > 0, (px * sx + py * sy) / ss, 0.0).clip(0.0, 1.0)
+    return np.hypot(px - u * sx, py - u * sy)
+
+
+class LidarSensor:
+    """
+    Configurable N-ray LiDAR that scans every ray of every car in one call.
+
+    Args:
+        num_rays: Number of rays per car
+        fov_deg: Angular spread of the rays; 360 spaces them evenly around the car
+        relative: If True rays turn with the car heading, otherwise they are fixed in world frame
+        max_range: Maximum sensing range in pixels
+        noise_std: Std-dev of Gaussian range noise as a fraction of max_range (0 disables noise)
+        center_deg: Direction of the central ray in world mode (screen coords, -90 = N)
+        incremental: Remember each ray's last hit wall and try it first on the next scan
+
+    With the defaults the sensor matches lidar8 / DIRS_8 within float32 rounding (a
+    reading can differ by one ULP: the rays come from cos/sin rather than the rounded
+    DIRS_8 and are divided by max_range before the float32 cast). Incremental mode returns
+    the same distances as a full scan; call reset() when the car teleports.
+
+    V3/sensors.py has a LidarSensor for image tracks with the same constructor
+    arguments, attributes and degree angles (ray_angles, scan headings); they stay two
+    classes because V1 intersects rays with wall segments and V3 marches a pixel mask.
+    Angles follow each version's heading: here screen coordinates (y down, so positive
+    turns clockwise), in V3 CarLidarEnv.angle (counter-clockwise).
+    """
+
+    def __init__(self, num_rays: int = 8, fov_deg: float = 360.0, relative: bool = False,
+                 max_range: float = 100.0, noise_std: float = 0.0, center_deg: float = -90.0,
+                 incremental: bool = False):
+        self.num_rays = int(num_rays)
+        self.fov_deg = float(fov_deg)
+        self.relative = relative
+        self.max_range = float(max_range)
+        self.noise_std = float(noise_std)
+        self.center_deg = float(center_deg)
+
+        if self.fov_deg >= 360.0:
+            offsets = np.arange(self.num_rays) * (360.0 / self.num_rays)
+        elif self.num_rays == 1:
+            offsets = np.zeros(1)
+        else:
+            offsets = np.linspace(-self.fov_deg / 2, self.fov_deg / 2, self.num_rays)
+        self.offsets_deg = offsets
+        self.offsets = np.radians(offsets)
+
+        # World-frame rays never turn, so their directions are computed once
+        angles = math.radians(self.center_deg) + self.offsets
+        self._world_dirs = np.stack([np.cos(angles), np.sin(angles)], axis=-1)[None]
+        self._work = {}
+
+        self.incremental = incremental
+        self.reset()
+
+    def reset(self):
+        """Forget the remembered hit walls (next incremental scan is a full one)."""
+        self._last_wall: Optional[np.ndarray] = None
+        self.verified = 0
+        self.fallbacks = 0
+
+    def ray_angles(self, headings: Union[float, Sequence[float]]) -> np.ndarray:
+        """Absolute ray angles in degrees, shape (N, num_rays)."""
+        headings = np.atleast_1d(np.asarray(headings, dtype=np.float64))
+        if not self.relative:
+            headings = np.full_like(headings, self.center_deg)
+        return headings[:, None] + self.offsets_deg[None, :]
+
+    def directions(self, headings: Union[float, Sequence[float], None] = None) -> np.ndarray:
+        """Unit ray directions, shape (N, num_rays, 2). Headings are in degrees."""
+        if not self.relative:
+            n = 1 if headings is None else np.size(headings)
+            return np.broadcast_to(self._world_dirs, (n,) + self._world_dirs.shape[1:])
+        base = np.radians(np.atleast_1d(np.asarray(headings, dtype=np.float64)))
+        angles = base[:, None] + self.offsets[None, :]
+        return np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+
+    def scan(self, walls: Union[List[Segment], np.ndarray], positions,
+             headings=None, rng: Optional[np.random.Generator] = None,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Scan all rays for all cars.
+
+        Args:
+            walls: Wall segments, or the (W, 4) array from walls_to_array
+            positions: Car positions, shape (N, 2) or a single (x, y)
+            headings: Car headings in degrees, shape (N,) (ignored in world mode)
+            rng: Generator for range noise (defaults to a fresh one)
+            out: Optional float32 (N, num_rays) array to write the result into
+
+        Returns:
+            Array of shape (N, num_rays) with distances normalized to [0, 1]
+        """
+        if not isinstance(walls, np.ndarray):
+            walls = walls_to_array(walls)
+        pos = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        dirs = self.directions(headings if headings is not None else np.zeros(len(pos)))
+        if self.incremental:
+            dist = self._ray_walls_incremental(pos, dirs, walls)
+        else:
+            dist, _ = self._ray_walls(pos, dirs, walls)
+
+        if self.noise_std > 0.0:
+            rng = rng if rng is not None else np.random.default_rng()
+            dist = dist + rng.normal(0.0, self.noise_std * self.max_range, size=dist.shape)
+
+        if out is None:
+            return (dist / self.max_range).clip(0.0, 1.0).astype(np.float32)
+        np.divide(dist, self.max_range, out=dist)
+        np.clip(dist, 0.0, 1.0, out=dist)
+        out[...] = dist
+        return out
+
+    def _workspace(self, shape):
+        """Scratch arrays for _ray_walls, reused across scans of the same (N, R, W) shape."""
+        work = self._work.get(shape)
+        if work is None:
+            n, r, w = shape
+            work = self._work[shape] = dict(
+                qpx=np.empty((n, 1, w)), qpy=np.empty((n, 1, w)),
+                rxs=np.empty(shape), t=np.empty(shape), u=np.empty(shape), tmp=np.empty(shape),
+                hit=np.empty(shape, dtype=bool), cond=np.empty(shape, dtype=bool),
+            )
+        return work
+
+    def _ray_walls(self, pos: np.ndarray, dirs: np.ndarray, walls: np.ndarray):
+        """
+        Vectorized ray_segment_hit over (cars, rays, walls), computed in reusable
+        scratch arrays (same arithmetic as _hit_distance).
+
+        Returns raw distances (N, R) and the index of the wall hit (-1 for none).
+        """
+        n, r = dirs.shape[:2]
+        ws = self._workspace((n, r, walls.shape[0]))
+        qpx, qpy, rxs, t, u, tmp = ws["qpx"], ws["qpy"], ws["rxs"], ws["t"], ws["u"], ws["tmp"]
+        hit, cond = ws["hit"], ws["cond"]
+
+        dx, dy = dirs[..., 0:1], dirs[..., 1:2]                      # (N, R, 1)
+        sx, sy = walls[:, 2], walls[:, 3]
+        np.subtract(walls[None, None, :, 0], pos[:, None, None, 0], out=qpx)   # (N, 1, W)
+        np.subtract(walls[None, None, :, 1], pos[:, None, None, 1], out=qpy)
+
+        np.multiply(dx, sy, out=rxs)
+        rxs -= np.multiply(dy, sx, out=tmp)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.multiply(qpx, sy, out=t)
+            t -= np.multiply(qpy, sx, out=tmp)
+            t /= rxs
+            np.multiply(qpx, dy, out=u)
+            u -= np.multiply(qpy, dx, out=tmp)
+            u /= rxs
+
+        np.greater_equal(np.abs(rxs, out=tmp), 1e-9, out=hit)
+        hit &= np.greater_equal(t, 0.0, out=cond)
+        hit &= np.greater_equal(u, 0.0, out=cond)
+        hit &= np.less_equal(u, 1.0, out=cond)
+        np.copyto(t, np.inf, where=np.logical_not(hit, out=cond))
+
+        idx = t.argmin(axis=-1)
+        t_min = np.take_along_axis(t, idx[..., None], axis=-1)[..., 0]
+        idx[np.isinf(t_min)] = -1
+        return np.minimum(t_min, self.max_range, out=t_min), idx
+
+    def _ray_walls_incremental(self, pos: np.ndarray, dirs: np.ndarray, walls: np.ndarray) -> np.ndarray:
+        """
+        Try each ray's previous wall first. A wall whose closest point is farther than
+        the candidate hit cannot be hit earlier, so the candidate is exact when every
+        other wall is farther away than it. Remaining rays fall back to a full search.
+        """
+        n, r = dirs.shape[:2]
+        if self._last_wall is None or self._last_wall.shape != (n, r):
+            dist, self._last_wall = self._ray_walls(pos, dirs, walls)
+            self.fallbacks += dist.size
+            return dist
+
+        # Candidate distance against the remembered wall (same arithmetic as a full scan)
+        last = self._last_wall
+        cand = walls[last.clip(0)]                                   # (N, R, 4)
+        t_c = _hit_distance(
+            dirs[..., 0], dirs[..., 1],
+            cand[..., 0] - pos[:, None, 0], cand[..., 1] - pos[:, None, 1],
+            cand[..., 2], cand[..., 3],
+        )
+        t_c = np.where(last >= 0, t_c, np.inf)
+        bound = np.minimum(t_c, self.max_range)
+
+        # Nearest wall other than the candidate, per car
+        d_wall = point_segment_distance(pos, walls)                 # (N, W)
+        if walls.shape[0] > 1:
+            order = np.argpartition(d_wall, 1, axis=1)[:, :2]
+            near = np.take_along_axis(d_wall, order, axis=1)
+            first = near.argmin(axis=1)
+            w1 = order[np.arange(n), first]
+            m1, m2 = near.min(axis=1), near.max(axis=1)
+            other = np.where(last == w1[:, None], m2[:, None], m1[:, None])
+        else:
+            other = np.where(last == 0, np.inf, d_wall[:, :1])
+
+        ok = other > bound * (1.0 + 1e-9) + 1e-9
+        dist = bound
+        if not ok.all():
+            ci, ri = np.nonzero(~ok)
+            d_full, i_full = self._ray_walls(pos[ci], dirs[ci, ri][:, None], walls)
+            dist[ci, ri] = d_full[:, 0]
+            last[ci, ri] = i_full[:, 0]
+
+        self.verified += int(ok.sum())
+        self.fallbacks += int((~ok).sum())
+        return dist
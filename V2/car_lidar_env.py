@@ -6,6 +6,9 @@ import numpy as np
 import math
 
 
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
 class CarLidarEnv(gym.Env):
     metadata = {"render_modes": ["human", None], "render_fps": 60}
 
@@ -41,9 +44,15 @@ class CarLidarEnv(gym.Env):
         self.clock = pygame.time.Clock()
 
         # Load track and car
-        self.track = pygame.image.load(f"track{self.track_num}.png").convert()
+        # .convert() needs a display; headless envs keep the decoded surface as is
+        has_display = pygame.display.get_surface() is not None
+        self.track = pygame.image.load(os.path.join(ASSET_DIR, f"track{self.track_num}.png"))
+        if has_display:
+            self.track = self.track.convert()
         self.track = pygame.transform.scale(self.track, (self.WIDTH, self.HEIGHT))
-        self.car_image = pygame.image.load("car.png").convert_alpha()
+        self.car_image = pygame.image.load(os.path.join(ASSET_DIR, "car.png"))
+        if has_display:
+            self.car_image = self.car_image.convert_alpha()
         self.car_image = pygame.transform.scale(self.car_image, (35, 30))
         self.car_w, self.car_h = self.car_image.get_size()
 
@@ -185,7 +194,6 @@ class CarLidarEnv(gym.Env):
 
         obs = self.get_lidar_readings()
         truncated = False
-        info = {}
 
         if self.render_mode == "human":
             self.render()
@@ -198,6 +206,8 @@ class CarLidarEnv(gym.Env):
         elif result == "lap":
             reward += 20.0     # huge reward for completing the track
 
+        info = {"crashed": terminated, "checkpoint": result}
+
 
         return obs, reward, terminated, truncated, info
 
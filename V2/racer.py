@@ -48,17 +48,32 @@ def check_collision(corners, track_surface):
                 return True
     return False
 
-def cast_lidar(center_x, center_y, angle_deg, track_surface, max_distance=250, step=2):
-    """Cast one lidar ray and return the hit point and distance."""
+def cast_lidar(center_x, center_y, angle_deg, track_surface, max_distance=250):
+    """Cast one lidar ray and return the hit point and distance.
+
+    Walks the pixel grid (Amanatides & Woo): every pixel the ray crosses is tested
+    once, in order, and the distance is where the ray enters the wall pixel.
+    """
     rad = math.radians(-angle_deg)
     cos_a, sin_a = math.cos(rad), math.sin(rad)
-    for dist in range(0, max_distance, step):
-        cx = int(center_x + cos_a * dist)
-        cy = int(center_y + sin_a * dist)
+    cx, cy = math.floor(center_x), math.floor(center_y)
+    step_x = 1 if cos_a > 0 else -1
+    step_y = 1 if sin_a > 0 else -1
+    delta_x = abs(1 / cos_a) if cos_a else math.inf
+    delta_y = abs(1 / sin_a) if sin_a else math.inf
+    next_x = ((cx + 1 - center_x) if cos_a > 0 else (center_x - cx)) * delta_x if cos_a else math.inf
+    next_y = ((cy + 1 - center_y) if sin_a > 0 else (center_y - cy)) * delta_y if sin_a else math.inf
+
+    dist = 0.0
+    while dist < max_distance:
         if 0 <= cx < WIDTH and 0 <= cy < HEIGHT:
             color = track_surface.get_at((cx, cy))[:3]
             if color <= (100, 100, 100):
-                return (cx, cy), dist
+                return (int(center_x + cos_a * dist), int(center_y + sin_a * dist)), dist
+        if next_x < next_y:
+            dist, next_x, cx = next_x, next_x + delta_x, cx + step_x
+        else:
+            dist, next_y, cy = next_y, next_y + delta_y, cy + step_y
     return (int(center_x + cos_a * max_distance), int(center_y + sin_a * max_distance)), max_distance
 
 def get_lidar_readings(x, y, angle, track_surface):
@@ -1,69 +1,112 @@
 import os
-import pygame
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 import math
+from functools import cached_property
+
+from collision import CAR_SIZE, collides
+from history import History
+from snapshot import as_record, load_extras, save_extras, state_dtype
+from sensors import LidarSensor, grid_traverse
+from telemetry import telemetry
+from track_assets import CHECKPOINT_COLORS, load_track_assets, track_numbers
+
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Start pose (x, y, angle) per track; the bundled tracks all start on the bottom straight
+START_POSES = {1: (400, 500, 0), 2: (400, 500, 0), 3: (400, 500, 0), 4: (400, 500, 0)}
+DEFAULT_START = (400, 500, 0)
 
 
 class CarLidarEnv(gym.Env):
     metadata = {"render_modes": ["human", None], "render_fps": 60}
 
-    def __init__(self, render_mode=None, track_num = 1):
+    def __init__(self, render_mode=None, track_num = 1, sensor=None, history=1):
         super().__init__()
-        pygame.init()
         self.WIDTH, self.HEIGHT = 800, 600
         self.render_mode = render_mode
         self.track_num = track_num
 
-        self.checkpoint_colors = [
-        # colors used with eye drop tool
-        # (255, 0, 255),     # CP0: magenta
-        # (0, 255, 255),     # CP1: cyan
-        # (255, 255, 0),     # CP2: yellow
-        # (255, 128, 0),     # CP3: orange
-        # (0, 255, 0),       # CP4: green
-
-        # real colors
-        (234, 51, 247),     # CP0: magenta
-        (117, 251, 253),     # CP1: cyan
-        (255, 255, 84),     # CP2: yellow
-        (240, 156, 73),     # CP3: orange
-        (117, 251, 76),       # CP4: green
-        ]
+        self.checkpoint_colors = CHECKPOINT_COLORS
         self.current_checkpoint = 0
 
+        # pygame is only needed to draw; headless envs never import it
+        self.screen = self.clock = None
         if render_mode == "human":
+            import pygame
+            pygame.init()
             self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
-        else:
-            self.screen = pygame.Surface((self.WIDTH, self.HEIGHT))
+            self.clock = pygame.time.Clock()
+            self.render_rng = np.random.default_rng()
 
-        self.clock = pygame.time.Clock()
+        self.use_track(track_num)
+        self.car_w, self.car_h = CAR_SIZE
 
-        # Load track and car
-        self.track = pygame.image.load(f"./tracks/track{self.track_num}.png").convert()
-        self.track = pygame.transform.scale(self.track, (self.WIDTH, self.HEIGHT))
-        self.car_image = pygame.image.load("car.png").convert_alpha()
-        self.car_image = pygame.transform.scale(self.car_image, (35, 30))
-        self.car_w, self.car_h = self.car_image.get_size()
+        # Default sensor = five rays at [-60, -30, 0, 30, 60] relative to the car
+        self.sensor = sensor if sensor is not None else LidarSensor()
 
         # Define action and observation spaces
         # Actions: [steer_left, steer_right, accelerate]
         self.action_space = spaces.Discrete(3)
 
-        # Observation: 5 LIDAR distances (normalized 0–1)
-        self.num_lidars = 5
-        self.observation_space = spaces.Box(low=0, high=1, shape=(self.num_lidars,), dtype=np.float32)
+        # Observation: N LIDAR distances (normalized 0–1), for each of the last
+        # `history` steps (oldest first) so a policy can tell speed and turning
+        self.num_lidars = self.sensor.num_rays
+        self.history = History(history, (self.num_lidars,)) if history > 1 else None
+        self.observation_space = spaces.Box(low=0, high=1, shape=(self.num_lidars * history,), dtype=np.float32)
 
         # Car parameters
         self.acceleration = 0.25
         self.friction = 0.05
         self.turn_speed = 4
         self.max_speed = 8
-        self.max_lidar = 250
+        self.max_lidar = self.sensor.max_range
+
+        # get_state() record: pose, velocity and episode counters (plus RNG and history)
+        self.state_dtype = state_dtype([
+            ("x", "<f8"), ("y", "<f8"), ("angle", "<f8"), ("velocity_x", "<f8"), ("velocity_y", "<f8"),
+            ("current_checkpoint", "<i4"), ("steps", "<i4"), ("lap_start", "<i4"), ("track_num", "<i4"),
+        ], self.history)
 
         self.reset()
 
+    def use_track(self, track_num, start_pose=None):
+        """
+        Point the env at another track. The track data is read-only and memory-mapped
+        from tracks/cache (shared by all processes), so this only rebinds arrays.
+        """
+        assets = load_track_assets(track_num, (self.WIDTH, self.HEIGHT))
+        self.track_num = track_num
+        self.track_pixels = assets.pixels
+        self.wall_mask = assets.wall_mask
+        self.wall_distance = assets.wall_distance
+        self.checkpoint_map = assets.checkpoint_map
+        self.empty_level = assets.empty_level
+        self.collision_table = assets.collision
+        self.start_pose = start_pose or START_POSES.get(track_num, DEFAULT_START)
+        self.__dict__.pop("track", None)  # drop the old track's sprite
+
+    # -----------------------------------
+    # Render assets (loaded on first use)
+    # -----------------------------------
+
+    @cached_property
+    def track(self):
+        import pygame
+        surface = pygame.surfarray.make_surface(self.track_pixels)
+        # .convert() needs a display
+        return surface.convert() if pygame.display.get_surface() is not None else surface
+
+    @cached_property
+    def car_image(self):
+        import pygame
+        image = pygame.image.load(os.path.join(ASSET_DIR, "car.png"))
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        return pygame.transform.scale(image, CAR_SIZE)
+
     # -----------------------------------
     # Utility functions
     # -----------------------------------
@@ -76,48 +119,56 @@ class CarLidarEnv(gym.Env):
         return [(cx + x * cos_a - y * sin_a, cy + x * sin_a + y * cos_a) for x, y in corners]
 
     def check_collision(self, corners):
+        """Corner-only test of a hitbox (misses walls between corners); step() uses collides()."""
         for (cx, cy) in corners:
-            if 0 <= cx < self.WIDTH and 0 <= cy < self.HEIGHT:
-                color = self.track.get_at((int(cx), int(cy)))[:3]
-                if color <= (100, 100, 100):
-                    return True
+            # wall_mask holds the `color <= (100, 100, 100)` test for every pixel
+            if 0 <= cx < self.WIDTH and 0 <= cy < self.HEIGHT and self.wall_mask[int(cx), int(cy)]:
+                return True
         return False
 
+    def collides(self, cx, cy, angle_deg):
+        """Whether any wall pixel lies under the whole car footprint at this pose (one table lookup)."""
+        return collides(self.collision_table, cx, cy, angle_deg)
+
     def cast_lidar(self, cx, cy, angle_deg):
+        """Distance in pixels to the first wall pixel the ray crosses (max_lidar if none)."""
         rad = math.radians(-angle_deg)
-        cos_a, sin_a = math.cos(rad), math.sin(rad)
-        for dist in range(0, self.max_lidar, 2):
-            lx = int(cx + cos_a * dist)
-            ly = int(cy + sin_a * dist)
-            if not (0 <= lx < self.WIDTH and 0 <= ly < self.HEIGHT):
-                return self.max_lidar
-            color = self.track.get_at((lx, ly))[:3]
-            if color <= (100, 100, 100):
-                return dist
-        return self.max_lidar
-
-    def get_lidar_readings(self):
-        angles = [-60, -30, 0, 30, 60]
-        readings = [self.cast_lidar(self.x, self.y, self.angle + a) / self.max_lidar for a in angles]
-        return np.array(readings, dtype=np.float32)
+        return float(grid_traverse(self.wall_mask, cx, cy, math.cos(rad), math.sin(rad), self.max_lidar))
+
+    def get_lidar_readings(self, rng=None):
+        """Normalized readings from the car's pose; sensor noise is drawn from `rng` (default: the env's)."""
+        return self.sensor.scan(self.wall_mask, (self.x, self.y), self.angle,
+                                rng=self.np_random if rng is None else rng, levels=self.empty_level)[0]
+
+    def observe(self):
+        """This step's readings, stacked behind the previous ones with `history` (a view; see history.py)."""
+        readings = self.get_lidar_readings()
+        return readings if self.history is None else self.history.push(readings)
     
     def check_checkpoint_pixel(self):
         # Get pixel under the car
         cx, cy = int(self.x), int(self.y)
-        color = self.track.get_at((cx, cy))[:3]
-
-        expected_color = self.checkpoint_colors[self.current_checkpoint]
-        # print("Pixel color at car:", color, "expected:", expected_color)
+        # Off the map there is no checkpoint (a negative index would wrap to the far edge)
+        if not (0 <= cx < self.WIDTH and 0 <= cy < self.HEIGHT):
+            return None
 
+        # checkpoint_map has bit i set where color_close(pixel, checkpoint_colors[i])
         # If car touches correct checkpoint color → progress!
-        if self.color_close(color, expected_color):
+        if self.checkpoint_map[cx, cy] >> self.current_checkpoint & 1:
             self.current_checkpoint += 1
+            telemetry.count("env/checkpoints")
 
-            print(f"Hit checkpoint {self.current_checkpoint} at ({cx}, {cy})")
+            # Console messages only when someone is watching; headless runs use telemetry
+            if self.render_mode == "human":
+                print(f"Hit checkpoint {self.current_checkpoint} at ({cx}, {cy})")
 
             # Completed all checkpoints? → Lap!
             if self.current_checkpoint >= len(self.checkpoint_colors):
-                print("Completed a LAP!") 
+                if self.render_mode == "human":
+                    print("Completed a LAP!")
+                telemetry.count("env/laps")
+                telemetry.observe("env/lap_steps", self.steps - self.lap_start)
+                self.lap_start = self.steps
                 self.current_checkpoint = 0
                 return "lap"
 
@@ -140,14 +191,19 @@ class CarLidarEnv(gym.Env):
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        self.x, self.y = 400, 500
-        self.angle = 0
+        self.x, self.y, self.angle = self.start_pose
         self.velocity_x, self.velocity_y = 0, 0
         self.crashed = False
-        obs = self.get_lidar_readings()
-        return obs, {}
+        self.current_checkpoint = 0
+        self.steps = self.lap_start = 0
+        self.sensor.reset()
+        if self.history is not None:
+            self.history.reset()
+        return self.observe(), {}
 
     def step(self, action):
+        self.steps += 1
+
         # Interpret action
         if action == 0:   # steer left
             self.angle += self.turn_speed
@@ -169,23 +225,22 @@ class CarLidarEnv(gym.Env):
         # Predict next position
         next_x = self.x + self.velocity_x
         next_y = self.y + self.velocity_y
-        corners = self.get_rotated_hitbox(next_x, next_y, self.car_w, self.car_h, self.angle)
 
         reward = 0.02  # small positive reward for surviving
         reward += 0.03 * speed # for speed
 
         # Collision check
-        if self.check_collision(corners):
+        if self.collides(next_x, next_y, self.angle):
             reward = -10.0
             terminated = True
+            telemetry.count("env/crashes")
             self.velocity_x = self.velocity_y = 0
         else:
             self.x, self.y = next_x, next_y
             terminated = False
 
-        obs = self.get_lidar_readings()
+        obs = self.observe()
         truncated = False
-        info = {}
 
         if self.render_mode == "human":
             self.render()
@@ -198,17 +253,49 @@ class CarLidarEnv(gym.Env):
         elif result == "lap":
             reward += 20.0     # huge reward for completing the track
 
+        info = {"crashed": terminated, "checkpoint": result}
+
 
         return obs, reward, terminated, truncated, info
 
+    def get_state(self):
+        """
+        The episode's dynamic state as one small record (see snapshot.py); bytes(state)
+        serializes it. MultiTrackEnv's place in its track schedule is not part of it.
+        """
+        state = np.zeros(1, self.state_dtype)[0]
+        state["x"], state["y"], state["angle"] = self.x, self.y, self.angle
+        state["velocity_x"], state["velocity_y"] = self.velocity_x, self.velocity_y
+        state["current_checkpoint"] = self.current_checkpoint
+        state["steps"], state["lap_start"] = self.steps, self.lap_start
+        state["track_num"] = self.track_num
+        save_extras(state, self.np_random, self.history)
+        return state
+
+    def set_state(self, state):
+        """Continue from a get_state() record (or its bytes)."""
+        state = as_record(state, self.state_dtype)
+        if int(state["track_num"]) != self.track_num:
+            self.use_track(int(state["track_num"]))
+        self.x, self.y, self.angle = float(state["x"]), float(state["y"]), float(state["angle"])
+        self.velocity_x, self.velocity_y = float(state["velocity_x"]), float(state["velocity_y"])
+        self.current_checkpoint = int(state["current_checkpoint"])
+        self.steps, self.lap_start = int(state["steps"]), int(state["lap_start"])
+        load_extras(state, self.np_random, self.history)
+        self.sensor.reset()  # the car may have jumped: incremental scans start over
+
     def render(self):
         if self.render_mode != "human":
             return
+        import pygame
         self.screen.blit(self.track, (0, 0))
         # Draw lidar
-        angles = [-60, -30, 0, 30, 60]
-        for a, dist in zip(angles, self.get_lidar_readings() * self.max_lidar):
-            rad = math.radians(-self.angle - a)
+        angles = self.sensor.ray_angles(self.angle)[0]
+        # Drawn rays use their own noise, so rendering never advances the env RNG
+        readings = self.get_lidar_readings(self.render_rng)
+        # tolist(): pygame rejects numpy float32 coordinates
+        for a, dist in zip(angles.tolist(), (readings * self.max_lidar).tolist()):
+            rad = math.radians(-a)
             end_x = self.x + math.cos(rad) * dist
             end_y = self.y + math.sin(rad) * dist
             pygame.draw.line(self.screen, (255, 255, 0), (self.x, self.y), (end_x, end_y), 2)
@@ -224,4 +311,60 @@ class CarLidarEnv(gym.Env):
 
 
     def close(self):
-        pygame.quit()
+        if self.screen is not None:
+            import pygame
+            pygame.quit()
+
+
+class MultiTrackEnv(CarLidarEnv):
+    """
+    CarLidarEnv that picks a track on every reset.
+
+    Args:
+        tracks: Track numbers to use (default: every tracks/track{n}.png)
+        schedule: "round_robin", "random" (uniform) or "weighted"
+        weights: Per-track weights for "weighted"
+        start_poses: Optional {track_num: (x, y, angle)} overriding START_POSES
+        history: Steps of readings per observation, as in CarLidarEnv
+
+    All tracks are attached once at construction, so switching costs nothing and a
+    step costs the same as on a single-track env. reset(options={"track": n}) forces
+    a track; the chosen track is reported in the reset info.
+    """
+
+    def __init__(self, render_mode=None, tracks=None, schedule="round_robin", weights=None,
+                 start_poses=None, sensor=None, history=1):
+        self.tracks = list(tracks or track_numbers())
+        if schedule not in ("round_robin", "random", "weighted"):
+            raise ValueError(f"unknown track schedule {schedule!r}")
+        if schedule == "weighted":
+            if weights is None or len(weights) != len(self.tracks):
+                raise ValueError("weighted schedule needs one weight per track")
+            self.probs = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+        else:
+            self.probs = None
+        self.schedule = schedule
+        self.start_poses = dict(start_poses or {})
+        self.episodes = 0
+
+        for n in self.tracks:
+            load_track_assets(n)  # attach every track up front
+        super().__init__(render_mode=render_mode, track_num=self.tracks[0], sensor=sensor, history=history)
+        self.episodes = 0  # the constructor's own reset doesn't count
+
+    def next_track(self):
+        if self.schedule == "round_robin":
+            return self.tracks[self.episodes % len(self.tracks)]
+        return self.tracks[self.np_random.choice(len(self.tracks), p=self.probs)]
+
+    def reset(self, seed=None, options=None):
+        gym.Env.reset(self, seed=seed)  # seed first so the track draw is reproducible
+        if options and "track" in options:
+            track = options["track"]
+        else:
+            track = self.next_track()
+            self.episodes += 1
+        self.use_track(track, self.start_poses.get(track))
+        obs, info = super().reset(options=options)
+        info["track"] = track
+        return obs, info
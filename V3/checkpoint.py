@@ -0,0 +1,84 @@
+"""
+Full DQN training-state checkpoints.
+
+A checkpoint is a directory:
+    state.pt       networks, optimizer, epsilon, step/episode counters, RNG states,
+                   the learner's owed updates and the replay buffer's n-step windows
+    replay/*.npy   the replay buffer as raw arrays (memory-mapped back on resume)
+
+Checkpoints are written to a temp directory and renamed into place; the `latest`
+file names the newest one, so a crash mid-save never leaves a half-written checkpoint.
+"""
+import os
+import random
+import shutil
+
+import numpy as np
+import torch
+
+
+def save_checkpoint(root, agent, buffer, global_step, episode, env=None, keep=2, learner=None):
+    """Write a checkpoint under `root` and keep only the newest `keep` of them."""
+    os.makedirs(root, exist_ok=True)
+    name = f"step_{global_step:09d}"
+    tmp = os.path.join(root, name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    state = {
+        "agent": agent.state_dict(),
+        "buffer": buffer.save(os.path.join(tmp, "replay")),
+        "global_step": global_step,
+        "episode": episode,
+        "rng": {
+            "python": random.getstate(),
+            "numpy": np.random.get_state(),
+            "torch": torch.get_rng_state(),
+        },
+    }
+    if env is not None:
+        state["env_rng"] = env.unwrapped.np_random.bit_generator.state
+    if learner is not None:
+        state["learner"] = learner.state_dict()
+    torch.save(state, os.path.join(tmp, "state.pt"))
+
+    final = os.path.join(root, name)
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+
+    with open(os.path.join(root, "latest.tmp"), "w") as f:
+        f.write(name)
+    os.replace(os.path.join(root, "latest.tmp"), os.path.join(root, "latest"))
+
+    old = sorted(d for d in os.listdir(root) if d.startswith("step_") and not d.endswith(".tmp"))
+    for d in old[:-keep]:
+        shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+    return final
+
+
+def latest_checkpoint(root):
+    """Path of the newest checkpoint under `root`, or None."""
+    try:
+        with open(os.path.join(root, "latest")) as f:
+            path = os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if os.path.isdir(path) else None
+
+
+def load_checkpoint(path, agent, buffer, env=None, mmap=True):
+    """
+    Restore everything save_checkpoint wrote. Returns (global_step, episode, learner_state);
+    pass learner_state to train() so the resumed learner owes what the saved one did.
+    """
+    state = torch.load(os.path.join(path, "state.pt"), weights_only=False)
+    agent.load_state_dict(state["agent"])
+    buffer.load(os.path.join(path, "replay"), state["buffer"], mmap=mmap)
+
+    random.setstate(state["rng"]["python"])
+    np.random.set_state(state["rng"]["numpy"])
+    torch.set_rng_state(state["rng"]["torch"])
+    if env is not None and "env_rng" in state:
+        env.unwrapped.np_random.bit_generator.state = state["env_rng"]
+
+    return state["global_step"], state["episode"], state.get("learner")
@@ -0,0 +1,96 @@
+"""
+Configuration-space collision table: can the car stand at (x, y, heading)?
+
+The car is a w x h rectangle centered on its position and rotated by its heading.
+For every heading bin the table holds, for every pixel, whether a car centered
+anywhere in that pixel overlaps a wall pixel anywhere under its footprint, so a
+collision test is one lookup instead of sampling the hitbox.
+
+Headings are binned around multiples of 360 / HEADING_BINS degrees. With the
+default 90 bins every heading the env can reach (it starts at 0 and turns in 4
+degree steps) is a bin center, so the only approximation is the pixel: the table
+is conservative by less than one pixel of car position.
+"""
+import math
+
+import numpy as np
+
+CAR_SIZE = (35, 30)
+HEADING_BINS = 90
+
+
+def footprint_rows(w, h, angle_deg):
+    """
+    {dy: (lo, hi)}: pixel offsets (dx, dy) touched by a w x h car rotated by `angle_deg`
+    whose center is anywhere in pixel (0, 0).
+
+    The car centered at u in [0, 1)^2 overlaps pixel d exactly when the open square
+    (d - 1, d + 1)^2 overlaps the rectangle centered at the origin, which a separating
+    axis test decides on the two grid axes and the two car axes. The footprint is
+    convex, so each row is one run of offsets.
+    """
+    rad = math.radians(-angle_deg)
+    c, s = abs(math.cos(rad)), abs(math.sin(rad))
+    hw, hh = w / 2, h / 2
+    ex, ey = hw * c + hh * s, hw * s + hh * c  # rectangle half-extents along x and y
+    r = int(math.ceil(max(ex, ey))) + 1
+    dx, dy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1), indexing="ij")
+    u = dx * math.cos(rad) + dy * math.sin(rad)
+    v = -dx * math.sin(rad) + dy * math.cos(rad)
+    touch = ((np.abs(dx) < 1 + ex) & (np.abs(dy) < 1 + ey)
+             & (np.abs(u) < hw + c + s) & (np.abs(v) < hh + c + s))
+    rows = {}
+    for j in range(touch.shape[1]):
+        run = np.flatnonzero(touch[:, j])
+        if len(run):
+            rows[j - r] = (int(run[0]) - r, int(run[-1]) - r)
+    return rows
+
+
+def config_space(mask, car_size=CAR_SIZE, bins=HEADING_BINS):
+    """
+    (bins // 2, W, ceil(H / 8)) uint8: bit-packed along y, bit set where the car
+    collides. The footprint is symmetric under a half turn, so only half the bins
+    are stored. Walls off the edge of the mask don't count, as in the env.
+    """
+    if bins % 2:
+        raise ValueError("heading bins must be even")
+    w, h = mask.shape
+    pad = int(math.ceil(math.hypot(*car_size) / 2)) + 2
+    padded = np.zeros((w + 2 * pad, h + 2 * pad), dtype=np.int16)
+    padded[pad:pad + w, pad:pad + h] = mask
+    # cum[i, j] = number of walls in padded[:i, j], so a run along x is a difference
+    cum = np.zeros((w + 2 * pad + 1, h + 2 * pad), dtype=np.int16)
+    np.cumsum(padded, axis=0, out=cum[1:])
+
+    out = np.empty((bins // 2, w, (h + 7) // 8), dtype=np.uint8)
+    hit = np.empty((w, h), dtype=bool)
+    for b in range(bins // 2):
+        hit[:] = False
+        for dy, (lo, hi) in footprint_rows(*car_size, b * 360 / bins).items():
+            ys = slice(pad + dy, pad + dy + h)
+            hit |= cum[pad + hi + 1:pad + hi + 1 + w, ys] > cum[pad + lo:pad + lo + w, ys]
+        out[b] = np.packbits(hit, axis=1)
+    return out
+
+
+def heading_bin(angle_deg, bins=HEADING_BINS):
+    """Row of the config_space() table for a heading in degrees."""
+    return int(round(angle_deg * bins / 360)) % (bins // 2)
+
+
+def collides(table, x, y, angle_deg, bins=HEADING_BINS):
+    """Table lookup for a car centered at (x, y); positions off the track never collide."""
+    ix, iy = math.floor(x), math.floor(y)
+    if not (0 <= ix < table.shape[1] and 0 <= iy < 8 * table.shape[2]):
+        return False
+    return bool(table[heading_bin(angle_deg, bins), ix, iy >> 3] >> (7 - (iy & 7)) & 1)
+
+
+def collides_many(table, x, y, angle_deg, bins=HEADING_BINS):
+    """collides() for arrays of poses; returns a bool array."""
+    ix, iy = np.floor(x).astype(np.intp), np.floor(y).astype(np.intp)
+    inside = (ix >= 0) & (ix < table.shape[1]) & (iy >= 0) & (iy < 8 * table.shape[2])
+    b = np.round(np.asarray(angle_deg) * bins / 360).astype(np.intp) % (bins // 2)
+    ix, iy = np.where(inside, ix, 0), np.where(inside, iy, 0)
+    return inside & (table[b, ix, iy >> 3] >> (7 - (iy & 7)) & 1).astype(bool)
@@ -1,5 +1,5 @@
+import os
 import random
-from collections import deque
 import numpy as np
 import torch
 import torch.nn as nn
@@ -26,26 +26,280 @@ class DQN(nn.Module):
 # Replay Buffer
 # -----------------------------
 class ReplayBuffer:
-    def __init__(self, size=50_000):
-        self.buffer = deque(maxlen=size)
+    """
+    Circular buffer of transitions stored in preallocated numpy arrays.
 
-    def add(self, s, a, r, s2, done):
-        self.buffer.append((s, a, r, s2, done))
+    Arrays are allocated on the first add() (once the observation shape is known)
+    and can be saved as raw .npy files and memory-mapped back with load().
+
+    With n_step > 1 the buffer stores n-step transitions: r is the discounted sum of
+    the next n rewards, s2 the state n steps later and g the discount to apply to
+    its value (gamma ** k, with k < n when the episode ends first). The last n raw
+    steps wait in a small window until their return is complete; save() and load()
+    carry the windows along, so a buffer saved mid-episode resumes exactly.
+
+    add_batch() takes one step of N parallel envs at a time; each env then has its
+    own window, so their n-step returns never mix.
+
+    `done` marks a terminal step (its s2 is not bootstrapped from); `boundary` marks
+    the end of an episode for any reason and defaults to `done`. A step truncated by a
+    time limit is a boundary but not done: its window is flushed like at a terminal
+    step, yet the shortened returns still bootstrap from s2.
+
+    With `obs_values` (every value an observation element can take, e.g.
+    LidarSensor.readings()) s and s2 are stored as uint8 indices into that table and
+    decoded with one lookup in sample(): exact, and a quarter of the float32 size.
+
+    With `history` > 1 observations are stacks of that many frames (oldest first, as
+    the envs' history option returns them). Only the newest frame of each is kept, in
+    a ring of single frames that links every frame to the one before it in its
+    episode; s and s2 then hold frame indices and sample() rebuilds the stacks by
+    following the links, so a stack costs one stored frame instead of `history`.
+    """
+    FIELDS = ("s", "a", "r", "s2", "d", "g")
+    FRAME_FIELDS = ("frames", "prev")
+    # Steps waiting for their n-step return, and the running episodes' newest frames
+    WINDOW_FIELDS = ("_s", "_a", "_r", "_count", "_last", "_ws", "_wa", "_wr", "_wc", "_wlast")
+
+    def __init__(self, size=50_000, n_step=1, gamma=0.99, obs_values=None, history=1):
+        self.capacity = size
+        self.obs_values = None
+        if obs_values is not None:
+            self.obs_values = np.asarray(obs_values, dtype=np.float32)
+            if len(self.obs_values) > 256 or (np.diff(self.obs_values) <= 0).any():
+                raise ValueError("obs_values must be at most 256 increasing values")
+        self.n_step = int(n_step)
+        self.history = int(history)
+        self.gamma = gamma
+        self.ptr = 0
+        self.size = 0
+        self.s = self.a = self.r = self.s2 = self.d = self.g = None
+
+        # discounts[j, k] = gamma ** (k - j) for k >= j: row j of discounts @ rewards
+        # is the return from pending step j onwards
+        k = np.arange(self.n_step)
+        self.discounts = np.triu(gamma ** (k[None, :] - k[:, None]).clip(0)).astype(np.float32)
+        self.powers = (gamma ** np.arange(self.n_step + 1)).astype(np.float32)
+        self._s = None
+        self._count = 0
+        self._ws = None  # per-env windows for add_batch()
+        self.frames = self.prev = None
+        self.frame_ptr = 0
+        self._last = -1  # newest frame of the running episode (add())
+        self._wlast = None  # the same per env (add_batch())
+
+    def _allocate(self, obs, envs=1):
+        shape = (self.capacity,) + np.shape(obs)
+        dtype = np.float32 if self.obs_values is None else np.uint8
+        if self.history > 1:
+            # Each step adds at most two frames (the first of an episode and the next
+            # one), plus frames of steps still waiting in n-step windows or linked from them
+            frames = 2 * (self.capacity + envs * (2 * self.n_step + self.history))
+            self.frames = np.zeros((frames, shape[-1] // self.history), dtype=dtype)
+            self.prev = np.zeros(frames, dtype=np.int32)
+            shape, dtype = (self.capacity,), np.int32
+        self.s = np.zeros(shape, dtype=dtype)
+        self.s2 = np.zeros(shape, dtype=dtype)
+        self.a = np.zeros(self.capacity, dtype=np.int64)
+        self.r = np.zeros(self.capacity, dtype=np.float32)
+        self.d = np.zeros(self.capacity, dtype=np.float32)
+        self.g = np.zeros(self.capacity, dtype=np.float32)
+
+    def _allocate_window(self, obs):
+        # Steps whose n-step return is not complete yet
+        if self.history > 1:
+            self._s = np.zeros(self.n_step, dtype=np.int32)
+        else:
+            self._s = np.zeros((self.n_step,) + np.shape(obs), dtype=np.float32)
+        self._a = np.zeros(self.n_step, dtype=np.int64)
+        self._r = np.zeros(self.n_step, dtype=np.float32)
+
+    def add(self, s, a, r, s2, done, boundary=None):
+        if boundary is None:
+            boundary = done
+        if self.s is None:
+            self._allocate(s)
+        if self._s is None:
+            self._allocate_window(s)
+        if self.history > 1:
+            if self._last < 0:
+                self._last = self._push_frames(np.asarray(s)[None], np.array([-1]))[0]
+            s = self._last
+            s2 = self._last = self._push_frames(np.asarray(s2)[None], np.array([s]))[0]
+            if boundary:
+                self._last = -1
+        n, c = self.n_step, self._count
+        self._s[c] = s
+        self._a[c] = a
+        self._r[c] = r
+        c += 1
+
+        if boundary:
+            # Episode over: every pending step gets its (shorter) return at once
+            returns = self.discounts[:c, :c] @ self._r[:c]
+            self._store(self._s[:c], self._a[:c], returns, s2, float(done), self.powers[c:0:-1])
+            self._count = 0
+        elif c == n:
+            # Window full: the oldest step now has its complete n-step return
+            self._store(self._s[:1], self._a[:1], self.discounts[:1] @ self._r, s2, 0.0, self.powers[n])
+            self._s[:-1] = self._s[1:]
+            self._a[:-1] = self._a[1:]
+            self._r[:-1] = self._r[1:]
+            self._count = n - 1
+        else:
+            self._count = c
+
+    def add_batch(self, s, a, r, s2, done, boundary=None):
+        """add() for one step of N parallel envs; row i of every argument is env i."""
+        s, s2, a = np.asarray(s), np.asarray(s2), np.asarray(a)
+        r, done = np.asarray(r, dtype=np.float32), np.asarray(done, dtype=bool)
+        boundary = done if boundary is None else np.asarray(boundary, dtype=bool)
+        if self.s is None:
+            self._allocate(s[0], len(a))
+        n, envs = self.n_step, len(a)
+        if self.history > 1:
+            if self._wlast is None or len(self._wlast) != envs:
+                self._wlast = np.full(envs, -1, dtype=np.int32)
+            last = self._wlast
+            first = last < 0
+            if first.any():
+                last[first] = self._push_frames(s[first], np.full(first.sum(), -1))
+            s = last.copy()
+            s2 = last[:] = self._push_frames(s2, s)
+            last[boundary] = -1
+        if n == 1:
+            self._store(s, a, r, s2, done.astype(np.float32), self.powers[1])
+            return
+        if self._ws is None or len(self._ws) != envs:
+            self._ws = np.zeros((envs, n) + s.shape[1:], dtype=s.dtype if self.history > 1 else np.float32)
+            self._wa = np.zeros((envs, n), dtype=np.int64)
+            self._wr = np.zeros((envs, n), dtype=np.float32)
+            self._wc = np.zeros(envs, dtype=np.intp)
+        rows, c = np.arange(envs), self._wc
+        self._ws[rows, c] = s
+        self._wa[rows, c] = a
+        self._wr[rows, c] = r
+        c += 1
+
+        # Same rules as add(), applied to every env's window at once
+        full = ~boundary & (c == n)
+        if full.any():
+            self._store(self._ws[full, 0], self._wa[full, 0], self._wr[full] @ self.discounts[0],
+                        s2[full], 0.0, self.powers[n])
+            self._ws[full, :-1] = self._ws[full, 1:]
+            self._wa[full, :-1] = self._wa[full, 1:]
+            self._wr[full, :-1] = self._wr[full, 1:]
+            c[full] = n - 1
+        for i in np.flatnonzero(boundary):
+            k = c[i]
+            returns = self.discounts[:k, :k] @ self._wr[i, :k]
+            self._store(self._ws[i, :k], self._wa[i, :k], returns, s2[i], float(done[i]), self.powers[k:0:-1])
+            c[i] = 0
+
+    def _encode(self, obs):
+        if self.obs_values is None:
+            return obs
+        codes = np.searchsorted(self.obs_values, obs).clip(0, len(self.obs_values) - 1)
+        if not np.array_equal(self.obs_values[codes], obs):
+            raise ValueError("observation holds a value that is not in obs_values")
+        return codes.astype(np.uint8)
+
+    def _decode(self, codes):
+        return codes if self.obs_values is None else self.obs_values[codes]
+
+    def _push_frames(self, stacks, prev):
+        """
+        Store the newest frame of each stack, linked to frame `prev` (-1 starts an
+        episode: the frame links to itself). Returns the frames' indices.
+        """
+        idx = (self.frame_ptr + np.arange(len(stacks))) % len(self.frames)
+        self.frames[idx] = self._encode(stacks[:, -self.frames.shape[1]:])
+        self.prev[idx] = np.where(prev < 0, idx, prev)
+        self.frame_ptr = (self.frame_ptr + len(stacks)) % len(self.frames)
+        return idx
+
+    def _stack(self, idx):
+        """The observations ending with frames `idx`; an episode's first frame repeats."""
+        out = np.empty((len(idx), self.history, self.frames.shape[1]), dtype=self.frames.dtype)
+        for j in range(self.history - 1, -1, -1):
+            out[:, j] = self.frames[idx]
+            idx = self.prev[idx]
+        return self._decode(out.reshape(len(out), -1))
+
+    def _store(self, s, a, r, s2, d, g):
+        if self.history == 1:
+            s, s2 = self._encode(s), self._encode(s2)
+        idx = (self.ptr + np.arange(len(a))) % self.capacity
+        self.s[idx] = s
+        self.a[idx] = a
+        self.r[idx] = r
+        self.s2[idx] = s2
+        self.d[idx] = d
+        self.g[idx] = g
+        self.ptr = (self.ptr + len(a)) % self.capacity
+        self.size = min(self.size + len(a), self.capacity)
 
     def sample(self, batch_size=64):
-        batch = random.sample(self.buffer, batch_size)
-        s, a, r, s2, d = map(np.array, zip(*batch))
-        return s, a, r, s2, d
+        idx = np.array(random.sample(range(self.size), batch_size))
+        if self.history > 1:
+            return (self._stack(self.s[idx]), self.a[idx], self.r[idx], self._stack(self.s2[idx]),
+                    self.d[idx], self.g[idx])
+        return (self._decode(self.s[idx]), self.a[idx], self.r[idx], self._decode(self.s2[idx]),
+                self.d[idx], self.g[idx])
 
     def __len__(self):
-        return len(self.buffer)
+        return self.size
+
+    # Raw-array persistence
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        if self.s is not None:
+            for name in self._fields():
+                np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        return {"capacity": self.capacity, "ptr": self.ptr, "size": self.size,
+                "n_step": self.n_step, "gamma": self.gamma,
+                "history": self.history, "frame_ptr": self.frame_ptr,
+                "obs_values": None if self.obs_values is None else self.obs_values.tolist(),
+                "window": {name: np.copy(value) if isinstance(value, np.ndarray) else value
+                           for name in self.WINDOW_FIELDS if (value := getattr(self, name, None)) is not None}}
+
+    def load(self, path, meta, mmap=True):
+        """
+        Restore arrays written by save(). With mmap=True the files are mapped
+        copy-on-write: nothing is read up front and new transitions never touch the files.
+        """
+        self.capacity, self.ptr, self.size = meta["capacity"], meta["ptr"], meta["size"]
+        # The arrays on disk decide the encoding; older checkpoints hold float32
+        values = meta.get("obs_values")
+        self.obs_values = None if values is None else np.asarray(values, dtype=np.float32)
+        self.history = meta.get("history", 1)
+        self.frame_ptr = meta.get("frame_ptr", 0)
+        self._count = 0
+        self._s = self._ws = self._wlast = None
+        self._last = -1
+        # Older checkpoints were only written at episode boundaries, with empty windows
+        for name, value in meta.get("window", {}).items():
+            setattr(self, name, value)
+        if self.size == 0:
+            return
+        for name in self._fields():
+            file = os.path.join(path, f"{name}.npy")
+            if name == "g" and not os.path.exists(file):
+                # Saved before n-step support: every transition was one step
+                self.g = np.full(self.capacity, meta.get("gamma", self.gamma), dtype=np.float32)
+                continue
+            setattr(self, name, np.load(file, mmap_mode="c" if mmap else None))
+
+    def _fields(self):
+        return self.FIELDS + (self.FRAME_FIELDS if self.history > 1 else ())
 
 
 # -----------------------------
 # DQN Agent
 # -----------------------------
 class DQNAgent:
-    def __init__(self, obs_dim, action_dim, lr=1e-3, gamma=0.99):
+    def __init__(self, obs_dim, action_dim, lr=1e-3, gamma=0.99,
+                 epsilon_decay=0.995, epsilon_min=0.05):
         self.gamma = gamma
         self.action_dim = action_dim
 
@@ -57,8 +311,8 @@ class DQNAgent:
         self.optimizer = torch.optim.Adam(self.q_net.parameters(), lr=lr)
 
         self.epsilon = 1.0
-        self.epsilon_decay = 0.995
-        self.epsilon_min = 0.05
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
 
     # Action selection
     def select_action(self, state):
@@ -69,27 +323,41 @@ class DQNAgent:
             q = self.q_net(s)
             return q.argmax().item()
 
-    def update_epsilon(self):
-        self.epsilon = max(self.epsilon * self.epsilon_decay, self.epsilon_min)
+    def select_actions(self, states):
+        """Epsilon-greedy actions for a batch of states, with one forward pass."""
+        with torch.no_grad():
+            greedy = self.q_net(torch.as_tensor(np.asarray(states), dtype=torch.float32)).argmax(1).numpy()
+        explore = np.random.rand(len(greedy)) < self.epsilon
+        return np.where(explore, np.random.randint(self.action_dim, size=len(greedy)), greedy)
+
+    def update_epsilon(self, steps=1):
+        self.epsilon = max(self.epsilon * self.epsilon_decay ** steps, self.epsilon_min)
 
     # One training step
     def train_step(self, buffer, batch_size=64):
         if len(buffer) < batch_size:
             return None
 
-        states, actions, rewards, next_states, dones = buffer.sample(batch_size)
+        return self.learn(buffer.sample(batch_size))
+
+    def learn(self, batch):
+        """One gradient step on a sampled batch. Returns the loss."""
+        states, actions, rewards, next_states, dones, discounts = batch
+        batch_size = len(actions)
 
         s = torch.FloatTensor(states)
         a = torch.LongTensor(actions)
         r = torch.FloatTensor(rewards)
         s2 = torch.FloatTensor(next_states)
         d = torch.FloatTensor(dones)
+        g = torch.FloatTensor(discounts)
 
         q_vals = self.q_net(s)[range(batch_size), a]
 
+        # r and g come from the buffer, so this is the n-step target for any n
         with torch.no_grad():
             next_q = self.target_net(s2).max(1)[0]
-            target = r + self.gamma * next_q * (1 - d)
+            target = r + g * next_q * (1 - d)
 
         loss = ((q_vals - target)**2).mean()
 
@@ -101,3 +369,24 @@ class DQNAgent:
 
     def update_target(self):
         self.target_net.load_state_dict(self.q_net.state_dict())
+
+    # Full training state (everything except the replay buffer)
+    def state_dict(self):
+        return {
+            "q_net": self.q_net.state_dict(),
+            "target_net": self.target_net.state_dict(),
+            "optimizer": self.optimizer.state_dict(),
+            "epsilon": self.epsilon,
+            "gamma": self.gamma,
+            "epsilon_decay": self.epsilon_decay,
+            "epsilon_min": self.epsilon_min,
+        }
+
+    def load_state_dict(self, state):
+        self.q_net.load_state_dict(state["q_net"])
+        self.target_net.load_state_dict(state["target_net"])
+        self.optimizer.load_state_dict(state["optimizer"])
+        self.epsilon = state["epsilon"]
+        self.gamma = state["gamma"]
+        self.epsilon_decay = state["epsilon_decay"]
+        self.epsilon_min = state["epsilon_min"]
@@ -0,0 +1,162 @@
+"""
+How DQN gradient updates are scheduled against environment steps.
+
+Both learners spend the same budget: every env step taken once the buffer holds a
+full batch earns `replay_ratio` gradient updates (0.25 = one update every 4 steps,
+4 = four updates per step). Learner runs them inline; BackgroundLearner runs them on
+its own thread so they overlap with env stepping, never getting ahead of the budget;
+if it falls more than `max_lag` updates behind, env stepping waits for it.
+"""
+import contextlib
+import threading
+
+from telemetry import telemetry
+
+
+class Learner:
+    """Gradient updates inline with env stepping."""
+
+    def __init__(self, agent, buffer, batch_size=64, replay_ratio=1.0):
+        self.agent = agent
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.replay_ratio = replay_ratio
+        self.credit = 0.0
+        self.updates = 0
+
+    def add(self, s, a, r, s2, done, boundary=None):
+        """Store a transition and run the updates it paid for."""
+        self.buffer.add(s, a, r, s2, done, boundary)
+        self._earn(1)
+
+    def add_batch(self, s, a, r, s2, done, boundary=None):
+        """add() for one step of N parallel envs: N transitions earn N times the updates."""
+        self.buffer.add_batch(s, a, r, s2, done, boundary)
+        self._earn(len(a))
+
+    def state_dict(self):
+        """The fraction of an update earned but not run yet (for checkpoints)."""
+        return {"credit": self.credit}
+
+    def load_state_dict(self, state):
+        self.credit = state["credit"]
+
+    def _earn(self, steps):
+        if len(self.buffer) < self.batch_size:
+            return
+        self.credit += self.replay_ratio * steps
+        while self.credit >= 1:
+            self.credit -= 1
+            telemetry.observe("train/loss", self.agent.train_step(self.buffer, self.batch_size))
+            self.updates += 1
+
+    def update_target(self):
+        self.agent.update_target()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Hold off updates (e.g. while a checkpoint is written)."""
+        yield
+
+    def close(self):
+        pass
+
+
+class BackgroundLearner(Learner):
+    """
+    Gradient updates on a separate thread; torch releases the GIL inside its kernels.
+
+    Acting (agent.select_action) does not take agent_lock, so an action may come from
+    weights the optimizer is halfway through updating; waiting for every update to
+    finish would undo the overlap, and an epsilon-greedy action doesn't need a
+    consistent snapshot. If an update raises, the thread stops and the error is
+    raised on the training thread by the next add() or by close().
+    """
+
+    def __init__(self, agent, buffer, batch_size=64, replay_ratio=1.0, max_lag=64):
+        super().__init__(agent, buffer, batch_size, replay_ratio)
+        self.max_lag = max(max_lag, replay_ratio)
+        self.buffer_lock = threading.Lock()
+        self.agent_lock = threading.Lock()
+        self.ready = threading.Condition()
+        self.closed = False
+        self.running = 0  # updates taken from the credit but not applied yet
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="dqn-learner", daemon=True)
+        self.thread.start()
+
+    def add(self, s, a, r, s2, done, boundary=None):
+        with self.buffer_lock:
+            self.buffer.add(s, a, r, s2, done, boundary)
+        self._earn(1)
+
+    def add_batch(self, s, a, r, s2, done, boundary=None):
+        with self.buffer_lock:
+            self.buffer.add_batch(s, a, r, s2, done, boundary)
+        self._earn(len(a))
+
+    def _earn(self, steps):
+        if len(self.buffer) >= self.batch_size:
+            with self.ready:
+                self.credit += self.replay_ratio * steps
+                self.ready.notify()
+                self.ready.wait_for(lambda: self.closed or self.credit <= self.max_lag)
+        self._raise()
+
+    def _raise(self):
+        """Re-raise (once) an error that stopped the thread."""
+        error, self.error = self.error, None
+        if error is not None:
+            raise RuntimeError("background learner failed") from error
+
+    def _run(self):
+        while True:
+            with self.ready:
+                self.ready.wait_for(lambda: self.closed or self.credit >= 1)
+                if self.closed:
+                    return
+                self.credit -= 1
+                self.running += 1
+                self.ready.notify()
+            try:
+                with self.buffer_lock:
+                    batch = self.buffer.sample(self.batch_size)
+                with self.agent_lock:
+                    loss = self.agent.learn(batch)
+            except Exception as e:
+                # Stop, and wake an add() waiting for credit so it can raise this
+                with self.ready:
+                    self.error = e
+                    self.closed = True
+                    self.ready.notify_all()
+                return
+            with self.ready:
+                self.running -= 1
+            telemetry.observe("train/loss", loss)
+            self.updates += 1
+
+    def update_target(self):
+        with self.agent_lock:
+            self.agent.update_target()
+
+    def state_dict(self):
+        """
+        Every update still owed, including one the thread has started but (paused)
+        not applied; a resumed run redoes it, so the update count is exact but which
+        batches the updates see depends on thread timing, as it always does.
+        """
+        with self.ready:
+            return {"credit": self.credit + self.running}
+
+    @contextlib.contextmanager
+    def paused(self):
+        with self.agent_lock, self.buffer_lock:
+            yield
+
+    def close(self):
+        """Stop the thread; updates still owed are dropped."""
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+        self.thread.join()
+        self._raise()
@@ -0,0 +1,59 @@
+"""
+Stable-Baselines3 view of CarLidarVecEnv.
+
+    from sb3_vec_env import SB3CarVecEnv
+    from stable_baselines3 import PPO
+    PPO("MlpPolicy", SB3CarVecEnv(num_envs=64, track_num=2, max_steps=2000)).learn(1_000_000)
+
+SB3 also resets finished environments in the same step; it expects the last
+observation in infos[i]["terminal_observation"] and truncations flagged with
+"TimeLimit.truncated".
+"""
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from vec_env import CarLidarVecEnv
+
+
+class SB3CarVecEnv(VecEnv):
+    """Keyword arguments are passed to CarLidarVecEnv."""
+
+    def __init__(self, **kwargs):
+        self.env = CarLidarVecEnv(**kwargs)
+        super().__init__(self.env.num_envs, self.env.single_observation_space, self.env.single_action_space)
+        self._actions = None
+
+    def reset(self):
+        seed = self._seeds[0]
+        obs, _ = self.env.reset(seed=seed)
+        self._reset_seeds()
+        return obs
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated, info = self.env.step(self._actions)
+        dones = terminated | truncated
+        infos = [{"crashed": bool(c), "checkpoint": e} for c, e in zip(info["crashed"], info["checkpoint"])]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = info["final_obs"][i]
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+        return obs, rewards.astype(np.float32), dones, infos
+
+    def close(self):
+        self.env.close()
+
+    # The cars share one env object, so attributes are the same for every index
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.env, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.env, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self.env, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
@@ -0,0 +1,424 @@
+"""
+LiDAR sensor for the image tracks: rays are traced over a boolean wall mask.
+
+Angles follow the CarLidarEnv convention: degrees, counter-clockwise, with a ray
+at angle a pointing along (cos(-a), sin(-a)) in screen coordinates.
+"""
+import math
+
+import numpy as np
+
+# Crossing time of a grid line the ray runs parallel to
+NEVER = 1e30
+
+
+def wall_mask(rgb):
+    """
+    Turn a (W, H, 3) pixel array (pygame.surfarray.array3d) into a bool mask[x, y].
+
+    Uses the same test as the env: the tuple comparison `color <= (100, 100, 100)`.
+    """
+    r = rgb[..., 0].astype(np.int16)
+    g = rgb[..., 1].astype(np.int16)
+    b = rgb[..., 2].astype(np.int16)
+    return (r < 100) | ((r == 100) & ((g < 100) | ((g == 100) & (b <= 100))))
+
+
+def _ray_crossings(px, py, cos_a, sin_a):
+    """
+    Flattened rays with their grid-line crossings: the origin pixel (ix0, iy0), step
+    direction per axis, time between crossings and time of the first crossing.
+    A ray parallel to an axis has its first crossing of that axis at NEVER.
+    """
+    px, py, cos_a, sin_a = (
+        v.ravel() for v in np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (px, py, cos_a, sin_a)))
+    )
+    ix0, iy0 = np.floor(px), np.floor(py)
+    step_x, step_y = np.sign(cos_a), np.sign(sin_a)
+    # Finite stand-ins keep the crossing arithmetic free of inf - inf and 0 * inf
+    delta_x = 1.0 / np.where(step_x == 0, 1.0, np.abs(cos_a))
+    delta_y = 1.0 / np.where(step_y == 0, 1.0, np.abs(sin_a))
+    first_x = np.where(step_x == 0, NEVER, np.where(step_x > 0, ix0 + 1 - px, px - ix0) * delta_x)
+    first_y = np.where(step_y == 0, NEVER, np.where(step_y > 0, iy0 + 1 - py, py - iy0) * delta_y)
+    return px, py, cos_a, sin_a, ix0, iy0, step_x, step_y, delta_x, delta_y, first_x, first_y
+
+
+def _lookup(cells, w, h, x, y, missing=False):
+    """(inside, value) of the raveled (w, h) array `cells` at float pixel coordinates, `missing` outside."""
+    inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+    value = cells[np.where(inside, x * h + y, 0).astype(np.intp)]
+    return inside, np.where(inside, value, missing)
+
+
+def grid_traverse(mask, px, py, cos_a, sin_a, max_range, chunk=32):
+    """
+    Exact distance along each ray to the first wall pixel (Amanatides & Woo).
+
+    Pixel (x, y) is the unit square [x, x+1) x [y, y+1). A ray enters a new pixel each
+    time it crosses a vertical or horizontal grid line, so its crossings at
+    t = first_x + k / |cos| and t = first_y + k / |sin| enumerate exactly the pixels it
+    passes through. Instead of stepping ray by ray, cell by cell, a block of crossings
+    of every ray is generated at once: the pixel entered at a crossing follows from
+    counting the other axis' crossings before it (at an exact corner the y step comes
+    first, as in the classic traversal). Blocks double in size and a ray drops out
+    once its earliest event is earlier than every crossing it has not looked at yet.
+
+    Args:
+        mask: Bool wall mask indexed [x, y]
+        px, py: Ray origins, any shape
+        cos_a, sin_a: Unit ray directions, same shape as px
+        max_range: Rays that hit nothing closer report max_range
+        chunk: Crossings per axis in the first block
+
+    Returns:
+        float64 distances with the shape of px: 0 when the origin pixel is a wall,
+        max_range when the ray leaves the mask first
+    """
+    shape = np.broadcast(px, py, cos_a, sin_a).shape
+    px, py, cos_a, sin_a, ix0, iy0, step_x, step_y, delta_x, delta_y, first_x, first_y = \
+        _ray_crossings(px, py, cos_a, sin_a)
+    w, h = mask.shape
+
+    cells = np.asarray(mask).ravel()
+
+    # The origin pixel (t = 0)
+    dist = np.full(px.shape, float(max_range))
+    inside, at_wall = _lookup(cells, w, h, ix0, iy0)
+    dist[at_wall] = 0.0
+
+    best = np.full(px.shape, np.inf)          # earliest event found so far
+    best_hit = np.zeros(px.shape, dtype=bool)  # ... and whether it is a wall (else leaving the mask)
+    todo = np.flatnonzero(inside & ~at_wall)
+    limit = int(math.ceil(max_range)) + 1  # crossings per axis within max_range (|direction| <= 1)
+    k0, n = 0, chunk
+    while todo.size and k0 < limit:
+        k = np.arange(k0, min(k0 + n, limit), dtype=np.float64)
+        fx, fy = first_x[todo, None], first_y[todo, None]
+        dx, dy = delta_x[todo, None], delta_y[todo, None]
+        sx, sy = step_x[todo, None], step_y[todo, None]
+        x0, y0 = ix0[todo, None], iy0[todo, None]
+        tx = fx + k * dx
+        ty = fy + k * dy
+        # y steps at or before an x crossing, x steps strictly before a y crossing
+        ny = np.where(tx >= fy, np.floor((tx - fy) / dy) + 1, 0)
+        nx = np.where(ty > fx, np.ceil((ty - fx) / dx), 0)
+        t = np.concatenate([tx, ty], axis=1)
+        cx = np.concatenate([x0 + sx * (k + 1), x0 + sx * nx], axis=1)
+        cy = np.concatenate([y0 + sy * ny, y0 + sy * (k + 1)], axis=1)
+        inside, hit = _lookup(cells, w, h, cx, cy)
+        event = np.where((hit | ~inside) & (t < max_range), t, np.inf)
+        j = event.argmin(axis=1)
+        rows = np.arange(todo.size)
+        earliest = event[rows, j]
+        better = earliest < best[todo]
+        best[todo[better]] = earliest[better]
+        best_hit[todo[better]] = hit[rows, j][better]
+
+        # Everything before `covered` has been looked at
+        k0 += len(k)
+        covered = np.minimum(first_x[todo] + k0 * delta_x[todo], first_y[todo] + k0 * delta_y[todo])
+        todo = todo[(best[todo] >= covered) & (covered < max_range)]
+        n *= 2
+
+    dist[best_hit] = best[best_hit]
+    return dist.reshape(shape)
+
+
+def occupancy_pyramid(mask):
+    """
+    Max-pooled mip pyramid of the wall mask: level L is True where the aligned
+    2^L x 2^L block contains a wall pixel. Level 0 is the mask itself; the last
+    level is a single block covering the whole (power-of-two padded) track.
+    """
+    w, h = mask.shape
+    levels = [np.asarray(mask, dtype=bool)]
+    while levels[-1].shape != (1, 1):
+        prev = levels[-1]
+        pw, ph = prev.shape
+        padded = np.zeros((pw + pw % 2, ph + ph % 2), dtype=bool)
+        padded[:pw, :ph] = prev
+        levels.append(padded.reshape(len(padded) // 2, 2, -1, 2).any(axis=(1, 3)))
+    return levels
+
+
+def empty_levels(mask):
+    """
+    (W, H) int8: for every pixel, the level of the largest empty pyramid block that
+    contains it, or -1 for wall pixels. One lookup tells a ray how far it may jump.
+    """
+    w, h = mask.shape
+    out = np.full((w, h), -1, dtype=np.int8)
+    for level, occupied in enumerate(occupancy_pyramid(mask)):
+        size = 1 << level
+        full = np.repeat(np.repeat(~occupied, size, axis=0), size, axis=1)[:w, :h]
+        out[full] = level
+    return out
+
+
+def pyramid_traverse(levels, px, py, cos_a, sin_a, max_range):
+    """
+    Same distances as grid_traverse, skipping empty space with the occupancy pyramid.
+
+    Each ray sits in a pixel; empty_levels says how big an aligned empty block around
+    it is, and the ray jumps straight to that block's exit. Near walls the blocks
+    shrink to single pixels and this is the plain Amanatides & Woo walk. Crossing
+    times and pixels use grid_traverse's formulas, so both agree to the last bit.
+
+    Args:
+        levels: empty_levels() of the wall mask
+        px, py, cos_a, sin_a, max_range: As for grid_traverse
+    """
+    shape = np.broadcast(px, py, cos_a, sin_a).shape
+    _, _, _, _, ix0, iy0, step_x, step_y, delta_x, delta_y, first_x, first_y = \
+        _ray_crossings(px, py, cos_a, sin_a)
+    w, h = levels.shape
+    cells = np.asarray(levels).ravel()
+    sizes = 2.0 ** np.arange(-1, 16)  # block size by level + 1 (walls: 0.5, never used)
+
+    # One row per quantity, one column per ray still travelling; finished rays are
+    # dropped with a single column selection per round. kx, ky count the grid lines
+    # crossed so far, so the current pixel is (ix0 + sx * kx, iy0 + sy * ky).
+    n = ix0.size
+    state = np.stack([np.arange(n, dtype=np.float64), ix0, iy0, step_x, step_y, delta_x, delta_y,
+                      first_x, first_y, np.zeros(n), np.zeros(n), np.zeros(n)])
+    dist = np.full(n, float(max_range))
+    while state.shape[1]:
+        ray, x0, y0, sx, sy, dx, dy, fx, fy, kx, ky, t = state
+        x, y = x0 + sx * kx, y0 + sy * ky
+        inside, level = _lookup(cells, w, h, x, y, missing=-1)
+        wall = inside & (level < 0)
+        dist[ray[wall].astype(np.intp)] = t[wall]
+
+        # Leave the aligned empty block of `size` around (x, y): its far edge on each
+        # axis is crossing number k_edge of that axis
+        size = sizes[level + 1]
+        bx, by = np.floor(x / size) * size, np.floor(y / size) * size
+        kx_edge = np.where(sx > 0, bx + size - 1 - x0, x0 - bx)
+        ky_edge = np.where(sy > 0, by + size - 1 - y0, y0 - by)
+        tx = fx + kx_edge * dx
+        ty = fy + ky_edge * dy
+
+        # The other axis' count comes from its crossing times; through an exact corner
+        # y is crossed first and x follows with a zero-length step. Counting can round
+        # differently from the times on near-corner rays, so it never steps back
+        # (that could bounce a ray between two pixels)
+        cross_x = tx < ty
+        ny = np.where(tx >= fy, np.floor((tx - fy) / dy) + 1, 0)
+        nx = np.where(ty > fx, np.ceil((ty - fx) / dx), 0)
+        state[9] = np.where(cross_x, kx_edge + 1, np.maximum(nx, kx))
+        state[10] = np.where(cross_x, np.maximum(ny, ky), ky_edge + 1)
+        state[11] = t = np.minimum(tx, ty)
+        state = state[:, inside & ~wall & (t < max_range)]
+    return dist.reshape(shape)
+
+
+class LidarSensor:
+    """
+    Configurable N-ray LiDAR that scans every ray of every car in one call.
+
+    Args:
+        num_rays: Number of rays per car
+        fov_deg: Angular spread of the rays; 360 spaces them evenly around the car
+        relative: If True rays turn with the car heading, otherwise they are fixed in world frame
+        max_range: Maximum sensing range in pixels
+        method: "march" samples every `step` pixels (the original sensor); "dda" traces
+            every pixel each ray crosses and returns exact sub-pixel distances; "pyramid"
+            returns the same distances as "dda", jumping over empty occupancy-pyramid blocks
+        step: Distance between samples along a ray ("march" only)
+        noise_std: Std-dev of Gaussian range noise as a fraction of max_range (0 disables noise)
+        center_deg: Direction of the central ray in world mode
+        incremental: Remember each ray's last hit distance and march only up to it first ("march" only)
+        window: Extra samples past the remembered hit to try before a full march
+
+    With the defaults the sensor matches the original five rays at [-60, -30, 0, 30, 60].
+    "dda" never steps over thin walls but costs about 4x as much per scan for a single car.
+    "pyramid" pays per jump rather than per pixel, so it wins once a scan covers
+    thousands of rays (many cars); tools/lidar_bench.py measures the trade-off.
+    Incremental mode returns the same distances as a full scan; call reset() when the car
+    teleports so the next scan starts fresh.
+
+    V1/sensors.py has a LidarSensor for segment-wall tracks with the same constructor
+    arguments, attributes and degree angles; it is a separate class because it
+    intersects rays with wall segments instead of marching a pixel mask. Angles here
+    follow CarLidarEnv.angle (counter-clockwise, y up on screen).
+    """
+
+    def __init__(self, num_rays=5, fov_deg=120.0, relative=True, max_range=250, method="march", step=2,
+                 noise_std=0.0, center_deg=0.0, incremental=False, window=8):
+        if method not in ("dda", "march", "pyramid"):
+            raise ValueError(f"unknown LiDAR method {method!r}")
+        if incremental and method != "march":
+            raise ValueError("incremental scans need method='march'")
+        self.num_rays = int(num_rays)
+        self.fov_deg = float(fov_deg)
+        self.relative = relative
+        self.max_range = max_range
+        self.method = method
+        self.step = step
+        self.noise_std = float(noise_std)
+        self.center_deg = float(center_deg)
+
+        if self.fov_deg >= 360.0:
+            self.offsets_deg = np.arange(self.num_rays) * (360.0 / self.num_rays)
+        elif self.num_rays == 1:
+            self.offsets_deg = np.zeros(1)
+        else:
+            self.offsets_deg = np.linspace(-self.fov_deg / 2, self.fov_deg / 2, self.num_rays)
+
+        self.samples = np.arange(0, self.max_range, self.step, dtype=np.float64)
+
+        self.incremental = incremental
+        self.window = int(window)
+        self._pyramid_mask = self._levels = None
+        self.reset()
+
+    def reset(self):
+        """Forget the remembered hit distances."""
+        self._last_k = None
+        self.verified = 0
+        self.fallbacks = 0
+
+    def readings(self):
+        """
+        Every value scan() can return, sorted, as float32; None when readings are
+        continuous ("dda", "pyramid" or range noise). Observation stores use it to
+        keep each reading as a one-byte index instead of a float.
+        """
+        if self.method != "march" or self.noise_std > 0.0:
+            return None
+        return (np.append(self.samples, float(self.max_range)) / self.max_range).astype(np.float32)
+
+    def ray_angles(self, headings):
+        """Absolute ray angles in degrees, shape (N, num_rays)."""
+        headings = np.atleast_1d(np.asarray(headings, dtype=np.float64))
+        if not self.relative:
+            headings = np.full_like(headings, self.center_deg)
+        return headings[:, None] + self.offsets_deg[None, :]
+
+    def scan(self, mask, positions, headings, rng=None, levels=None):
+        """
+        Scan all rays for all cars.
+
+        Args:
+            mask: Bool wall mask indexed [x, y]
+            positions: Car centers, shape (N, 2) or a single (x, y)
+            headings: Car angles in degrees, shape (N,)
+            rng: Generator for range noise (defaults to a fresh one)
+            levels: empty_levels(mask), if already built ("pyramid" only)
+
+        Returns:
+            Array of shape (N, num_rays) with distances normalized to [0, 1]
+        """
+        return self.normalize(self.distances(mask, positions, headings, levels), rng)
+
+    def normalize(self, dist, rng=None):
+        """Add the range noise to raw distances and scale them to [0, 1] as float32."""
+        if self.noise_std > 0.0:
+            rng = rng if rng is not None else np.random.default_rng()
+            dist = dist + rng.normal(0.0, self.noise_std * self.max_range, size=dist.shape)
+            dist = dist.clip(0.0, self.max_range)
+
+        return (dist / self.max_range).astype(np.float32)
+
+    def distances(self, mask, positions, headings, levels=None):
+        """Raw hit distances in pixels, shape (N, num_rays); max_range when nothing is hit."""
+        pos = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        rad = np.radians(-self.ray_angles(headings))
+        cos_a, sin_a = np.cos(rad), np.sin(rad)
+        px = np.broadcast_to(pos[:, 0, None], cos_a.shape)
+        py = np.broadcast_to(pos[:, 1, None], cos_a.shape)
+        if self.method == "dda":
+            return grid_traverse(mask, px, py, cos_a, sin_a, self.max_range)
+        if self.method == "pyramid":
+            if levels is None:
+                levels = self._levels_of(mask)
+            return pyramid_traverse(levels, px, py, cos_a, sin_a, self.max_range)
+
+        n = len(self.samples)
+        if not self.incremental or self._last_k is None or self._last_k.shape != cos_a.shape:
+            k = self._first_event(mask, px, py, cos_a, sin_a, self.samples)
+            self.fallbacks += k.size
+        else:
+            k = self._scan_incremental(mask, px, py, cos_a, sin_a)
+
+        if self.incremental:
+            self._last_k = k
+        return np.where(k >= 0, self.samples[k.clip(0, n - 1)], float(self.max_range))
+
+    def _levels_of(self, mask):
+        """empty_levels(mask), rebuilt only when a different mask comes in."""
+        if self._pyramid_mask is not mask:
+            self._pyramid_mask, self._levels = mask, empty_levels(mask)
+        return self._levels
+
+    def _scan_incremental(self, mask, px, py, cos_a, sin_a):
+        """
+        March each previously-hitting ray only up to its last hit + window. The first
+        event inside that prefix is the first event of the full ray, so those rays are
+        exact; rays without an event there continue from the end of the prefix.
+        """
+        n = len(self.samples)
+        last = self._last_k.ravel()
+        px, py, cos_a, sin_a = px.ravel(), py.ravel(), cos_a.ravel(), sin_a.ravel()
+
+        begin = np.zeros(last.shape, dtype=np.intp)
+        end = np.where(last >= 0, np.minimum(last + self.window + 1, n), n)
+        k = self._first_event_ragged(mask, px, py, cos_a, sin_a, begin, end)
+
+        todo = np.nonzero(k == -2)[0]
+        self.verified += last.size - todo.size
+        self.fallbacks += todo.size
+        if todo.size:
+            k[todo] = self._first_event_ragged(
+                mask, px[todo], py[todo], cos_a[todo], sin_a[todo], end[todo], np.full(todo.size, n)
+            )
+        return k.reshape(self._last_k.shape)
+
+    def _first_event_ragged(self, mask, px, py, cos_a, sin_a, begin, end):
+        """
+        Like _first_event for flat rays, but each ray only marches samples [begin, end).
+
+        Returns the hit index, -1 when the ray leaves the track or reaches max range,
+        and -2 when no event happens before `end` (only possible for end < max range).
+        """
+        counts = end - begin
+        total = int(counts.sum())
+        starts = np.cumsum(counts) - counts
+        ray = np.repeat(np.arange(len(counts)), counts)
+        idx = np.arange(total) - np.repeat(starts, counts) + np.repeat(begin, counts)
+
+        d = self.samples[idx]
+        lx = np.trunc(px[ray] + cos_a[ray] * d).astype(np.intp)
+        ly = np.trunc(py[ray] + sin_a[ray] * d).astype(np.intp)
+        w, h = mask.shape
+        inside = (lx >= 0) & (lx < w) & (ly >= 0) & (ly < h)
+        hit = inside & mask[lx.clip(0, w - 1), ly.clip(0, h - 1)]
+        event = hit | ~inside
+
+        n = len(self.samples)
+        k = np.where(end >= n, -1, -2)
+        nonempty = counts > 0
+        if total:
+            pos = np.where(event, np.arange(total), total)
+            first = np.minimum.reduceat(pos, starts[nonempty])
+            found = first < total
+            sel = np.nonzero(nonempty)[0][found]
+            fi = first[found]
+            k[sel] = np.where(hit[fi], idx[fi], -1)
+        return k
+
+    def _first_event(self, mask, px, py, cos_a, sin_a, samples):
+        """
+        Index of the first wall sample along each ray, stopping at the first
+        out-of-bounds one. Returns -1 when the ray leaves the track or reaches max range.
+        """
+        lx = np.trunc(px[..., None] + cos_a[..., None] * samples).astype(np.intp)
+        ly = np.trunc(py[..., None] + sin_a[..., None] * samples).astype(np.intp)
+        w, h = mask.shape
+        inside = (lx >= 0) & (lx < w) & (ly >= 0) & (ly < h)
+        hit = inside & mask[lx.clip(0, w - 1), ly.clip(0, h - 1)]
+
+        m = len(samples)
+        first_hit = np.where(hit.any(-1), hit.argmax(-1), m)
+        first_out = np.where((~inside).any(-1), (~inside).argmax(-1), m)
+        return np.where(first_hit < first_out, first_hit, -1)
@@ -0,0 +1,64 @@
+"""
+Fixed-size records for the envs' get_state() / set_state().
+
+A state is one numpy structured record holding only what changes during an
+episode. Copying it, keeping thousands in an array of its dtype, or a
+bytes(state) / set_state(bytes) round trip all cost microseconds, unlike
+deepcopy of an env that holds pygame surfaces and the track.
+
+Keep in sync with V1/snapshot.py (identical apart from this note): each version folder
+runs on its own and never imports from another.
+"""
+import numpy as np
+
+# numpy's PCG64 (the generator gymnasium seeds envs with); 128-bit values as (high, low) words
+RNG_DTYPE = np.dtype([("state", "<u8", 2), ("inc", "<u8", 2), ("has_uint32", "<i4"), ("uinteger", "<u4")])
+WORD = 1 << 64
+
+
+def state_dtype(fields, history=None):
+    """Record dtype for the env's `fields`, plus its RNG and, with a History, the ring."""
+    fields = list(fields) + [("rng", RNG_DTYPE)]
+    if history is not None:
+        fields += [("ring", history.ring.dtype, history.ring.shape), ("ring_pos", "<i4"), ("ring_fill", "?")]
+    return np.dtype(fields)
+
+
+def as_record(state, dtype):
+    """A get_state() record, or its bytes, as a record of `dtype`."""
+    if isinstance(state, (bytes, bytearray, memoryview)):
+        return np.frombuffer(state, dtype)[0]
+    return state
+
+
+def save_extras(record, rng, history=None):
+    """Write the RNG (and History) fields of `record`."""
+    state = rng.bit_generator.state
+    if state["bit_generator"] != "PCG64":
+        raise ValueError(f"can't snapshot a {state['bit_generator']} generator, only PCG64")
+    out = record["rng"]
+    out["state"] = divmod(state["state"]["state"], WORD)
+    out["inc"] = divmod(state["state"]["inc"], WORD)
+    out["has_uint32"] = state["has_uint32"]
+    out["uinteger"] = state["uinteger"]
+    if history is not None:
+        record["ring"] = history.ring
+        record["ring_pos"] = history.pos
+        record["ring_fill"] = history.fill
+
+
+def load_extras(record, rng, history=None):
+    """Restore what save_extras() wrote."""
+    saved = record["rng"]
+    high, low = saved["state"].tolist()
+    inc_high, inc_low = saved["inc"].tolist()
+    rng.bit_generator.state = {
+        "bit_generator": "PCG64",
+        "state": {"state": high * WORD + low, "inc": inc_high * WORD + inc_low},
+        "has_uint32": int(saved["has_uint32"]),
+        "uinteger": int(saved["uinteger"]),
+    }
+    if history is not None:
+        history.ring[...] = record["ring"]
+        history.pos = int(record["ring_pos"])
+        history.fill = bool(record["ring_fill"])
@@ -0,0 +1,181 @@
+"""
+In-process metrics that never make the caller wait for I/O.
+
+    from telemetry import telemetry
+    telemetry.start("runs/train.jsonl")      # or .csv; calls before start() are no-ops
+    telemetry.count("env/laps")               # counter: running total and rate
+    telemetry.gauge("train/epsilon", eps)     # gauge: last value
+    telemetry.observe("episode/return", ret)  # histogram: count, mean, min, max, p50, p90
+    telemetry.close()                         # stop the writer and flush what is left
+
+Recording appends one (metric, value) entry to a preallocated ring buffer and
+returns: a slot is claimed with an atomic counter and published by stamping its
+sequence number, so any thread can record without a lock (only the first use of
+a metric name takes one, to give it an id). A background
+thread drains the buffer every `interval` seconds and writes one row per metric
+touched in that window. If producers get a whole buffer ahead of the writer the
+oldest entries are overwritten and counted in the "telemetry/dropped" counter.
+"""
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+COUNTER, GAUGE, HISTOGRAM = "counter", "gauge", "histogram"
+CSV_COLUMNS = ["time", "name", "kind", "count", "value", "rate", "mean", "min", "max", "p50", "p90"]
+
+
+class Telemetry:
+    """Counters, gauges and histograms streamed to a CSV or JSONL file."""
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.active = False
+        self._thread = None
+
+    # -----------------------------------
+    # Recording (any thread, never blocks)
+    # -----------------------------------
+
+    def count(self, name, n=1):
+        if self.active:
+            self._record(name, COUNTER, n)
+
+    def gauge(self, name, value):
+        if self.active:
+            self._record(name, GAUGE, value)
+
+    def observe(self, name, value):
+        if self.active:
+            self._record(name, HISTOGRAM, value)
+
+    def _record(self, name, kind, value):
+        ids = self._ids.get(name)
+        if ids is None:
+            ids = self._register(name, kind)
+        seq = next(self._seq)
+        slot = seq % self.capacity
+        self._stamp[slot] = -1  # unpublished while it is rewritten
+        self._metric[slot] = ids
+        self._value[slot] = value
+        self._stamp[slot] = seq  # published: the writer may read the slot now
+
+    def _register(self, name, kind):
+        with self._register_lock:
+            if name not in self._ids:
+                self._names[len(self._ids)] = (name, kind)
+                self._ids[name] = len(self._ids)
+            return self._ids[name]
+
+    # -----------------------------------
+    # Writer
+    # -----------------------------------
+
+    def start(self, path, interval=1.0):
+        """Begin recording; rows go to `path` (.csv or .jsonl) every `interval` seconds."""
+        if self.active:
+            raise RuntimeError("telemetry already started")
+        self.path = path
+        self.interval = interval
+        self._csv = path.endswith(".csv")
+        self._metric = np.zeros(self.capacity, dtype=np.int32)
+        self._value = np.zeros(self.capacity)
+        self._stamp = np.full(self.capacity, -1, dtype=np.int64)
+        self._seq = itertools.count()
+        self._ids, self._names = {}, {}
+        self._register_lock = threading.Lock()
+        self._read = 0
+        self._totals = {}
+        self._dropped = 0
+        self._last_flush = time.time()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w", newline="")
+        if self._csv:
+            self._writer = csv.DictWriter(self._file, CSV_COLUMNS)
+            self._writer.writeheader()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self.active = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop recording, write the last window and close the file."""
+        if not self.active:
+            return
+        self.active = False
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def _drain(self):
+        """Entries published since the last drain, oldest first (None if there are none)."""
+        start = self._read
+        expected = np.arange(start, start + self.capacity)
+        published = self._stamp[expected % self.capacity] == expected
+        # The first slot not yet published (or already overwritten) ends the run
+        end = start + (self.capacity if published.all() else int(published.argmin()))
+        if end == start:
+            newest = int(self._stamp.max())
+            if newest - start < self.capacity:
+                return None
+            # Producers lapped the writer: skip to the oldest entry still in the buffer
+            self._dropped += newest - self.capacity + 1 - start
+            self._read = newest - self.capacity + 1
+            return self._drain()
+        idx = expected[:end - start] % self.capacity
+        self._read = end
+        metric, value = self._metric[idx], self._value[idx]
+        # A producer that lapped the writer may have rewritten slots while they were copied
+        intact = self._stamp[idx] == expected[:end - start]
+        if not intact.all():
+            self._dropped += int((~intact).sum())
+            metric, value = metric[intact], value[intact]
+        return metric, value
+
+    def flush(self):
+        """Aggregate everything recorded since the last flush and write it (writer thread)."""
+        entries = self._drain()
+        now = time.time()
+        window = max(now - self._last_flush, 1e-9)
+        self._last_flush = now
+        rows = []
+        if self._dropped:
+            self._totals["telemetry/dropped"] = self._dropped
+            rows.append({"time": now, "name": "telemetry/dropped", "kind": COUNTER, "value": self._dropped})
+        if entries is not None:
+            metric, value = entries
+            for mid in np.unique(metric):
+                name, kind = self._names[int(mid)]
+                v = value[metric == mid]
+                row = {"time": now, "name": name, "kind": kind, "count": len(v)}
+                if kind == COUNTER:
+                    self._totals[name] = self._totals.get(name, 0) + float(v.sum())
+                    row.update(value=self._totals[name], rate=float(v.sum()) / window)
+                elif kind == GAUGE:
+                    row["value"] = float(v[-1])
+                else:
+                    p50, p90 = np.percentile(v, [50, 90])
+                    row.update(mean=float(v.mean()), min=float(v.min()), max=float(v.max()),
+                               p50=float(p50), p90=float(p90))
+                rows.append(row)
+        for row in rows:
+            if self._csv:
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+
+# Process-wide instance; stays a no-op until someone calls telemetry.start()
+telemetry = Telemetry()
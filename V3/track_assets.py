@@ -0,0 +1,199 @@
+"""
+Preprocessed, read-only track data shared by every env process.
+
+For each track the scaled pixels and everything derived from them are built once
+into tracks/cache/track{n}_{W}x{H}/ as .npy files:
+
+    pixels.npy          (W, H, 3) uint8   the scaled track image
+    wall_mask.npy       (W, H)    bool    the env's `color <= (100, 100, 100)` wall test
+    wall_distance.npy   (W, H)    float32 distance in pixels to the nearest wall pixel
+    checkpoint_map.npy  (W, H)    uint8   bit i set where the pixel matches checkpoint color i
+    empty_level.npy     (W, H)    int8    level of the largest empty occupancy-pyramid block
+                                          around the pixel, -1 on walls (see sensors.empty_levels)
+    collision.npy       (B, W, H/8) uint8 configuration-space collision bits per heading bin,
+                                          packed along y (see collision.config_space)
+
+Envs memory-map them read-only, so K workers share one copy through the page cache
+and attaching costs no decoding. Call build_all() in a parent process before
+starting workers so they only ever attach.
+"""
+import json
+import os
+
+import numpy as np
+
+from collision import CAR_SIZE, HEADING_BINS, config_space
+from sensors import empty_levels, wall_mask
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACK_DIR = os.path.join(ASSET_DIR, "tracks")
+CACHE_DIR = os.path.join(TRACK_DIR, "cache")
+FORMAT = 3
+
+CHECKPOINT_COLORS = [
+    # colors used with eye drop tool
+    # (255, 0, 255),     # CP0: magenta
+    # (0, 255, 255),     # CP1: cyan
+    # (255, 255, 0),     # CP2: yellow
+    # (255, 128, 0),     # CP3: orange
+    # (0, 255, 0),       # CP4: green
+
+    # real colors
+    (234, 51, 247),     # CP0: magenta
+    (117, 251, 253),     # CP1: cyan
+    (255, 255, 84),     # CP2: yellow
+    (240, 156, 73),     # CP3: orange
+    (117, 251, 76),       # CP4: green
+]
+COLOR_TOL = 40
+
+FIELDS = ("pixels", "wall_mask", "wall_distance", "checkpoint_map", "empty_level", "collision")
+
+# Attached tracks in this process: (track_num, size) -> TrackAssets
+_ATTACHED = {}
+
+
+class TrackAssets:
+    """Read-only arrays for one track, indexed [x, y]."""
+
+    def __init__(self, arrays):
+        self.pixels = arrays["pixels"]
+        self.wall_mask = arrays["wall_mask"]
+        self.wall_distance = arrays["wall_distance"]
+        self.checkpoint_map = arrays["checkpoint_map"]
+        self.empty_level = arrays["empty_level"]
+        self.collision = arrays["collision"]
+
+
+def track_numbers():
+    """Track numbers of every tracks/track{n}.png, sorted."""
+    names = (f[len("track"):-len(".png")] for f in os.listdir(TRACK_DIR)
+             if f.startswith("track") and f.endswith(".png"))
+    return sorted(int(n) for n in names if n.isdigit())
+
+
+def load_track_assets(track_num, size=(800, 600)):
+    """Attach to a track's shared assets, building them first if needed."""
+    key = (track_num, tuple(size))
+    if key not in _ATTACHED:
+        path = _bundle_dir(track_num, size)
+        if _stale(path, track_num):
+            _build(track_num, size)
+        _ATTACHED[key] = TrackAssets(
+            {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in FIELDS}
+        )
+    return _ATTACHED[key]
+
+
+def build_all(size=(800, 600)):
+    """Make sure every track's assets exist (call before spawning workers)."""
+    for n in track_numbers():
+        if _stale(_bundle_dir(n, size), n):
+            _build(n, size)
+
+
+# -----------------------------------
+# Building
+# -----------------------------------
+
+def _bundle_dir(track_num, size):
+    return os.path.join(CACHE_DIR, f"track{track_num}_{size[0]}x{size[1]}")
+
+
+def _source(track_num):
+    src = os.path.join(TRACK_DIR, f"track{track_num}.png")
+    st = os.stat(src)
+    return src, {"format": FORMAT, "source_size": st.st_size, "source_mtime": st.st_mtime,
+                 "car_size": list(CAR_SIZE), "heading_bins": HEADING_BINS}
+
+
+def _stale(path, track_num):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f) != _source(track_num)[1]
+    except (FileNotFoundError, ValueError):
+        return True
+
+
+def _build(track_num, size):
+    import pygame
+
+    src, meta = _source(track_num)
+    pixels = pygame.surfarray.array3d(pygame.transform.scale(pygame.image.load(src), size))
+    mask = wall_mask(pixels)
+    arrays = {
+        "pixels": pixels,
+        "wall_mask": mask,
+        "wall_distance": distance_field(mask),
+        "checkpoint_map": checkpoint_map(pixels),
+        "empty_level": empty_levels(mask),
+        "collision": config_space(mask),
+    }
+
+    # Write into a private directory and rename it into place, so a concurrent
+    # reader never sees half a bundle; if another process won the race, keep theirs
+    path = _bundle_dir(track_num, size)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    if os.path.isdir(path):
+        old = f"{path}.{os.getpid()}.old"
+        os.rename(path, old)
+        _rmtree(old)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        _rmtree(tmp)
+
+
+def _rmtree(path):
+    import shutil
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def checkpoint_map(pixels):
+    """Bit i set where the pixel is within COLOR_TOL of CHECKPOINT_COLORS[i] on every channel."""
+    px = pixels.astype(np.int16)
+    out = np.zeros(px.shape[:2], dtype=np.uint8)
+    for i, color in enumerate(CHECKPOINT_COLORS):
+        close = (np.abs(px - np.array(color, dtype=np.int16)) <= COLOR_TOL).all(axis=-1)
+        out |= close.astype(np.uint8) << i
+    return out
+
+
+def distance_field(mask):
+    """
+    Exact Euclidean distance from every pixel to the nearest True pixel (inf if none).
+
+    Separable: first the distance to the nearest wall in the same column, then for
+    every row min over x' of (x - x')^2 + column_dist(x')^2, scanning offsets only
+    while they can still beat the current maximum.
+    """
+    w, h = mask.shape
+    inf = np.float64(np.inf)
+
+    # Pass 1: vertical distance (along y) to the nearest wall pixel
+    col = np.full((w, h), inf)
+    run = np.full(w, inf)
+    for y in range(h):
+        run = np.where(mask[:, y], 0.0, run + 1)
+        col[:, y] = run
+    run = np.full(w, inf)
+    for y in range(h - 1, -1, -1):
+        run = np.where(mask[:, y], 0.0, run + 1)
+        col[:, y] = np.minimum(col[:, y], run)
+
+    # Pass 2: combine along x
+    g2 = col ** 2
+    best = g2.copy()
+    for d in range(1, w):
+        if d * d >= best.max():
+            break
+        d2 = float(d * d)
+        np.minimum(best[d:], g2[:-d] + d2, out=best[d:])
+        np.minimum(best[:-d], g2[d:] + d2, out=best[:-d])
+    return np.sqrt(best).astype(np.float32)
@@ -0,0 +1,182 @@
+"""
+Many cars racing on one track: car-car contacts and cars visible to each other's LiDAR.
+
+TrafficVecEnv is a CarLidarVecEnv whose cars are solid. Every step the car centers go
+into a SpatialHash (one sort), and only pairs in neighbouring cells are tested:
+
+    contacts  cars closer than a car diagonal, then an exact oriented-box overlap test;
+              both cars of a touching pair crash like they would into a wall
+    LiDAR     cars within max_range of each other, then an exact ray / box intersection;
+              a ray reports the nearer of the wall and the car it hits
+
+A car that has just been (re)spawned is a ghost: it neither collides with other cars
+nor sees them or shows up on their LiDAR until it no longer touches any car, so a
+whole field can start on one start pose.
+"""
+import math
+
+import numpy as np
+
+from collision import CAR_SIZE
+from vec_env import CarLidarVecEnv
+
+# Cell coordinates are packed as (cx + BIAS) * STRIDE + (cy + BIAS)
+STRIDE = 1 << 21
+BIAS = 1 << 20
+
+
+class SpatialHash:
+    """
+    Uniform grid over points, built with one sort of their cell keys.
+
+    near() and pairs() find the points closer than a radius by looking only at the
+    cells within reach, so their cost grows with the number of nearby pairs rather
+    than with N^2.
+    """
+
+    def __init__(self, x, y, cell):
+        self.x, self.y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        self.cell = float(cell)
+        cx = np.floor(self.x / self.cell).astype(np.int64)
+        cy = np.floor(self.y / self.cell).astype(np.int64)
+        keys = (cx + BIAS) * STRIDE + (cy + BIAS)
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def pairs(self, radius, directed=False):
+        """
+        (i, j) index arrays of the points closer than `radius`: each pair once with
+        i < j, or in both orders with `directed`.
+        """
+        i, j = self.near(self.x, self.y, radius)
+        keep = (i != j) if directed else (i < j)
+        return i[keep], j[keep]
+
+    def near(self, qx, qy, radius):
+        """(q, j) index arrays of every stored point j closer than `radius` to query point q."""
+        qx, qy = np.asarray(qx, dtype=np.float64), np.asarray(qy, dtype=np.float64)
+        reach = int(math.ceil(radius / self.cell))
+        off = np.arange(-reach, reach + 1)
+        ox, oy = (v.ravel() for v in np.meshgrid(off, off, indexing="ij"))
+        cx = np.floor(qx / self.cell).astype(np.int64)
+        cy = np.floor(qy / self.cell).astype(np.int64)
+        wanted = (cx[:, None] + ox + BIAS) * STRIDE + (cy[:, None] + oy + BIAS)  # (queries, cells)
+        lo = np.searchsorted(self.keys, wanted, "left").ravel()
+        count = np.searchsorted(self.keys, wanted, "right").ravel() - lo
+
+        # Expand every (query, cell) into the run of points stored in that cell
+        total = int(count.sum())
+        starts = np.cumsum(count) - count
+        q = np.repeat(np.repeat(np.arange(len(qx)), len(ox)), count)
+        j = self.order[np.arange(total) - np.repeat(starts - lo, count)]
+        close = (qx[q] - self.x[j]) ** 2 + (qy[q] - self.y[j]) ** 2 < radius * radius
+        return q[close], j[close]
+
+
+def _axes(angle_deg):
+    """Unit vectors along a car's length (u) and width (v), as in get_rotated_hitbox."""
+    rad = np.radians(-np.asarray(angle_deg, dtype=np.float64))
+    c, s = np.cos(rad), np.sin(rad)
+    return (c, s), (-s, c)
+
+
+def boxes_overlap(x, y, angle, i, j, size=CAR_SIZE):
+    """For each pair (i[k], j[k]), whether the two cars' rotated hitboxes overlap (separating axes)."""
+    hw, hh = size[0] / 2, size[1] / 2
+    (ux, uy), (vx, vy) = _axes(angle)
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    overlap = np.ones(len(i), dtype=bool)
+    for ax, ay in ((ux[i], uy[i]), (vx[i], vy[i]), (ux[j], uy[j]), (vx[j], vy[j])):
+        reach = (hw * (np.abs(ux[i] * ax + uy[i] * ay) + np.abs(ux[j] * ax + uy[j] * ay))
+                 + hh * (np.abs(vx[i] * ax + vy[i] * ay) + np.abs(vx[j] * ax + vy[j] * ay)))
+        overlap &= np.abs(dx * ax + dy * ay) <= reach
+    return overlap
+
+
+def ray_box_distances(ox, oy, cos_a, sin_a, bx, by, b_angle, size=CAR_SIZE):
+    """
+    Distance along each ray (origin (ox, oy), direction (cos_a, sin_a)) to a car's
+    rotated hitbox centered at (bx, by); inf when the ray misses, 0 from inside it.
+    All arguments broadcast together.
+    """
+    hw, hh = size[0] / 2, size[1] / 2
+    (ux, uy), (vx, vy) = _axes(b_angle)
+    px, py = ox - bx, oy - by
+    t_in, t_out = np.full(np.broadcast(px, cos_a, ux).shape, -np.inf), np.inf
+    for (ax, ay), half in (((ux, uy), hw), ((vx, vy), hh)):
+        p = px * ax + py * ay
+        d = cos_a * ax + sin_a * ay
+        # Slab |p + t d| <= half; a ray parallel to it is either always or never inside
+        d_safe = np.where(d == 0, 1.0, d)
+        t1, t2 = (-half - p) / d_safe, (half - p) / d_safe
+        parallel_in = np.abs(p) <= half
+        t_in = np.maximum(t_in, np.where(d == 0, np.where(parallel_in, -np.inf, np.inf), np.minimum(t1, t2)))
+        t_out = np.minimum(t_out, np.where(d == 0, np.where(parallel_in, np.inf, -np.inf), np.maximum(t1, t2)))
+    hit = (t_in <= t_out) & (t_out >= 0)
+    return np.where(hit, np.maximum(t_in, 0.0), np.inf)
+
+
+class TrafficVecEnv(CarLidarVecEnv):
+    """
+    CarLidarVecEnv with solid cars; takes the same arguments.
+
+    info["contact"] marks cars that crashed into another car this step (info["crashed"]
+    covers both walls and cars), and env.ghost the cars that are still passing through.
+    """
+
+    def __init__(self, num_envs=32, track_num=1, sensor=None, max_steps=None, start_pose=None):
+        self.ghost = np.ones(int(num_envs), dtype=bool)
+        self.contact = np.zeros(int(num_envs), dtype=bool)
+        self.diagonal = math.hypot(*CAR_SIZE)
+        super().__init__(num_envs, track_num, sensor, max_steps, start_pose)
+
+    def _place(self, which):
+        super()._place(which)
+        self.ghost[which] = True
+
+    def _crashes(self, next_x, next_y):
+        crashed = super()._crashes(next_x, next_y)
+        # Cars that hit a wall stay where they were
+        x = np.where(crashed, self.x, next_x)
+        y = np.where(crashed, self.y, next_y)
+        i, j = SpatialHash(x, y, self.diagonal).pairs(self.diagonal)
+        touching = boxes_overlap(x, y, self.angle, i, j)
+        i, j = i[touching], j[touching]
+
+        # Ghosts touching nothing become solid; solid cars touching solid cars crash
+        near = np.zeros(self.num_envs, dtype=bool)
+        near[i] = near[j] = True
+        self.ghost &= near
+        solid = ~self.ghost[i] & ~self.ghost[j]
+        self.contact[:] = False
+        self.contact[i[solid]] = self.contact[j[solid]] = True
+        return crashed | self.contact
+
+    def _scan(self, which=slice(None)):
+        cars = np.arange(self.num_envs)[which]
+        dist = self.sensor.distances(self.wall_mask, np.stack([self.x[cars], self.y[cars]], axis=1),
+                                     self.angle[cars], levels=self.empty_level)
+
+        # Solid cars within reach of each solid scanning car
+        seen = np.flatnonzero(~self.ghost)
+        looking = np.flatnonzero(~self.ghost[cars])
+        reach = self.max_lidar + self.diagonal / 2
+        grid = SpatialHash(self.x[seen], self.y[seen], reach)
+        q, j = grid.near(self.x[cars[looking]], self.y[cars[looking]], reach)
+        row, j = looking[q], seen[j]
+        i = cars[row]
+        # A car beyond every wall hit of the scanning car can't be seen first
+        keep = (i != j) & (np.hypot(self.x[j] - self.x[i], self.y[j] - self.y[i])
+                           < dist[row].max(axis=1) + self.diagonal / 2)
+        row, i, j = row[keep], i[keep], j[keep]
+        if len(i):
+            rad = np.radians(-self.sensor.ray_angles(self.angle[i]))  # (pairs, rays)
+            t = ray_box_distances(self.x[i, None], self.y[i, None], np.cos(rad), np.sin(rad),
+                                  self.x[j, None], self.y[j, None], self.angle[j, None])
+            np.minimum.at(dist, row, t)
+        return self.sensor.normalize(dist, self.np_random)
+
+    def step(self, actions):
+        obs, rewards, terminated, truncated, info = super().step(actions)
+        info["contact"] = self.contact.copy()
+        return obs, rewards, terminated, truncated, info
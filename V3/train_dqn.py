@@ -1,45 +1,229 @@
+import argparse
+import time
+import numpy as np
 import torch
-from car_lidar_env import CarLidarEnv
+from car_lidar_env import CarLidarEnv, MultiTrackEnv
 from dqn_agent import DQNAgent, ReplayBuffer
+from checkpoint import latest_checkpoint, load_checkpoint, save_checkpoint
+from learner import BackgroundLearner, Learner
+from telemetry import telemetry
 
-env = CarLidarEnv(render_mode="human", track_num=1)
 
-obs, _ = env.reset()
-obs_dim = len(obs)
-action_dim = env.action_space.n
+def train(env, agent, buffer, episodes=1000, target_update_freq=500, batch_size=64,
+          max_steps=None, global_step=0, start_episode=0,
+          checkpoint_dir=None, checkpoint_every=50, verbose=True,
+          replay_ratio=1.0, learner_threads=None, background_learner=False, learner_state=None,
+          learner=None):
+    """
+    Run the DQN loop until episode `episodes` (or until `max_steps` env steps). Returns global_step.
 
-agent = DQNAgent(obs_dim, action_dim)
-buffer = ReplayBuffer()
+    With `checkpoint_dir` set, the full training state is saved every `checkpoint_every`
+    episodes; pass the restored `global_step`/`start_episode`/`learner_state` to continue a run.
 
-episodes = 1000
-target_update_freq = 500
-global_step = 0
+    `replay_ratio` is the number of gradient updates per env step (see learner.py);
+    `background_learner` runs them on a separate thread and `learner_threads` sets
+    torch's intra-op thread count. Pass a `learner` to keep one update schedule
+    (fractional credit, owed updates) across several train() calls, e.g. training in
+    chunks; it then replaces batch_size/replay_ratio/background_learner and the caller
+    closes it.
+    """
+    if learner_threads:
+        torch.set_num_threads(learner_threads)
+    own_learner = learner is None
+    if own_learner:
+        learner = (BackgroundLearner if background_learner else Learner)(agent, buffer, batch_size, replay_ratio)
+    if learner_state is not None:
+        learner.load_state_dict(learner_state)
+    first_step, start = global_step, time.perf_counter()
+    updates = learner.updates
 
-for ep in range(episodes):
+    try:
+        for ep in range(start_episode, episodes):
+            obs, _ = env.reset()
+            done = False
+            ep_reward = 0
+
+            while not done:
+                # Without the learner's agent_lock: see BackgroundLearner
+                action = agent.select_action(obs)
+                next_obs, reward, terminated, truncated, info = env.step(action)
+                done = terminated or truncated
+
+                learner.add(obs, action, reward, next_obs, terminated, done)
+
+                if global_step % target_update_freq == 0:
+                    learner.update_target()
+
+                agent.update_epsilon()
+
+                obs = next_obs
+                ep_reward += reward
+                global_step += 1
+                telemetry.count("train/env_steps")
+
+                if max_steps is not None and global_step >= max_steps:
+                    return global_step
+
+            telemetry.observe("episode/return", ep_reward)
+            telemetry.gauge("train/epsilon", agent.epsilon)
+            telemetry.gauge("train/replay_size", len(buffer))
+            if verbose:
+                print(f"Episode {ep} | Reward: {ep_reward:.2f} | Epsilon: {agent.epsilon:.3f} | "
+                      f"Replay ratio: {(learner.updates - updates) / max(global_step - first_step, 1):.2f}")
+
+            if checkpoint_dir is not None and (ep + 1) % checkpoint_every == 0:
+                with learner.paused():
+                    save_checkpoint(checkpoint_dir, agent, buffer, global_step, ep + 1, env, learner=learner)
+    finally:
+        if own_learner:
+            learner.close()
+        if verbose:
+            steps, elapsed = global_step - first_step, time.perf_counter() - start
+            updates = learner.updates - updates
+            print(f"{steps} env steps, {updates} updates "
+                  f"(replay ratio {updates / max(steps, 1):.2f}, target {learner.replay_ratio:g}) | "
+                  f"{steps / elapsed:.0f} env steps/s, {updates / elapsed:.0f} updates/s")
+
+    return global_step
+
+
+def train_vec(env, agent, buffer, episodes=1000, target_update_freq=500, batch_size=64,
+              max_steps=None, global_step=0, verbose=True, log_every=100,
+              replay_ratio=1.0, learner_threads=None, background_learner=False):
+    """
+    The DQN loop on a CarLidarVecEnv: one forward pass picks every car's action and
+    each vector step adds one transition per car. Runs until `episodes` episodes have
+    finished across all cars (or until `max_steps` transitions). Returns global_step.
+
+    global_step, target_update_freq, epsilon decay and `replay_ratio` all count
+    transitions, so N cars spend the same budget per transition as train().
+    """
+    if learner_threads:
+        torch.set_num_threads(learner_threads)
+    learner = (BackgroundLearner if background_learner else Learner)(agent, buffer, batch_size, replay_ratio)
+    first_step, start = global_step, time.perf_counter()
+    n = env.num_envs
     obs, _ = env.reset()
-    done = False
-    ep_reward = 0
+    ep_reward = np.zeros(n)
+    finished = []
+    vec_steps = 0
+
+    try:
+        while len(finished) < episodes:
+            actions = agent.select_actions(obs)
+            next_obs, rewards, terminated, truncated, info = env.step(actions)
+            done = terminated | truncated
+
+            # Finished cars were already reset; their transition ends on the final observation
+            last_obs = next_obs
+            if done.any():
+                last_obs = np.where(done[:, None], info["final_obs"], next_obs)
+            # Truncated cars end their n-step windows but still bootstrap from last_obs
+            learner.add_batch(obs, actions, rewards, last_obs, terminated, done)
+
+            # Same schedule as train(): every multiple of target_update_freq this step covers
+            if (global_step + n - 1) // target_update_freq > (global_step - 1) // target_update_freq:
+                learner.update_target()
+            agent.update_epsilon(n)
+
+            ep_reward += rewards
+            finished.extend(ep_reward[done].tolist())
+            for r in ep_reward[done].tolist():
+                telemetry.observe("episode/return", r)
+            ep_reward[done] = 0
+            obs = next_obs
+            global_step += n
+            vec_steps += 1
+            telemetry.count("train/env_steps", n)
+            if vec_steps % log_every == 0:
+                telemetry.gauge("train/epsilon", agent.epsilon)
+                telemetry.gauge("train/replay_size", len(buffer))
 
-    while not done:
-        action = agent.select_action(obs)
-        next_obs, reward, terminated, truncated, info = env.step(action)
-        done = terminated or truncated
+            if verbose and vec_steps % log_every == 0 and finished:
+                print(f"Step {global_step} | Episodes {len(finished)} | "
+                      f"Reward (last 100): {np.mean(finished[-100:]):.2f} | Epsilon: {agent.epsilon:.3f}")
 
-        buffer.add(obs, action, reward, next_obs, done)
+            if max_steps is not None and global_step >= max_steps:
+                break
+    finally:
+        learner.close()
+        if verbose:
+            steps, elapsed = global_step - first_step, time.perf_counter() - start
+            print(f"{steps} env steps on {n} cars, {learner.updates} updates | "
+                  f"{steps / elapsed:.0f} env steps/s, {learner.updates / elapsed:.0f} updates/s")
 
-        loss = agent.train_step(buffer)
+    return global_step
 
-        if global_step % target_update_freq == 0:
-            agent.update_target()
 
-        agent.update_epsilon()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="episodes between checkpoints")
+    parser.add_argument("--n-step", type=int, default=1, help="bootstrap from n-step returns")
+    parser.add_argument("--replay-ratio", type=float, default=1.0, help="gradient updates per env step")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learner-threads", type=int, help="torch threads for gradient updates")
+    parser.add_argument("--background-learner", action="store_true",
+                        help="run gradient updates on a thread that overlaps env stepping")
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1], help="more than one switches track every episode")
+    parser.add_argument("--schedule", default="round_robin", choices=["round_robin", "random", "weighted"])
+    parser.add_argument("--weights", type=float, nargs="+", help="per-track weights for --schedule weighted")
+    parser.add_argument("--resume", action="store_true", help="continue from the latest checkpoint")
+    parser.add_argument("--telemetry", help="stream metrics to this .csv or .jsonl file")
+    parser.add_argument("--cars", type=int, default=1,
+                        help="more than one steps that many headless cars together on the first track "
+                             "(without checkpoints)")
+    parser.add_argument("--history", type=int, default=1,
+                        help="observe the last N LiDAR scans (replay keeps each scan once)")
+    args = parser.parse_args()
+
+    if args.telemetry:
+        telemetry.start(args.telemetry)
+
+    if args.cars > 1:
+        if args.resume:
+            parser.error("--resume needs a single car")
+        if args.history > 1:
+            parser.error("--history needs a single car")
+        from vec_env import CarLidarVecEnv
+        env = CarLidarVecEnv(args.cars, track_num=args.tracks[0])
+    elif len(args.tracks) > 1:
+        env = MultiTrackEnv(render_mode="human", tracks=args.tracks, schedule=args.schedule, weights=args.weights,
+                            history=args.history)
+    else:
+        env = CarLidarEnv(render_mode="human", track_num=args.tracks[0], history=args.history)
+
+    obs, _ = env.reset()
+    obs_dim = obs.shape[-1]
+    action_dim = env.single_action_space.n if args.cars > 1 else env.action_space.n
+
+    agent = DQNAgent(obs_dim, action_dim)
+    # Observations are stored as one byte per reading when the sensor allows it (exact)
+    buffer = ReplayBuffer(n_step=args.n_step, gamma=agent.gamma, obs_values=env.sensor.readings(),
+                          history=args.history)
 
-        obs = next_obs
-        ep_reward += reward
-        global_step += 1
+    global_step, start_episode, learner_state = 0, 0, None
+    if args.resume:
+        path = latest_checkpoint(args.checkpoint_dir)
+        if path is None:
+            print(f"No checkpoint in {args.checkpoint_dir}, starting fresh.")
+        else:
+            global_step, start_episode, learner_state = load_checkpoint(path, agent, buffer, env)
+            print(f"Resumed from {path} (episode {start_episode}, step {global_step})")
 
-    print(f"Episode {ep} | Reward: {ep_reward:.2f} | Epsilon: {agent.epsilon:.3f}")
+    if args.cars > 1:
+        train_vec(env, agent, buffer, episodes=args.episodes, target_update_freq=500, batch_size=args.batch_size,
+                  replay_ratio=args.replay_ratio, learner_threads=args.learner_threads,
+                  background_learner=args.background_learner)
+    else:
+        train(env, agent, buffer, episodes=args.episodes, target_update_freq=500, batch_size=args.batch_size,
+              global_step=global_step, start_episode=start_episode,
+              checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+              replay_ratio=args.replay_ratio, learner_threads=args.learner_threads,
+              background_learner=args.background_learner, learner_state=learner_state)
 
-# Save model
-torch.save(agent.q_net.state_dict(), "dqn_car.pth")
-print("Saved model.")
+    # Save model
+    torch.save(agent.q_net.state_dict(), "dqn_car.pth")
+    print("Saved model.")
+    telemetry.close()
@@ -0,0 +1,154 @@
+"""
+N cars on one track, stepped together as arrays.
+
+CarLidarVecEnv runs the CarLidarEnv rules (discrete turn / accelerate actions,
+speed cap, friction, collision, LiDAR and checkpoints) for every car at once on
+the shared, memory-mapped track assets. Cars don't see each other. A car whose
+episode ends is put back on the start pose in the same step (gymnasium's
+"same-step" autoreset): the returned observation is its new episode's first one,
+and info["final_obs"] holds the observation the episode ended on.
+
+For SB3 wrap it with sb3_vec_env.SB3CarVecEnv; train_dqn.train_vec drives it
+directly.
+"""
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode
+
+from collision import collides_many
+from sensors import LidarSensor
+from telemetry import telemetry
+from track_assets import CHECKPOINT_COLORS, load_track_assets
+from car_lidar_env import DEFAULT_START, START_POSES
+
+# Values of info["checkpoint"], as in CarLidarEnv.step
+EVENTS = np.array([None, "checkpoint", "lap"], dtype=object)
+
+
+class CarLidarVecEnv(gym.vector.VectorEnv):
+    """
+    Args:
+        num_envs: Number of cars
+        track_num: Track they all drive on
+        sensor: LidarSensor shared by every car (default: the five original rays);
+            method="pyramid" pays off once num_envs * num_rays reaches the thousands
+        max_steps: Truncate each car's episode after this many steps (None = never)
+        start_pose: (x, y, angle) overriding START_POSES
+    """
+    metadata = {"autoreset_mode": AutoresetMode.SAME_STEP, "render_modes": [None]}
+
+    def __init__(self, num_envs=8, track_num=1, sensor=None, max_steps=None, start_pose=None):
+        self.num_envs = int(num_envs)
+        self.track_num = track_num
+        self.WIDTH, self.HEIGHT = 800, 600
+        assets = load_track_assets(track_num, (self.WIDTH, self.HEIGHT))
+        self.wall_mask = assets.wall_mask
+        self.checkpoint_map = assets.checkpoint_map
+        self.empty_level = assets.empty_level
+        self.collision_table = assets.collision
+        self.start_pose = start_pose or START_POSES.get(track_num, DEFAULT_START)
+        self.max_steps = max_steps
+
+        self.sensor = sensor if sensor is not None else LidarSensor()
+        self.max_lidar = self.sensor.max_range
+        self.single_action_space = spaces.Discrete(3)
+        self.single_observation_space = spaces.Box(low=0, high=1, shape=(self.sensor.num_rays,), dtype=np.float32)
+        self.action_space = spaces.MultiDiscrete(np.full(self.num_envs, 3))
+        self.observation_space = spaces.Box(low=0, high=1, shape=(self.num_envs, self.sensor.num_rays),
+                                            dtype=np.float32)
+
+        # Same constants as CarLidarEnv
+        self.acceleration = 0.25
+        self.friction = 0.05
+        self.turn_speed = 4
+        self.max_speed = 8
+        self.num_checkpoints = len(CHECKPOINT_COLORS)
+
+        n = self.num_envs
+        self.x, self.y, self.angle = np.zeros(n), np.zeros(n), np.zeros(n)
+        self.velocity_x, self.velocity_y = np.zeros(n), np.zeros(n)
+        self.current_checkpoint = np.zeros(n, dtype=np.intp)
+        self.steps = np.zeros(n, dtype=np.int64)
+
+    # -----------------------------------
+    # Helpers
+    # -----------------------------------
+
+    def _place(self, which):
+        """Put the selected cars on the start pose, at rest, with no checkpoints."""
+        self.x[which], self.y[which], self.angle[which] = self.start_pose
+        self.velocity_x[which] = self.velocity_y[which] = 0.0
+        self.current_checkpoint[which] = 0
+        self.steps[which] = 0
+
+    def _crashes(self, next_x, next_y):
+        """Which cars can't move to (next_x, next_y)."""
+        return collides_many(self.collision_table, next_x, next_y, self.angle)
+
+    def _scan(self, which=slice(None)):
+        return self.sensor.scan(self.wall_mask, np.stack([self.x[which], self.y[which]], axis=1),
+                                self.angle[which], rng=self.np_random, levels=self.empty_level)
+
+    # -----------------------------------
+    # Vector env API
+    # -----------------------------------
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self._np_random, self._np_random_seed = gym.utils.seeding.np_random(seed)
+        self._place(slice(None))
+        self.sensor.reset()
+        return self._scan(), {}
+
+    def step(self, actions):
+        actions = np.asarray(actions).reshape(self.num_envs)
+        self.angle += np.where(actions == 0, self.turn_speed, np.where(actions == 1, -self.turn_speed, 0))
+        gas = actions == 2
+        rad = np.radians(self.angle[gas])
+        self.velocity_x[gas] += np.cos(rad) * self.acceleration
+        self.velocity_y[gas] -= np.sin(rad) * self.acceleration
+
+        # Speed limiting + friction
+        speed = np.sqrt(self.velocity_x ** 2 + self.velocity_y ** 2)
+        scale = np.where(speed > self.max_speed, self.max_speed / np.maximum(speed, 1e-12), 1.0)
+        self.velocity_x *= scale
+        self.velocity_y *= scale
+        self.velocity_x *= 1 - self.friction
+        self.velocity_y *= 1 - self.friction
+
+        next_x = self.x + self.velocity_x
+        next_y = self.y + self.velocity_y
+        crashed = self._crashes(next_x, next_y)
+        rewards = np.where(crashed, -10.0, 0.02 + 0.03 * speed)
+        self.velocity_x[crashed] = self.velocity_y[crashed] = 0.0
+        self.x = np.where(crashed, self.x, next_x)
+        self.y = np.where(crashed, self.y, next_y)
+
+        obs = self._scan()
+
+        # Checkpoints: the pixel under each car must carry its next checkpoint's bit
+        cx, cy = self.x.astype(np.intp), self.y.astype(np.intp)
+        on_map = (cx >= 0) & (cx < self.WIDTH) & (cy >= 0) & (cy < self.HEIGHT)
+        bits = self.checkpoint_map[np.where(on_map, cx, 0), np.where(on_map, cy, 0)]
+        hit = on_map & (bits >> self.current_checkpoint & 1).astype(bool)
+        self.current_checkpoint += hit
+        lap = self.current_checkpoint >= self.num_checkpoints
+        self.current_checkpoint[lap] = 0
+        rewards += np.where(lap, 20.0, np.where(hit, 5.0, 0.0))
+
+        if telemetry.active:
+            telemetry.count("env/crashes", int(crashed.sum()))
+            telemetry.count("env/checkpoints", int(hit.sum()))
+            telemetry.count("env/laps", int(lap.sum()))
+
+        self.steps += 1
+        terminated = crashed
+        truncated = ~terminated & (self.steps >= self.max_steps) if self.max_steps else np.zeros_like(crashed)
+        done = terminated | truncated
+        info = {"crashed": crashed, "checkpoint": EVENTS[hit.astype(np.intp) + lap]}
+        if done.any():
+            info["final_obs"], info["_final_obs"] = obs.copy(), done
+            self._place(done)
+            obs[done] = self._scan(done)
+        return obs, rewards, terminated, truncated, info
@@ -0,0 +1,174 @@
+"""
+Headless batch evaluation of a saved policy across tracks.
+
+    python tools/evaluate.py V1/ppo_lidar8_laps.zip
+    python tools/evaluate.py V2/ppo_car_lidar.zip --episodes 8 --tracks 1 2 3 4
+    python tools/evaluate.py V3/dqn_car.pth --workers 8
+    python tools/evaluate.py V2/ppo_car_lidar.zip --server unix:/tmp/policy.sock --server-model ppo
+    python tools/evaluate.py V3/dqn_car.pth --record runs/   # then: python tools/replay.py runs/track1_ep000.traj
+
+Runs M episodes per track in a process pool with deterministic actions and reports,
+per track: mean return, laps per episode, mean lap time (steps), crash rate and
+env steps/sec (time spent inside env.step only, and end to end including inference).
+"""
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import time
+
+from versions import TRACKS, make_env, prepare_assets, print_table, use_version
+
+_policy = None
+_envs = {}
+_cfg = {}
+
+
+def init_worker(version, model_path, max_steps, server=None, server_model=None, record_dir=None):
+    global _policy
+    use_version(version)
+    if server:
+        # Share the model loaded by tools/inference_server.py instead of loading a copy
+        from inference_server import InferenceClient
+        _policy = InferenceClient(server, server_model)
+    else:
+        if not model_path.endswith(".npz"):  # the NumPy runner never imports torch
+            import torch
+            torch.set_num_threads(1)
+        from policies import load_policy
+        _policy = load_policy(model_path)
+    _cfg.update(version=version, max_steps=max_steps, model=model_path, record_dir=record_dir)
+
+
+def run_episode(job):
+    track, episode = job
+    env = _envs.get(track)
+    if env is None:
+        env = _envs[track] = make_env(_cfg["version"], track, _cfg["max_steps"])
+
+    recorder = None
+    if _cfg["record_dir"]:
+        from trajectory import record_step, recorder_for
+        path = os.path.join(_cfg["record_dir"], f"track{track}_ep{episode:03d}.traj")
+        recorder = recorder_for(env, path, version=_cfg["version"], track=track,
+                                model=os.path.basename(_cfg["model"]))
+
+    start = time.perf_counter()
+    obs, _ = env.reset(seed=episode)
+    if recorder:
+        record_step(recorder, env, episode, 0, 0, obs, 0.0, False, False, {})
+    total, steps, env_time = 0.0, 0, 0.0
+    laps, lap_steps, last_lap, crashed = 0, [], 0, False
+    done = False
+    while not done:
+        action = _policy.predict(obs)
+        t = time.perf_counter()
+        obs, reward, terminated, truncated, info = env.step(action)
+        env_time += time.perf_counter() - t
+        total += reward
+        steps += 1
+        if recorder:
+            record_step(recorder, env, episode, steps, action, obs, reward, terminated, truncated, info)
+
+        lap = info.get("checkpoint") == "lap" or info.get("laps", laps) > laps
+        if lap:
+            laps += 1
+            lap_steps.append(steps - last_lap)
+            last_lap = steps
+        crashed = crashed or (terminated and info.get("crashed", False))
+        done = terminated or truncated
+
+    if recorder:
+        recorder.close()
+    return dict(track=track, ret=total, steps=steps, laps=laps, lap_steps=lap_steps,
+                crashed=crashed, env_time=env_time, wall=time.perf_counter() - start)
+
+
+def summarize(track, results):
+    steps = sum(r["steps"] for r in results)
+    lap_steps = [s for r in results for s in r["lap_steps"]]
+    return dict(
+        track=track,
+        episodes=len(results),
+        mean_return=sum(r["ret"] for r in results) / len(results),
+        laps_per_ep=sum(r["laps"] for r in results) / len(results),
+        lap_time=sum(lap_steps) / len(lap_steps) if lap_steps else "-",
+        crash_rate=sum(r["crashed"] for r in results) / len(results),
+        mean_steps=steps / len(results),
+        env_sps=round(steps / max(sum(r["env_time"] for r in results), 1e-9)),
+        total_sps=round(steps / max(sum(r["wall"] for r in results), 1e-9)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="path to a PPO .zip or DQN .pth")
+    parser.add_argument("--version", choices=sorted(TRACKS), help="env version (default: the model's folder)")
+    parser.add_argument("--episodes", type=int, default=4, help="episodes per track")
+    parser.add_argument("--tracks", type=int, nargs="+", help="default: every track of the version")
+    parser.add_argument("--max-steps", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="optional CSV for the per-track table")
+    parser.add_argument("--server", help="query a running inference server (unix:/path or tcp:127.0.0.1:PORT)")
+    parser.add_argument("--server-model", help="model name on the server")
+    parser.add_argument("--record", metavar="DIR", help="write one trajectory file per episode to DIR")
+    args = parser.parse_args()
+
+    model = os.path.abspath(args.model)
+    version = args.version or os.path.basename(os.path.dirname(model))
+    if version not in TRACKS:
+        parser.error(f"can't tell the env version from {args.model}; pass --version")
+    tracks = args.tracks or TRACKS[version]
+
+    jobs = [(t, ep) for t in tracks for ep in range(args.episodes)]
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f"Evaluating {os.path.basename(model)} on {version} tracks {tracks}: "
+          f"{len(jobs)} episodes, {workers} workers")
+
+    record_dir = os.path.abspath(args.record) if args.record else None
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+
+    use_version(version)
+    prepare_assets(version)
+
+    # The pool respawns a worker whose initializer raises, forever: load the policy (or
+    # reach the server) once here so a bad path or address fails before any worker starts
+    try:
+        if args.server:
+            from inference_server import InferenceClient
+            InferenceClient(args.server, args.server_model).sock.close()
+        else:
+            from policies import load_policy
+            load_policy(model)
+    except Exception as e:
+        parser.error(f"can't load the policy from {args.server or args.model}: {e}")
+
+    start = time.perf_counter()
+    ctx = mp.get_context("spawn")
+    pool = ctx.Pool(workers, initializer=init_worker,
+                    initargs=(version, model, args.max_steps, args.server, args.server_model, record_dir))
+    results = pool.map(run_episode, jobs)
+    # close/join rather than terminate: pygame's SDL ignores SIGTERM in the workers
+    pool.close()
+    pool.join()
+    elapsed = time.perf_counter() - start
+
+    rows = [summarize(t, [r for r in results if r["track"] == t]) for t in tracks]
+    rows.append(summarize("all", results))
+    columns = ["track", "episodes", "mean_return", "laps_per_ep", "lap_time",
+               "crash_rate", "mean_steps", "env_sps", "total_sps"]
+    print()
+    print_table(rows, columns)
+    total_steps = sum(r["steps"] for r in results)
+    print(f"\n{total_steps} steps in {elapsed:.1f}s ({total_steps / elapsed:.0f} steps/sec across workers)")
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Export a trained policy to a low-latency inference artifact and benchmark it.
+
+    python tools/export_policy.py V3/dqn_car.pth --format torchscript   # -> V3/dqn_car.ts
+    python tools/export_policy.py V2/ppo_car_lidar.zip --format numpy   # -> V2/ppo_car_lidar.npz
+    python tools/export_policy.py V1/ppo_lidar8_laps.zip --format onnx  # needs the onnx package
+    python tools/export_policy.py V3/dqn_car.pth --bench
+
+Only the deterministic actor is exported: the DQN Q-network followed by argmax, or the
+PPO policy MLP and action head (argmax for discrete actions, clipped to the action
+bounds for continuous ones). The artifacts load with tools/policies.load_policy:
+    .ts   TorchScript, traced and frozen; runs without the training code
+    .npz  layer weights for a plain NumPy forward pass (fastest for these small nets)
+    .onnx for onnxruntime or other ONNX runtimes
+
+--bench times single-observation inference (the per-env-step case) for the eager
+model, as the training scripts call it, against every runtime available here.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from versions import use_version
+
+
+# -----------------------------------
+# Actor extraction
+# -----------------------------------
+
+def load_actor(path):
+    """
+    Returns (actor, meta, eager_act): a torch module mapping a float32 (B, obs_dim) batch
+    to actions, its metadata, and the original framework's single-observation call.
+    """
+    import torch
+    from torch import nn
+
+    class Actor(nn.Module):
+        def __init__(self, layers, discrete, low, high):
+            super().__init__()
+            self.layers = layers
+            self.discrete = discrete
+            self.register_buffer("low", torch.as_tensor(low, dtype=torch.float32))
+            self.register_buffer("high", torch.as_tensor(high, dtype=torch.float32))
+
+        def forward(self, obs):
+            out = self.layers(obs)
+            if self.discrete:
+                return out.argmax(1)
+            return torch.max(torch.min(out, self.high), self.low)
+
+    if path.endswith(".zip"):
+        from stable_baselines3 import PPO
+        from stable_baselines3.common.torch_layers import FlattenExtractor
+        from gymnasium import spaces
+
+        model = PPO.load(path, device="cpu")
+        policy = model.policy
+        features = policy.features_extractor
+        if isinstance(features, FlattenExtractor):
+            features = features.flatten
+        layers = nn.Sequential(features, *policy.mlp_extractor.policy_net, policy.action_net)
+        discrete = isinstance(model.action_space, spaces.Discrete)
+        n = model.action_space.n if discrete else model.action_space.shape[0]
+        low = np.zeros(n) if discrete else model.action_space.low
+        high = np.zeros(n) if discrete else model.action_space.high
+        kind, obs_dim = "ppo", model.observation_space.shape[0]
+
+        def eager_act(obs):
+            return model.predict(obs, deterministic=True)[0]
+    else:
+        from dqn_agent import DQN
+
+        state = torch.load(path, map_location="cpu")
+        obs_dim, n = state["net.0.weight"].shape[1], state["net.4.weight"].shape[0]
+        q_net = DQN(obs_dim, n)
+        q_net.load_state_dict(state)
+        layers = q_net.net
+        discrete, low, high, kind = True, np.zeros(n), np.zeros(n), "dqn"
+
+        def eager_act(obs):
+            # How test_dqn.py / DQNAgent.select_action run the network
+            with torch.no_grad():
+                return q_net(torch.FloatTensor(obs).unsqueeze(0)).argmax().item()
+
+    actor = Actor(layers, discrete, low, high).eval()
+    meta = {"kind": kind, "obs_dim": int(obs_dim), "discrete": discrete}
+    return actor, meta, eager_act
+
+
+def mlp_layers(actor):
+    """[(weight, bias, activation)] for a Sequential of Linear/ReLU/Tanh/Flatten modules."""
+    from torch import nn
+
+    layers = []
+    for module in actor.layers:
+        if isinstance(module, nn.Linear):
+            layers.append([module.weight.detach().numpy(), module.bias.detach().numpy(), "none"])
+        elif isinstance(module, (nn.ReLU, nn.Tanh)):
+            layers[-1][2] = "relu" if isinstance(module, nn.ReLU) else "tanh"
+        elif not isinstance(module, nn.Flatten):
+            raise ValueError(f"cannot export {type(module).__name__} to numpy")
+    return layers
+
+
+# -----------------------------------
+# Exporters
+# -----------------------------------
+
+def export_torchscript(actor, meta, out):
+    import torch
+
+    example = torch.zeros(1, meta["obs_dim"])
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(actor, example))
+    torch.jit.save(traced, out, _extra_files={"meta.json": json.dumps(meta)})
+
+
+def export_numpy(actor, meta, out):
+    arrays = {}
+    activations = []
+    for i, (w, b, act) in enumerate(mlp_layers(actor)):
+        arrays[f"w{i}"] = np.ascontiguousarray(w, dtype=np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+        activations.append(act)
+    np.savez(out, meta=json.dumps(dict(meta, activations=activations)),
+             low=actor.low.numpy(), high=actor.high.numpy(), **arrays)
+
+
+def export_onnx(actor, meta, out):
+    try:
+        import onnx
+    except ImportError:
+        raise SystemExit("ONNX export needs the onnx package (pip install onnx onnxruntime)")
+    import torch
+
+    torch.onnx.export(actor, torch.zeros(1, meta["obs_dim"]), out,
+                      input_names=["obs"], output_names=["action"],
+                      dynamic_axes={"obs": {0: "batch"}, "action": {0: "batch"}})
+    model = onnx.load(out)
+    onnx.helper.set_model_props(model, {"meta": json.dumps(meta)})
+    onnx.save(model, out)
+
+
+EXPORTERS = {
+    "torchscript": (".ts", export_torchscript),
+    "numpy": (".npz", export_numpy),
+    "onnx": (".onnx", export_onnx),
+}
+
+
+# -----------------------------------
+# Benchmark
+# -----------------------------------
+
+def bench(name, act, observations, repeats):
+    for obs in observations[:100]:  # warm up
+        act(obs)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for obs in observations:
+            act(obs)
+        times.append((time.perf_counter() - start) / len(observations))
+    return {"runtime": name, "median_us": round(np.median(times) * 1e6, 1)}
+
+
+def run_bench(actor, meta, eager_act, steps, repeats):
+    import tempfile
+    from policies import load_policy
+
+    rng = np.random.default_rng(0)
+    observations = rng.uniform(0, 1, size=(steps, meta["obs_dim"])).astype(np.float32)
+    expected = [eager_act(obs) for obs in observations]
+
+    rows = [bench("eager", eager_act, observations, repeats)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, (ext, exporter) in EXPORTERS.items():
+            out = os.path.join(tmp, "policy" + ext)
+            try:
+                exporter(actor, meta, out)
+                policy = load_policy(out)
+            except (ImportError, SystemExit) as exc:
+                print(f"skipping {fmt}: {exc}")
+                continue
+            got = [policy.predict(obs) for obs in observations]
+            if not all(np.allclose(a, b, atol=1e-5) for a, b in zip(expected, got)):
+                print(f"warning: {fmt} actions differ from the eager model")
+            rows.append(bench(fmt, policy.predict, observations, repeats))
+
+    base = rows[0]["median_us"]
+    for row in rows:
+        row["speedup"] = round(base / row["median_us"], 2)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="PPO .zip or DQN .pth")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="torchscript")
+    parser.add_argument("--out", help="defaults to the model path with the format's extension")
+    parser.add_argument("--bench", action="store_true", help="benchmark every runtime instead of exporting")
+    parser.add_argument("--steps", type=int, default=2000, help="observations per benchmark repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    use_version("V3")  # DQN checkpoints need V3's network definition
+    import torch
+    torch.set_num_threads(1)  # one env worker = one inference thread
+
+    actor, meta, eager_act = load_actor(args.model)
+    if args.bench:
+        from versions import print_table
+        print_table(run_bench(actor, meta, eager_act, args.steps, args.repeats),
+                    ["runtime", "median_us", "speedup"])
+        return
+
+    ext, exporter = EXPORTERS[args.format]
+    out = args.out or os.path.splitext(args.model)[0] + ext
+    exporter(actor, meta, out)
+    print(f"Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Local micro-batching policy inference server.
+
+    python tools/inference_server.py --model ppo=V2/ppo_car_lidar.zip --model dqn=V3/dqn_car.pth \
+        --listen unix:/tmp/policy.sock --max-batch 64 --max-wait-ms 2
+
+Each model is loaded once. Requests that arrive within --max-wait-ms of the first
+waiting one (or until --max-batch is reached) are stacked and run as one batch.
+Request latency and batch-size histograms are printed every --report-every seconds
+and on shutdown, and can be fetched with InferenceClient.stats().
+
+Clients (env workers, viewers, tools/evaluate.py --server ...) use InferenceClient:
+
+    client = InferenceClient("unix:/tmp/policy.sock", "ppo")
+    action = client.predict(obs)
+
+Wire format: every frame is [u32 length][u8 type][payload], little endian.
+    predict request : type 0, [u8 name length][name][float32 observation]
+    stats request   : type 1, empty payload
+    predict reply   : type 0, [u8 kind (0 = discrete, 1 = continuous)][int32 or float32 action]
+    stats reply     : type 1, JSON
+    error reply     : type 2, UTF-8 message
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import math
+import os
+import signal
+import socket
+import struct
+import time
+
+import numpy as np
+
+from versions import use_version
+
+PREDICT, STATS, ERROR = 0, 1, 2
+DISCRETE, CONTINUOUS = 0, 1
+HEADER = struct.Struct("<IB")
+
+
+def parse_address(address):
+    """'unix:/path' or 'tcp:host:port' (host must be local)."""
+    kind, _, rest = address.partition(":")
+    if kind == "unix":
+        return "unix", rest
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError("the inference server only listens on localhost")
+        return "tcp", (host, int(port))
+    raise ValueError(f"bad address {address!r}, expected unix:/path or tcp:127.0.0.1:PORT")
+
+
+# -----------------------------------
+# Server
+# -----------------------------------
+
+class Histogram:
+    """Counts in power-of-two buckets."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, value):
+        bucket = 0 if value < 1 else 2 ** math.ceil(math.log2(value))
+        self.counts[bucket] += 1
+        self.n += 1
+        self.total += value
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.total / max(self.n, 1),
+                "buckets": {str(k): v for k, v in sorted(self.counts.items())}}
+
+
+class ModelBatcher:
+    """Collects requests for one model and runs them as micro-batches on its own thread."""
+
+    def __init__(self, name, policy, max_batch, max_wait):
+        self.name = name
+        self.policy = policy
+        self.kind = DISCRETE if policy.discrete else CONTINUOUS
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.latency_us = Histogram()
+        self.batch_sizes = Histogram()
+
+    async def predict(self, obs):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((obs, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                obs = np.stack([b[0] for b in batch])
+                actions = await loop.run_in_executor(self.executor, self.policy.predict, obs)
+            except Exception as exc:  # report to every waiting client; the batcher keeps running
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            now = time.perf_counter()
+            self.batch_sizes.add(len(batch))
+            for (_, future, start), action in zip(batch, actions):
+                self.latency_us.add((now - start) * 1e6)
+                future.set_result(action)
+
+
+class InferenceServer:
+    def __init__(self, models, max_batch=64, max_wait_ms=2.0):
+        self.batchers = {name: ModelBatcher(name, policy, max_batch, max_wait_ms / 1000)
+                         for name, policy in models.items()}
+
+    def stats(self):
+        return {name: {"latency_us": b.latency_us.to_dict(), "batch_size": b.batch_sizes.to_dict()}
+                for name, b in self.batchers.items()}
+
+    def report(self):
+        for name, s in self.stats().items():
+            lat, bs = s["latency_us"], s["batch_size"]
+            print(f"[{name}] {lat['n']} requests, mean latency {lat['mean']:.0f} us, "
+                  f"mean batch {bs['mean']:.1f}")
+            print(f"  latency (us, <=): {lat['buckets']}")
+            print(f"  batch size (<=):  {bs['buckets']}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+                payload = await reader.readexactly(length - 1)
+                if kind == STATS:
+                    _send(writer, STATS, json.dumps(self.stats()).encode())
+                elif kind == PREDICT:
+                    await self._predict(payload, writer)
+                else:
+                    _send(writer, ERROR, f"unknown request type {kind}".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def _predict(self, payload, writer):
+        n = payload[0]
+        name = payload[1:1 + n].decode()
+        batcher = self.batchers.get(name)
+        if batcher is None:
+            _send(writer, ERROR, f"unknown model {name!r}".encode())
+            return
+        # A malformed observation fails only its own request, never the batch it would join
+        size = len(payload) - 1 - n
+        if size != 4 * batcher.policy.obs_dim:
+            _send(writer, ERROR, f"model {name!r} takes {batcher.policy.obs_dim} float32 values, "
+                                 f"got {size} bytes".encode())
+            return
+        obs = np.frombuffer(payload, dtype=np.float32, offset=1 + n)
+        try:
+            action = await batcher.predict(obs)
+        except Exception as exc:
+            _send(writer, ERROR, str(exc).encode())
+            return
+        dtype = np.int32 if batcher.kind == DISCRETE else np.float32
+        _send(writer, PREDICT, bytes([batcher.kind]) + np.asarray(action, dtype=dtype).tobytes())
+
+    async def serve(self, address, report_every):
+        kind, addr = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(addr):
+                os.unlink(addr)
+            server = await asyncio.start_unix_server(self.handle, path=addr)
+        else:
+            server = await asyncio.start_server(self.handle, *addr)
+
+        tasks = [asyncio.create_task(b.run()) for b in self.batchers.values()]
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        print(f"Serving {sorted(self.batchers)} on {address}")
+
+        async with server:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), report_every)
+                except asyncio.TimeoutError:
+                    self.report()
+        for t in tasks:
+            t.cancel()
+
+
+def _send(writer, kind, payload):
+    writer.write(HEADER.pack(len(payload) + 1, kind) + payload)
+
+
+# -----------------------------------
+# Client
+# -----------------------------------
+
+class InferenceClient:
+    """Blocking client; one connection per client object (one per env worker)."""
+
+    def __init__(self, address, model):
+        kind, addr = parse_address(address)
+        family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(addr)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        name = model.encode()
+        self._prefix = bytes([len(name)]) + name
+
+    def predict(self, obs):
+        data = self._prefix + np.asarray(obs, dtype=np.float32).tobytes()
+        kind, payload = self._request(PREDICT, data)
+        if payload[0] == DISCRETE:
+            return int(np.frombuffer(payload, dtype=np.int32, offset=1)[0])
+        return np.frombuffer(payload, dtype=np.float32, offset=1).copy()
+
+    def stats(self):
+        return json.loads(self._request(STATS, b"")[1])
+
+    def _request(self, kind, payload):
+        self.sock.sendall(HEADER.pack(len(payload) + 1, kind) + payload)
+        length, kind = HEADER.unpack(self._recv(HEADER.size))
+        payload = self._recv(length - 1)
+        if kind == ERROR:
+            raise RuntimeError(payload.decode())
+        return kind, payload
+
+    def _recv(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("inference server closed the connection")
+            buf += chunk
+        return bytes(buf)
+
+    def close(self):
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", action="append", required=True, metavar="NAME=PATH")
+    parser.add_argument("--listen", default="unix:/tmp/policy.sock")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="latency budget for filling a batch")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads for inference")
+    parser.add_argument("--report-every", type=float, default=30.0)
+    args = parser.parse_args()
+
+    use_version("V3")  # DQN checkpoints need V3's network definition
+    import torch
+    from policies import load_policy
+    torch.set_num_threads(args.threads)
+
+    models = {}
+    for spec in args.model:
+        name, _, path = spec.partition("=")
+        models[name] = load_policy(os.path.abspath(path))
+
+    server = InferenceServer(models, args.max_batch, args.max_wait_ms)
+    asyncio.run(server.serve(args.listen, args.report_every))
+    server.report()
+
+
+if __name__ == "__main__":
+    main()
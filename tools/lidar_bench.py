@@ -0,0 +1,66 @@
+"""
+Time the V3 LiDAR methods on real tracks.
+
+    python tools/lidar_bench.py
+    python tools/lidar_bench.py --tracks 2 --cars 1 64 512 --rays 32
+
+For every track and car count, scans cars placed at random road pixels with each
+LidarSensor method ("march", "dda", "pyramid") and prints the best time per scan,
+the pyramid's speedup over "march", and the largest difference between "dda" and
+"pyramid" (they compute the same exact distances, so it should be 0).
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from versions import print_table, use_version
+
+METHODS = ("march", "dda", "pyramid")
+
+
+def road_positions(assets, n, rng, clearance=15.0):
+    """`n` random pixel centers at least `clearance` pixels from any wall."""
+    xs, ys = np.nonzero(np.asarray(assets.wall_distance) > clearance)
+    pick = rng.integers(len(xs), size=n)
+    return np.stack([xs[pick], ys[pick]], axis=1) + 0.5
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--cars", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--rays", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats (the best one is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    use_version("V3")
+    from sensors import LidarSensor
+    from track_assets import load_track_assets
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for track in args.tracks:
+        assets = load_track_assets(track)
+        mask, levels = assets.wall_mask, assets.empty_level
+        for cars in args.cars:
+            pos = road_positions(assets, cars, rng)
+            headings = rng.uniform(0, 360, cars)
+            row = {"track": track, "cars": cars, "rays": cars * args.rays}
+            dist = {}
+            for method in METHODS:
+                sensor = LidarSensor(num_rays=args.rays, method=method)
+                scan = lambda: sensor.distances(mask, pos, headings, levels)
+                dist[method] = scan()
+                number = max(1, 2000 // cars)
+                best = min(timeit.repeat(scan, number=number, repeat=args.repeat)) / number
+                row[f"{method}_us"] = round(best * 1e6, 1)
+            row["speedup"] = round(row["march_us"] / row["pyramid_us"], 2)
+            row["max_diff"] = float(np.abs(dist["dda"] - dist["pyramid"]).max())
+            rows.append(row)
+    print_table(rows, ["track", "cars", "rays"] + [f"{m}_us" for m in METHODS] + ["speedup", "max_diff"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Load any saved policy behind one deterministic interface:
+SB3 PPO .zip, DQN .pth, or an artifact written by tools/export_policy.py
+(.ts TorchScript, .npz NumPy weights, .onnx).
+"""
+import json
+import os
+
+import numpy as np
+
+
+class Policy:
+    """Greedy/deterministic policy. predict() takes one observation or a batch."""
+
+    def __init__(self, kind, predict_batch, obs_dim, path, discrete):
+        self.kind = kind
+        self.discrete = discrete
+        self.obs_dim = obs_dim
+        self.path = path
+        self._predict_batch = predict_batch
+
+    def predict(self, obs):
+        obs = np.asarray(obs, dtype=np.float32)
+        if obs.ndim == 1:
+            return self._predict_batch(obs[None])[0]
+        return self._predict_batch(obs)
+
+
+class TracedPolicy(Policy):
+    """TorchScript actor; single observations go through a preallocated input tensor."""
+
+    def __init__(self, path):
+        import torch
+
+        extra = {"meta.json": ""}
+        self.module = torch.jit.load(path, map_location="cpu", _extra_files=extra)
+        meta = json.loads(extra["meta.json"])
+        self._torch = torch
+        self._buf = np.zeros((1, meta["obs_dim"]), dtype=np.float32)
+        self._input = torch.from_numpy(self._buf)  # shares memory with _buf
+        super().__init__(meta["kind"], self._run, meta["obs_dim"], path, meta["discrete"])
+
+    def _run(self, obs):
+        with self._torch.inference_mode():
+            return self.module(self._torch.from_numpy(obs)).numpy()
+
+    def predict(self, obs):
+        if np.ndim(obs) != 1:
+            return self._run(np.asarray(obs, dtype=np.float32))
+        self._buf[0] = obs
+        with self._torch.inference_mode():
+            out = self.module(self._input)
+        return int(out[0]) if self.discrete else out[0].numpy()
+
+
+class NumpyPolicy(Policy):
+    """
+    Plain NumPy forward pass of an exported MLP actor. For the small nets used here
+    this skips framework dispatch entirely; single observations reuse per-layer buffers.
+    """
+
+    def __init__(self, path):
+        data = np.load(path)
+        meta = json.loads(str(data["meta"]))
+        self.layers = [(data[f"w{i}"], data[f"b{i}"], act) for i, act in enumerate(meta["activations"])]
+        self.low, self.high = data["low"], data["high"]
+        self._bufs = [np.empty(b.shape, dtype=np.float32) for _, b, _ in self.layers]
+        super().__init__(meta["kind"], self._run, meta["obs_dim"], path, meta["discrete"])
+
+    @staticmethod
+    def _activate(x, act):
+        if act == "relu":
+            np.maximum(x, 0.0, out=x)
+        elif act == "tanh":
+            np.tanh(x, out=x)
+        return x
+
+    def _run(self, obs):
+        x = obs
+        for w, b, act in self.layers:
+            x = self._activate(x @ w.T + b, act)
+        return x.argmax(1) if self.discrete else np.clip(x, self.low, self.high)
+
+    def predict(self, obs):
+        obs = np.asarray(obs, dtype=np.float32)
+        if obs.ndim != 1:
+            return self._run(obs)
+        x = obs
+        for (w, b, act), out in zip(self.layers, self._bufs):
+            np.dot(w, x, out=out)
+            out += b
+            x = self._activate(out, act)
+        return int(x.argmax()) if self.discrete else np.clip(x, self.low, self.high)
+
+
+def load_policy(path):
+    """
+    PPO for .zip files, DQN (V3 DQN network, needs V3 on sys.path) for .pth/.pt files,
+    and exported .ts / .npz / .onnx artifacts.
+    """
+    if path.endswith(".ts"):
+        return TracedPolicy(path)
+    if path.endswith(".npz"):
+        return NumpyPolicy(path)
+    if path.endswith(".onnx"):
+        return _load_onnx(path)
+    if path.endswith(".zip") or os.path.exists(path + ".zip"):
+        from stable_baselines3 import PPO
+
+        from gymnasium import spaces
+
+        model = PPO.load(path, device="cpu")
+        return Policy("ppo", lambda obs: model.predict(obs, deterministic=True)[0],
+                      model.observation_space.shape[0], path,
+                      isinstance(model.action_space, spaces.Discrete))
+
+    import torch
+    from dqn_agent import DQN
+
+    state = torch.load(path, map_location="cpu")
+    obs_dim = state["net.0.weight"].shape[1]
+    q_net = DQN(obs_dim, state["net.4.weight"].shape[0])
+    q_net.load_state_dict(state)
+    q_net.eval()
+
+    def predict_batch(obs):
+        with torch.no_grad():
+            return q_net(torch.from_numpy(obs)).argmax(1).numpy()
+
+    policy = Policy("dqn", predict_batch, obs_dim, path, discrete=True)
+    policy.q_net = q_net
+    return policy
+
+
+def _load_onnx(path):
+    import onnxruntime
+
+    session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+    meta = json.loads(session.get_modelmeta().custom_metadata_map["meta"])
+    name = session.get_inputs()[0].name
+    return Policy(meta["kind"], lambda obs: session.run(None, {name: obs})[0],
+                  meta["obs_dim"], path, meta["discrete"])
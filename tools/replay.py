@@ -0,0 +1,168 @@
+"""
+Play back a trajectory file without running the simulation or the policy.
+
+    python tools/replay.py runs/track1_ep000.traj
+    python tools/replay.py runs/track2_ep003.traj --speed 8 --start 0.5
+
+Controls:
+    space           pause / resume
+    up / down       double / halve playback speed (any speed, also below 1x)
+    left / right    step one frame (hold shift for 10 frames)
+    page up / down  previous / next episode in the file
+    home / end      first / last frame
+    0-9             jump to 0%, 10%, ..., 90%
+    click the bar   seek
+    esc / q         quit
+"""
+import argparse
+import math
+import os
+
+import numpy as np
+
+from trajectory import CHECKPOINT, CRASHED, LAP, Trajectory
+from versions import use_version
+
+BAR_H = 40
+
+
+class Scene:
+    """Draws one record on top of the recorded track, using the version's own assets."""
+
+    def __init__(self, meta):
+        self.version = meta.get("version", "V3")
+        use_version(self.version)
+        if self.version == "V1":
+            import lidar_env_laps
+            self.env = lidar_env_laps.LidarLapEnv()
+            self.size = (lidar_env_laps.WIDTH, lidar_env_laps.HEIGHT)
+        else:
+            self.size = (800, 600)
+        self.track = meta.get("track", 1)
+
+    def load_assets(self):
+        """Called once a display exists, so the track images can be converted."""
+        if self.version != "V1":
+            from car_lidar_env import CarLidarEnv
+            self.env = CarLidarEnv(track_num=self.track)
+
+    def draw(self, screen, frame, obs):
+        import pygame
+
+        x, y, heading = (float(v) for v in frame["pose"])
+        if self.version == "V1":
+            from rendering import BG_COLOR, draw_car, draw_rays, draw_walls
+            screen.fill(BG_COLOR)
+            draw_walls(screen, self.env.walls)
+            for cp in self.env.checkpoints:
+                pygame.draw.circle(screen, (60, 60, 60), (int(cp[0]), int(cp[1])), 6)
+            sensor = self.env.sensor
+            draw_rays(screen, (x, y), obs[:sensor.num_rays], sensor.max_range,
+                      sensor.directions(math.degrees(heading))[0])
+            draw_car(screen, (x, y), self.env.car.width, self.env.car.height, None,
+                     math.degrees(heading), bool(frame["flags"] & CRASHED))
+            return
+
+        env = self.env
+        screen.blit(env.track, (0, 0))
+        sensor = getattr(env, "sensor", None)
+        if sensor is not None:
+            angles = sensor.ray_angles(heading)[0]
+        else:  # V2's fixed five rays
+            angles = heading + np.array([-60, -30, 0, 30, 60])
+        for a, dist in zip(angles, (obs * env.max_lidar).tolist()):
+            rad = math.radians(-a)
+            end = (x + math.cos(rad) * dist, y + math.sin(rad) * dist)
+            pygame.draw.line(screen, (255, 255, 0), (x, y), end, 2)
+        car = pygame.transform.rotate(env.car_image, heading)
+        screen.blit(car, car.get_rect(center=(x, y)).topleft)
+        if frame["flags"] & CRASHED:
+            pygame.draw.circle(screen, (255, 60, 60), (int(x), int(y)), 24, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed relative to the env's fps")
+    parser.add_argument("--start", type=float, default=0.0, help="start position as a fraction of the file")
+    args = parser.parse_args()
+
+    traj = Trajectory(args.path)
+    if not len(traj):
+        raise SystemExit(f"{args.path} has no records")
+    frames = traj.frames
+    returns = traj.returns()
+    starts = traj.episode_starts()
+    fps = traj.meta.get("fps", 60)
+
+    driver = os.environ.get("SDL_VIDEODRIVER")
+    scene = Scene(traj.meta)
+    if driver is None:
+        del os.environ["SDL_VIDEODRIVER"]  # use_version() defaults to headless
+    import pygame
+    pygame.init()
+    w, h = scene.size
+    screen = pygame.display.set_mode((w, h + BAR_H))
+    pygame.display.set_caption(f"Replay: {os.path.basename(args.path)}")
+    scene.load_assets()
+    font = pygame.font.Font(None, 22)
+    clock = pygame.time.Clock()
+
+    n = len(traj)
+    pos = args.start * (n - 1)
+    speed, playing = args.speed, True
+    while True:
+        dt = clock.tick(60) / 1000
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+            if event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] >= h:
+                pos = event.pos[0] / w * (n - 1)
+            if event.type != pygame.KEYDOWN:
+                continue
+            step = 10 if event.mod & pygame.KMOD_SHIFT else 1
+            if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                return
+            elif event.key == pygame.K_SPACE:
+                playing = not playing
+            elif event.key == pygame.K_UP:
+                speed *= 2
+            elif event.key == pygame.K_DOWN:
+                speed /= 2
+            elif event.key == pygame.K_RIGHT:
+                pos, playing = int(pos) + step, False
+            elif event.key == pygame.K_LEFT:
+                pos, playing = int(pos) - step, False
+            elif event.key == pygame.K_HOME:
+                pos = 0
+            elif event.key == pygame.K_END:
+                pos = n - 1
+            elif event.key == pygame.K_PAGEDOWN:
+                later = starts[starts > int(pos)]
+                pos = later[0] if len(later) else pos
+            elif event.key == pygame.K_PAGEUP:
+                earlier = starts[starts < int(pos)]
+                pos = earlier[-1] if len(earlier) else 0
+            elif pygame.K_0 <= event.key <= pygame.K_9:
+                pos = (event.key - pygame.K_0) / 10 * (n - 1)
+
+        if playing:
+            pos += speed * fps * dt
+        pos = min(max(pos, 0), n - 1)
+        i = int(pos)
+        frame = frames[i]
+
+        scene.draw(screen, frame, traj.obs(i))
+        pygame.draw.rect(screen, (30, 30, 30), (0, h, w, BAR_H))
+        pygame.draw.rect(screen, (90, 160, 255), (0, h, int(w * i / max(n - 1, 1)), 4))
+        events = "CRASH" if frame["flags"] & CRASHED else "LAP" if frame["flags"] & LAP else \
+            "checkpoint" if frame["flags"] & CHECKPOINT else ""
+        text = (f"frame {i}/{n - 1}  ep {frame['episode']} step {frame['step']}  "
+                f"reward {frame['reward']:+.2f}  return {returns[i]:.1f}  "
+                f"{speed:g}x {'' if playing else '(paused)'}  {events}")
+        screen.blit(font.render(text, True, (230, 230, 230)), (8, h + 14))
+        pygame.display.flip()
+
+
+if __name__ == "__main__":
+    main()
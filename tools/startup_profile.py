@@ -0,0 +1,96 @@
+"""
+Where does a worker's start-up time go?
+
+    python tools/startup_profile.py --version V3 --track 2
+    python tools/startup_profile.py --version V2 --model V2/ppo_car_lidar.zip
+    python tools/startup_profile.py --version V3 --module torch --module train_dqn
+
+Starts a fresh interpreter (with -X importtime) that does what an evaluation or
+sweep worker does: import the env module, build an env, reset it, build a second
+one, then import any extra --module and load --model. Prints the time of each
+phase and the import time of every top-level package, summed over its submodules.
+"""
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import time
+
+from versions import ROOT, TRACKS, print_table
+
+CHILD = r"""
+import json, sys, time
+sys.path[:0] = [{version_dir!r}, {tools_dir!r}]
+phases = []
+def phase(name, fn):
+    t = time.perf_counter()
+    out = fn()
+    phases.append((name, time.perf_counter() - t))
+    return out
+
+if {version!r} == "V1":
+    mod = phase("import env module", lambda: __import__("lidar_env_laps"))
+    make = lambda: mod.LidarLapEnv()
+else:
+    mod = phase("import env module", lambda: __import__("car_lidar_env"))
+    make = lambda: mod.CarLidarEnv(track_num={track})
+env = phase("construct env", make)
+phase("first reset", lambda: env.reset(seed=0))
+phase("construct second env", make)
+for name in {modules!r}:
+    phase(f"import {{name}}", lambda: __import__(name))
+if {model!r}:
+    from policies import load_policy
+    phase("load policy", lambda: load_policy({model!r}))
+print(json.dumps(phases))
+"""
+
+
+def parse_importtime(stderr):
+    """Sum `-X importtime` self times (seconds) per top-level package."""
+    totals = collections.Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        totals[name.split(".")[0]] += int(self_us) / 1e6
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", default="V3", choices=sorted(TRACKS))
+    parser.add_argument("--track", type=int, default=1)
+    parser.add_argument("--module", action="append", default=[], help="extra module to time (repeatable)")
+    parser.add_argument("--model", help="also time load_policy() on this model")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    args = parser.parse_args()
+
+    code = CHILD.format(
+        version=args.version, version_dir=os.path.join(ROOT, args.version),
+        tools_dir=os.path.dirname(os.path.abspath(__file__)), track=args.track,
+        modules=args.module, model=os.path.abspath(args.model) if args.model else "",
+    )
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        sys.exit(proc.stderr)
+
+    phases = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = [{"phase": name, "ms": round(t * 1000, 1)} for name, t in phases]
+    rows.append({"phase": "whole process", "ms": round(wall * 1000, 1)})
+    print_table(rows, ["phase", "ms"])
+
+    totals = parse_importtime(proc.stderr)
+    print()
+    print_table([{"package": name, "import_ms": round(t * 1000, 1)} for name, t in totals.most_common(args.top)],
+                ["package", "import_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Parallel hyperparameter sweep for the PPO and DQN trainers.
+
+    python tools/sweep.py --version V3 --algo dqn --space space.json --search random --trials 16
+    python tools/sweep.py --version V1 --algo ppo --space space.json --search grid
+
+The space file is a JSON object mapping hyperparameter names to either
+  - a list of values (grid search, or a uniform choice in random search), or
+  - {"uniform": [lo, hi]}, {"log_uniform": [lo, hi]} or {"int": [lo, hi]} (random search only).
+Names are DQNAgent / train() arguments for DQN (lr, gamma, epsilon_decay, epsilon_min,
+target_update_freq, batch_size, buffer_size, n_step, replay_ratio) and PPO constructor
+kwargs for PPO. Only V3 has a DQN trainer; V1 and V2 sweep PPO.
+Anything not in the space keeps the value from the version's training script.
+
+Trials run in a process pool (one per core by default). Every `--eval-every` env steps a
+trial is evaluated greedily; a trial whose return is below the median of the other
+trials at the same point is stopped early (median stopping rule).
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import statistics
+import time
+
+from versions import DEFAULT_ALGO, default_hparams, make_env, prepare_assets, print_table, use_version
+
+
+# -----------------------------------
+# Search space
+# -----------------------------------
+
+def grid_configs(space):
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"grid search needs a list of values for {name!r}")
+    names = list(space)
+    for combo in itertools.product(*(space[n] for n in names)):
+        yield dict(zip(names, combo))
+
+
+def sample_config(space, rng):
+    config = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            config[name] = rng.choice(spec)
+        elif "uniform" in spec:
+            config[name] = rng.uniform(*spec["uniform"])
+        elif "log_uniform" in spec:
+            lo, hi = spec["log_uniform"]
+            config[name] = math.exp(rng.uniform(math.log(lo), math.log(hi)))
+        elif "int" in spec:
+            config[name] = rng.randint(*spec["int"])
+        else:
+            raise ValueError(f"unknown distribution for {name!r}: {spec}")
+    return config
+
+
+# -----------------------------------
+# One trial (runs in a worker process)
+# -----------------------------------
+
+def evaluate(env, act, episodes):
+    """Mean return of `episodes` greedy episodes."""
+    total = 0.0
+    for _ in range(episodes):
+        obs, _ = env.reset()
+        done = False
+        while not done:
+            obs, reward, terminated, truncated, _ = env.step(act(obs))
+            total += reward
+            done = terminated or truncated
+    return total / episodes
+
+
+def build_dqn(env, hp):
+    from dqn_agent import DQNAgent, ReplayBuffer
+    from learner import Learner
+    from train_dqn import train
+
+    agent = DQNAgent(
+        env.observation_space.shape[0], env.action_space.n,
+        lr=hp["lr"], gamma=hp["gamma"],
+        epsilon_decay=hp["epsilon_decay"], epsilon_min=hp["epsilon_min"],
+    )
+    buffer = ReplayBuffer(int(hp["buffer_size"]), n_step=int(hp["n_step"]), gamma=hp["gamma"])
+    # One learner for the whole trial, so fractional replay-ratio credit carries across chunks
+    learner = Learner(agent, buffer, int(hp["batch_size"]), hp["replay_ratio"])
+
+    def learn(start, stop):
+        return train(env, agent, buffer, episodes=10**9, max_steps=stop, global_step=start,
+                     target_update_freq=int(hp["target_update_freq"]), learner=learner, verbose=False)
+
+    def act(obs):
+        import torch
+        with torch.no_grad():
+            return agent.q_net(torch.as_tensor(obs, dtype=torch.float32).unsqueeze(0)).argmax().item()
+
+    return learn, act
+
+
+def build_ppo(env, hp):
+    from stable_baselines3 import PPO
+
+    model = PPO("MlpPolicy", env, verbose=0, device="cpu", **hp)
+
+    def learn(start, stop):
+        model.learn(total_timesteps=stop - start, reset_num_timesteps=start == 0)
+        return model.num_timesteps
+
+    def act(obs):
+        return model.predict(obs, deterministic=True)[0]
+
+    return learn, act
+
+
+def run_trial(job):
+    trial_id, params, cfg, board = job
+    import torch
+    torch.set_num_threads(1)
+
+    hp = default_hparams(cfg["version"], cfg["algo"])
+    hp.update(params)
+    env = make_env(cfg["version"], cfg["track"], cfg["max_episode_steps"])
+    eval_env = make_env(cfg["version"], cfg["track"], cfg["max_episode_steps"])
+    learn, act = (build_dqn if cfg["algo"] == "dqn" else build_ppo)(env, hp)
+
+    start = time.perf_counter()
+    step, rung, returns, status = 0, 0, [], "done"
+    while step < cfg["budget"]:
+        step = learn(step, min(step + cfg["eval_every"], cfg["budget"]))
+        ret = evaluate(eval_env, act, cfg["eval_episodes"])
+        returns.append(ret)
+
+        # Median stopping rule against the trials that reached this rung
+        board[(rung, trial_id)] = ret
+        peers = [v for (r, t), v in board.items() if r == rung and t != trial_id]
+        if step < cfg["budget"] and len(peers) >= cfg["min_peers"] and ret < statistics.median(peers):
+            status = f"stopped@{step}"
+            break
+        rung += 1
+
+    env.close()
+    eval_env.close()
+    return dict(
+        trial=trial_id,
+        status=status,
+        steps=step,
+        final_return=round(returns[-1], 3),
+        best_return=round(max(returns), 3),
+        seconds=round(time.perf_counter() - start, 1),
+        **params,
+    )
+
+
+# -----------------------------------
+# Driver
+# -----------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", default="V3", choices=["V1", "V2", "V3"])
+    parser.add_argument("--algo", choices=["ppo", "dqn"], help="defaults to the version's own algorithm")
+    parser.add_argument("--space", required=True, help="JSON file (or inline JSON) describing the search space")
+    parser.add_argument("--search", default="grid", choices=["grid", "random"])
+    parser.add_argument("--trials", type=int, default=16, help="number of random-search trials")
+    parser.add_argument("--budget", type=int, default=100_000, help="env steps per trial")
+    parser.add_argument("--eval-every", type=int, default=10_000)
+    parser.add_argument("--eval-episodes", type=int, default=2)
+    parser.add_argument("--min-peers", type=int, default=3, help="trials needed at a rung before stopping others")
+    parser.add_argument("--track", type=int, nargs="+", default=[1], help="several tracks train on all of them (V3)")
+    parser.add_argument("--max-episode-steps", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    algo = args.algo or DEFAULT_ALGO[args.version]
+    if algo == "dqn" and args.version != "V3":
+        parser.error(f"{args.version} has no DQN trainer (dqn_agent.py / train_dqn.py); use --algo ppo")
+
+    space = json.loads(open(args.space).read() if os.path.exists(args.space) else args.space)
+    if args.search == "grid":
+        configs = list(grid_configs(space))
+    else:
+        rng = random.Random(args.seed)
+        configs = [sample_config(space, rng) for _ in range(args.trials)]
+
+    use_version(args.version)
+    prepare_assets(args.version)
+    cfg = dict(
+        version=args.version, algo=algo, track=args.track, budget=args.budget,
+        eval_every=args.eval_every, eval_episodes=args.eval_episodes,
+        min_peers=args.min_peers, max_episode_steps=args.max_episode_steps,
+    )
+    workers = max(1, min(args.workers, len(configs)))
+    print(f"Sweeping {len(configs)} {algo.upper()} configs on {args.version} with {workers} workers")
+
+    ctx = mp.get_context("spawn")
+    rows = []
+    with ctx.Manager() as manager:
+        board = manager.dict()
+        jobs = [(i, c, cfg, board) for i, c in enumerate(configs)]
+        pool = ctx.Pool(workers, initializer=use_version, initargs=(args.version,))
+        for row in pool.imap_unordered(run_trial, jobs):
+            print(f"trial {row['trial']:>3} {row['status']:<14} return {row['final_return']:.2f}")
+            rows.append(row)
+        # close/join rather than terminate: pygame's SDL ignores SIGTERM in the workers
+        pool.close()
+        pool.join()
+
+    rows.sort(key=lambda r: r["best_return"], reverse=True)
+    columns = ["trial", "status", "steps", "final_return", "best_return", "seconds"] + list(space)
+    with open(args.out, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print()
+    print_table(rows, columns)
+    print(f"\nSaved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Step cost of V3 multi-car racing (TrafficVecEnv) as the field grows.
+
+    python tools/traffic_bench.py
+    python tools/traffic_bench.py --track 3 --cars 32 128 512 --method pyramid
+
+Scatters the cars over free road poses, at least a car diagonal apart, and makes
+them solid; cars that don't fit (the tracks hold a few dozen) stay ghosts on the
+start pose. Steps them with random actions (mostly accelerating) and prints the
+time per step and per car, and how many car-car contacts and wall crashes happened.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from versions import print_table, use_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--track", type=int, default=3)
+    parser.add_argument("--cars", type=int, nargs="+", default=[16, 64, 256, 512])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--method", default="march", choices=["march", "dda", "pyramid"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    use_version("V3")
+    from sensors import LidarSensor
+    from traffic import TrafficVecEnv
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for cars in args.cars:
+        env = TrafficVecEnv(cars, track_num=args.track, sensor=LidarSensor(method=args.method), max_steps=500)
+        env.reset(seed=args.seed)
+        # Poses where a car facing angle 0 touches no wall
+        free = ~np.unpackbits(np.asarray(env.collision_table[0]), axis=1)[:, :env.HEIGHT].astype(bool)
+        road = np.argwhere(free)[rng.permutation(int(free.sum()))] + 0.5
+        placed = []
+        for p in road:
+            if len(placed) == cars:
+                break
+            if not placed or (np.hypot(*(np.array(placed) - p).T) >= env.diagonal).all():
+                placed.append(p)
+        placed = np.array(placed)
+        env.x[:len(placed)], env.y[:len(placed)] = placed[:, 0], placed[:, 1]
+        env.ghost[:len(placed)] = False
+
+        contacts = crashes = 0
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            actions = np.where(rng.random(cars) < 0.3, rng.integers(3, size=cars), 2)
+            _, _, terminated, _, info = env.step(actions)
+            contacts += int(info["contact"].sum())
+            crashes += int(terminated.sum())
+        per_step = (time.perf_counter() - start) / args.steps
+        rows.append({"cars": cars, "solid": len(placed), "ms_per_step": round(per_step * 1e3, 2),
+                     "us_per_car": round(per_step / cars * 1e6, 1), "contacts": contacts,
+                     "wall_crashes": crashes - contacts})
+    print_table(rows, ["cars", "solid", "ms_per_step", "us_per_car", "contacts", "wall_crashes"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Compact binary trajectory files: one fixed-size record per env step.
+
+Layout (little endian):
+    header  : b"TRAJ", u16 format version, u32 metadata length
+    metadata: JSON (env version, track, obs/action sizes, fps, ...), zero-padded to 16 bytes
+    records : packed numpy records, see record_dtype()
+
+Records are only ever appended, so a recording that was cut short is still readable
+(a partially written last record is ignored), and Trajectory memory-maps the file
+so a viewer can seek anywhere without reading it all.
+
+Each record is the state *after* a step: the pose and observation the env reached,
+the action that led there and the reward it earned. The first record of an episode
+(step 0) is the reset state with a zero action and reward.
+
+The "obs" field holds the observation through the codec named in metadata["obs_codec"]
+(format 2; format 1 files are plain float32):
+    float32  as is
+    fixed16  uint16 fixed point over [0, 1], off by at most 7.7e-6
+    lookup   uint8 index into obs_codec["values"], exact (V3's stepped LiDAR readings)
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"TRAJ"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sHI")
+
+# Record flags
+TERMINATED, TRUNCATED, CRASHED, CHECKPOINT, LAP = 1, 2, 4, 8, 16
+
+
+class ObsCodec:
+    """Encodes observations for the "obs" field; spec() is stored in the file metadata."""
+
+    DTYPES = {"float32": "<f4", "fixed16": "<u2", "lookup": "u1"}
+
+    def __init__(self, kind="float32", values=None):
+        if kind not in self.DTYPES:
+            raise ValueError(f"unknown observation codec {kind!r}")
+        self.kind = kind
+        self.dtype = np.dtype(self.DTYPES[kind])
+        self.values = None if values is None else np.asarray(values, dtype=np.float32)
+        if kind == "lookup" and (self.values is None or len(self.values) > 256):
+            raise ValueError("a lookup codec needs at most 256 values")
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(**spec) if spec else cls()
+
+    def spec(self):
+        spec = {"kind": self.kind}
+        if self.values is not None:
+            spec["values"] = self.values.tolist()
+        return spec
+
+    def encode(self, obs):
+        obs = np.asarray(obs, dtype=np.float32)
+        if self.kind == "fixed16":
+            return np.rint(np.clip(obs, 0.0, 1.0) * 65535).astype(self.dtype)
+        if self.kind == "lookup":
+            codes = np.searchsorted(self.values, obs).clip(0, len(self.values) - 1)
+            if not np.array_equal(self.values[codes], obs):
+                raise ValueError("observation holds a value that is not in the codec's table")
+            return codes.astype(self.dtype)
+        return obs
+
+    def decode(self, codes):
+        """Observations as float32; works on a single record's field or a whole column."""
+        if self.kind == "fixed16":
+            return (np.asarray(codes) / np.float32(65535)).astype(np.float32)
+        if self.kind == "lookup":
+            return self.values[codes]
+        return np.asarray(codes, dtype=np.float32)
+
+
+def codec_for(env):
+    """Smallest codec that keeps `env`'s observations: exact lookup, else fixed point over [0, 1]."""
+    env = env.unwrapped
+    sensor = getattr(env, "sensor", None)
+    values = sensor.readings() if hasattr(sensor, "readings") else None
+    if values is not None and len(values) <= 256:
+        return ObsCodec("lookup", values)
+    space = env.observation_space
+    if (np.asarray(space.low) >= 0).all() and (np.asarray(space.high) <= 1).all():
+        return ObsCodec("fixed16")
+    return ObsCodec()
+
+
+def record_dtype(obs_dim, action_dim, obs_dtype="<f4"):
+    return np.dtype([
+        ("episode", "<u4"),
+        ("step", "<u4"),
+        ("pose", "<f4", 3),  # x, y, heading in the env's own convention (see get_pose)
+        ("action", "<f4", action_dim),
+        ("obs", obs_dtype, obs_dim),
+        ("reward", "<f4"),
+        ("flags", "u1"),
+    ])
+
+
+def get_pose(env):
+    """(x, y, heading): heading_r in radians for V1's Car, angle in degrees for CarLidarEnv."""
+    env = env.unwrapped
+    if hasattr(env, "car"):
+        return env.car.pos[0], env.car.pos[1], env.car.heading_r
+    return env.x, env.y, env.angle
+
+
+def step_flags(terminated, truncated, info):
+    flags = TERMINATED * bool(terminated) | TRUNCATED * bool(truncated)
+    flags |= CRASHED * bool(info.get("crashed", False))
+    if info.get("checkpoint") == "checkpoint":
+        flags |= CHECKPOINT
+    elif info.get("checkpoint") == "lap":
+        flags |= LAP
+    return flags
+
+
+class TrajectoryRecorder:
+    """Streams records to `path`. Extra keyword arguments are stored in the metadata."""
+
+    def __init__(self, path, obs_dim, action_dim, codec=None, **meta):
+        self.codec = codec or ObsCodec()
+        self.meta = dict(meta, obs_dim=int(obs_dim), action_dim=int(action_dim), obs_codec=self.codec.spec())
+        blob = json.dumps(self.meta).encode()
+        blob += b"\0" * (-(HEADER.size + len(blob)) % 16)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(blob)) + blob)
+        self.record = np.zeros((), dtype=record_dtype(obs_dim, action_dim, self.codec.dtype))
+        self.count = 0
+
+    def write(self, episode, step, pose, action, obs, reward=0.0, flags=0):
+        r = self.record
+        r["episode"] = episode
+        r["step"] = step
+        r["pose"] = pose
+        r["action"] = action
+        r["obs"] = self.codec.encode(obs)
+        r["reward"] = reward
+        r["flags"] = flags
+        self.file.write(r.tobytes())
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def recorder_for(env, path, **meta):
+    """A TrajectoryRecorder sized for `env`'s observation and action spaces."""
+    from gymnasium import spaces
+
+    action_dim = 1 if isinstance(env.action_space, spaces.Discrete) else env.action_space.shape[0]
+    meta.setdefault("fps", env.unwrapped.metadata.get("render_fps", 60))
+    return TrajectoryRecorder(path, env.observation_space.shape[0], action_dim, codec_for(env), **meta)
+
+
+def record_step(recorder, env, episode, step, action, obs, reward, terminated, truncated, info):
+    recorder.write(episode, step, get_pose(env), action, obs, reward, step_flags(terminated, truncated, info))
+
+
+class Trajectory:
+    """Read-only, memory-mapped view of a trajectory file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, meta_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            if version not in (1, FORMAT_VERSION):
+                raise ValueError(f"{path}: unsupported trajectory format {version}")
+            self.meta = json.loads(f.read(meta_len).rstrip(b"\0"))
+
+        self.path = path
+        self.codec = ObsCodec.from_spec(self.meta.get("obs_codec"))
+        self.dtype = record_dtype(self.meta["obs_dim"], self.meta["action_dim"], self.codec.dtype)
+        offset = HEADER.size + meta_len
+        n = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if n:
+            self.frames = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(n,))
+        else:
+            self.frames = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, i):
+        return self.frames[i]
+
+    def obs(self, i=slice(None)):
+        """Decoded float32 observations of record(s) `i`."""
+        return self.codec.decode(self.frames["obs"][i])
+
+    def episode_starts(self):
+        """Index of the first record of every episode."""
+        return np.flatnonzero(self.frames["step"] == 0)
+
+    def returns(self):
+        """Return accumulated within the episode up to each record."""
+        total = np.cumsum(self.frames["reward"], dtype=np.float64)
+        starts = self.episode_starts()
+        base = np.zeros(len(self))
+        if len(starts):
+            lengths = np.diff(np.append(starts, len(self)))
+            base[starts[0]:] = np.repeat(total[starts] - self.frames["reward"][starts], lengths)
+        return total - base
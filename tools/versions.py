@@ -0,0 +1,108 @@
+"""
+Helpers for tools that work across the V1/V2/V3 folders.
+
+Each version folder is a flat script directory (modules import each other by bare
+name, e.g. `from car_lidar_env import CarLidarEnv`), so a tool process puts
+exactly one of them on sys.path before importing anything from it.
+"""
+import inspect
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tracks each version can run on
+TRACKS = {"V1": [1], "V2": [1, 2, 3, 4], "V3": [1, 2, 3, 4]}
+
+# Algorithm each version was trained with
+DEFAULT_ALGO = {"V1": "ppo", "V2": "ppo", "V3": "dqn"}
+
+
+def use_version(version):
+    """Make `version`'s modules importable and run pygame headless."""
+    if version not in TRACKS:
+        raise ValueError(f"unknown version {version!r}, expected one of {sorted(TRACKS)}")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    path = os.path.join(ROOT, version)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+
+def prepare_assets(version):
+    """Build shared track assets once in the parent, so pool workers only attach to them."""
+    if version == "V3":
+        from track_assets import build_all
+        build_all()
+
+
+def make_env(version, track_num=1, max_steps=2000):
+    """
+    Headless env for `version`, truncated after `max_steps` steps. A list of
+    tracks gives a V3 MultiTrackEnv cycling through them.
+    """
+    if version == "V1":
+        from lidar_env_laps import LidarLapEnv
+        env = LidarLapEnv()
+        env.max_steps = max_steps
+        return env
+
+    from gymnasium.wrappers import TimeLimit
+    from car_lidar_env import CarLidarEnv
+    if isinstance(track_num, (list, tuple)):
+        if len(track_num) > 1:
+            if version != "V3":
+                raise ValueError("multi-track envs need V3")
+            from car_lidar_env import MultiTrackEnv
+            return TimeLimit(MultiTrackEnv(tracks=track_num), max_episode_steps=max_steps)
+        track_num = track_num[0]
+    return TimeLimit(CarLidarEnv(track_num=track_num), max_episode_steps=max_steps)
+
+
+def default_hparams(version, algo):
+    """The hyperparameters the version's training script uses today."""
+    if algo == "ppo":
+        if version == "V1":
+            from train_lidar_laps import PPO_KWARGS
+        elif version == "V2":
+            from train_car_agent import PPO_KWARGS
+        else:
+            PPO_KWARGS = {}
+        return dict(PPO_KWARGS)
+
+    # DQN: the defaults of the agent, buffer and train() signatures
+    from dqn_agent import DQNAgent, ReplayBuffer
+    from train_dqn import train
+
+    agent, buffer, loop = (_defaults(f) for f in (DQNAgent.__init__, ReplayBuffer.__init__, train))
+    return dict(
+        lr=agent["lr"],
+        gamma=agent["gamma"],
+        epsilon_decay=agent["epsilon_decay"],
+        epsilon_min=agent["epsilon_min"],
+        target_update_freq=loop["target_update_freq"],
+        batch_size=loop["batch_size"],
+        buffer_size=buffer["size"],
+        n_step=buffer["n_step"],
+        replay_ratio=loop["replay_ratio"],
+    )
+
+
+def _defaults(func):
+    return {name: p.default for name, p in inspect.signature(func).parameters.items()
+            if p.default is not inspect.Parameter.empty}
+
+
+def print_table(rows, columns):
+    """Print dict rows as an aligned text table."""
+    widths = [max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _fmt(v):
+    return f"{v:.4g}" if isinstance(v, float) else str(v)